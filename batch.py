@@ -0,0 +1,188 @@
+"""Headless batch simulator: play many seeded deals across a process pool.
+
+    python -m batch --deals 1000000 --workers 32 --seed 42 --out results.csv
+
+Deal ``i`` of a run uses seed ``seed + i``, so any single result can be
+replayed with ``Game(seed=...)``. Results are streamed to a CSV file as
+workers finish them, in seed order. ``--cache results.db`` skips deals an
+earlier run already played under the same rules and policy.
+"""
+from main import Game
+from compact import CompactGame, deal_for_seed
+from play import apply_move, choose_bot_move, step, DEAD_END, NO_MOVES
+from solver import Solver, WON, LOST, UNKNOWN
+from cache import ResultCache, variant_name
+from rollout import RolloutPolicy
+from endgame import EndgameTable, is_endgame
+import argparse
+import csv
+import functools
+import multiprocessing
+import random
+import sys
+import time
+
+ENGINES = {"game": Game, "compact": CompactGame}
+FIELDS = ["seed", "won", "moves", "foundation", "seconds"]
+# One endgame table per process, shared by every deal the process plays
+ENDGAME_TABLE = EndgameTable()
+
+def play_random(game, rng, max_moves, endgame=None):
+    """Play the MOVE_WEIGHTS bot until it wins, gets stuck or hits max_moves.
+
+    Returns (moves played, outcome).
+    """
+    return play_policy(game, lambda game, moves: choose_bot_move(moves, rng), max_moves, endgame)
+
+def play_policy(game, choose, max_moves, endgame=None):
+    """Play ``choose`` (see play.step) until the game ends or max_moves moves were played.
+
+    With an EndgameTable as ``endgame``, the first position with nothing
+    face down is handed to the table: a won one is finished with the
+    table's line, a lost one ends the game, and the policy carries on when
+    the table's search ran out of budget. A policy that doesn't win proves
+    nothing, so the outcome is UNKNOWN unless the game ran into a dead end
+    or out of moves, or the table proved a loss.
+    """
+    played = []
+    pending = endgame is not None
+    outcome = UNKNOWN
+    while len(played) < max_moves:
+        if pending and is_endgame(game):
+            pending = False
+            status, line = endgame.solve(game)
+            if status == WON:
+                for move in line[:max_moves - len(played)]:
+                    apply_move(game, move)
+                    played.append(move)
+                break
+            if status == LOST:
+                outcome = LOST
+                break
+        ended, move = step(game, choose)
+        if ended is not None:
+            if ended in (DEAD_END, NO_MOVES):
+                outcome = LOST
+            break
+        played.append(move)
+    return played, WON if game.is_won() else outcome
+
+def play_solver(game, rng, max_moves, endgame=None, max_nodes=20000):
+    """Solve the deal and replay the winning line, if one was found in budget."""
+    result = Solver(max_nodes=max_nodes, endgame=endgame).solve(game)
+    if result.status != WON:
+        return [], result.status
+    for move in result.moves[:max_moves]:
+        apply_move(game, move)
+    return result.moves[:max_moves], result.status
+
+def play_rollout(game, rng, max_moves, endgame=None, playouts=8, depth=100):
+    """Play the Monte Carlo rollout policy (see rollout.py) until it wins or gets stuck."""
+    policy = RolloutPolicy(playouts=playouts, depth=depth, rng=rng)
+    return play_policy(game, policy.choose, max_moves, endgame)
+
+POLICIES = {"random": play_random, "solver": play_solver, "rollout": play_rollout}
+
+def cached_policy(policy, max_moves, endgame=False, max_nodes=20000):
+    """The name run_batch caches ``policy``'s results under; anything that changes how it plays is in it.
+
+    ``max_nodes`` is the solver's node budget, which only counts for "solver".
+    """
+    nodes = f"-nodes{max_nodes}" if policy == "solver" else ""
+    return f"{policy}-moves{max_moves}{nodes}" + ("+endgame" if endgame else "")
+
+def play_deal(seed, policy="random", engine="compact", max_moves=2000, draw_count=1, max_recycles=None,
+              endgame=False):
+    """Play one seeded deal; returns (row of FIELDS, outcome, moves played).
+
+    With ``endgame`` the policy finishes through this process's ENDGAME_TABLE.
+    """
+    start = time.perf_counter()
+    game = ENGINES[engine](seed=seed, draw_count=draw_count, max_recycles=max_recycles)
+    moves, outcome = POLICIES[policy](game, random.Random(seed), max_moves, ENDGAME_TABLE if endgame else None)
+    row = (seed, int(game.is_won()), len(moves), game.foundation_count(), round(time.perf_counter() - start, 6))
+    return row, outcome, moves
+
+def run_deal(seed, **options):
+    """Play one seeded deal; returns a row of FIELDS."""
+    return play_deal(seed, **options)[0]
+
+def run_batch(deals, workers=None, seed=0, policy="random", engine="compact", max_moves=2000, out=None, chunksize=64,
+              draw_count=1, max_recycles=None, cache=None, endgame=False):
+    """Play ``deals`` seeded deals, writing rows to ``out`` (a path) as they finish.
+
+    With a ResultCache, deals it already holds for this variant and policy
+    (see cached_policy) are reported from the cache (with 0 seconds)
+    instead of being replayed.
+    Returns (games won, games played).
+    """
+    task = functools.partial(play_deal, policy=policy, engine=engine, max_moves=max_moves,
+                             draw_count=draw_count, max_recycles=max_recycles, endgame=endgame)
+    variant = variant_name(draw_count, max_recycles)
+    name = cached_policy(policy, max_moves, endgame)
+    won = played = 0
+    handle = open(out, "w", newline="") if out else None
+    try:
+        writer = csv.writer(handle) if handle else None
+        if writer:
+            writer.writerow(FIELDS)
+        with multiprocessing.Pool(workers) as pool:
+            # Work in blocks so cached and freshly played deals stream out in seed order
+            block = chunksize * max(workers or multiprocessing.cpu_count(), 1) * 4
+            for first in range(seed, seed + deals, block):
+                seeds = range(first, min(first + block, seed + deals))
+                rows = {}
+                if cache is not None:
+                    for s in seeds:
+                        hit = cache.get(deal_for_seed(s), variant, name)
+                        if hit is not None:
+                            rows[s] = (s, int(hit.status == WON), hit.length or 0, hit.foundation, 0.0)
+                missing = [s for s in seeds if s not in rows]
+                for row, outcome, moves in pool.imap(task, missing, chunksize=chunksize):
+                    rows[row[0]] = row
+                    if cache is not None:
+                        cache.put(deal_for_seed(row[0]), variant, name, outcome, row[3], moves if row[1] else None,
+                                  len(moves))
+                if cache is not None:
+                    cache.flush()
+                for s in seeds:
+                    row = rows[s]
+                    won += row[1]
+                    played += 1
+                    if writer:
+                        writer.writerow(row)
+    finally:
+        if handle:
+            handle.close()
+    return won, played
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play seeded Klondike deals in parallel.")
+    parser.add_argument("--deals", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first deal")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="compact")
+    parser.add_argument("--max-moves", type=int, default=2000)
+    parser.add_argument("--draw", type=int, choices=[1, 3], default=1, help="cards per draw")
+    parser.add_argument("--max-recycles", type=int, default=None, help="passes through the stock (default unlimited)")
+    parser.add_argument("--out", default=None, help="CSV file for per-deal results")
+    parser.add_argument("--cache", default=None, help="SQLite result cache shared across runs")
+    parser.add_argument("--endgame", action="store_true", help="finish games exactly once nothing is face down")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    cache = ResultCache(args.cache) if args.cache else None
+    try:
+        won, played = run_batch(args.deals, args.workers, args.seed, args.policy, args.engine, args.max_moves, args.out,
+                                draw_count=args.draw, max_recycles=args.max_recycles, cache=cache,
+                                endgame=args.endgame)
+    finally:
+        if cache is not None:
+            cache.close()
+    elapsed = time.perf_counter() - start
+    print(f"{played} deals, {won} won ({won / max(played, 1):.2%}), "
+          f"{elapsed:.1f}s ({played / elapsed:.0f} deals/s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Benchmarks for the Game hot paths and end-to-end throughput.
+
+    python bench.py --out bench.json                      # run and save results
+    python bench.py --baseline bench.json --threshold 0.15
+
+Every benchmark uses fixed seeds and reports microseconds per operation
+(lower is better). Move benchmarks time a move plus its undo, so the same
+position can be reused. Whole-game benchmarks also report games per
+second. With ``--baseline`` the run fails (exit status 1)
+when any benchmark is more than ``threshold`` slower than the baseline.
+"""
+from main import Game
+from play import flatten_moves, apply_move, choose_bot_move
+from batch import run_deal
+import argparse
+import json
+import platform
+import random
+import sys
+import timeit
+
+def midgame(seed, moves=40):
+    """A deterministic mid-game position: ``moves`` weighted-bot moves into a seeded deal."""
+    game = Game(seed=seed)
+    rng = random.Random(seed)
+    for _ in range(moves):
+        flat_moves = flatten_moves(game.get_all_legal_moves())
+        if not flat_moves:
+            break
+        apply_move(game, choose_bot_move(flat_moves, rng))
+    return game
+
+def find_move(move_type):
+    """First (game, move) of the given type across fixed mid-game positions."""
+    for seed in range(200):
+        for moves in (0, 20, 40, 80):
+            game = midgame(seed, moves)
+            for move in flatten_moves(game.get_all_legal_moves()):
+                if move[0] == move_type:
+                    return game, move
+    raise LookupError(f"no position with a {move_type} move")
+
+def bench_move(move_type):
+    game, move = find_move(move_type)
+    return lambda: game.undo(apply_move(game, move))
+
+def bench_recycle():
+    game = Game(seed=1)
+    while game.stock:
+        game.draw_from_stock()
+    return lambda: game.undo(game.recycle_stock())
+
+def bench_legal_moves():
+    positions = [midgame(seed) for seed in range(10)]
+    return lambda: [game.get_all_legal_moves() for game in positions]
+
+def bench_snapshot():
+    game = midgame(0)
+    return game.snapshot
+
+def bench_state_hash():
+    game = midgame(0)
+    return game.rehash
+
+def bench_random_game():
+    return lambda: run_deal(0, engine="game", max_moves=500)
+
+def bench_batch_game():
+    # The same deals in every repeat, so repeats time the same work
+    return lambda: [run_deal(seed, engine="compact", max_moves=500) for seed in BATCH_SEEDS]
+
+BATCH_SEEDS = range(10)
+# Benchmarks whose operation is one whole game
+GAME_BENCHMARKS = ["random_game", "batch_game"]
+
+# name -> (setup returning the timed callable, calls per timing, operations per call)
+BENCHMARKS = {
+    "get_all_legal_moves": (bench_legal_moves, 100, 10),
+    "snapshot": (bench_snapshot, 2000, 1),
+    "rehash": (bench_state_hash, 2000, 1),
+    "draw_from_stock": (lambda: bench_move("draw"), 5000, 1),
+    "recycle_stock": (bench_recycle, 2000, 1),
+    "move_from_waste_to_tableau": (lambda: bench_move("waste_to_tableau"), 5000, 1),
+    "move_from_waste_to_foundation": (lambda: bench_move("waste_to_foundation"), 5000, 1),
+    "move_from_tableau_to_foundation": (lambda: bench_move("tableau_to_foundation"), 5000, 1),
+    "move_from_tableau_to_tableau": (lambda: bench_move("tableau_to_tableau"), 5000, 1),
+    "move_from_foundation_to_tableau": (lambda: bench_move("foundation_to_tableau"), 5000, 1),
+    "random_game": (bench_random_game, 3, 1),
+    "batch_game": (bench_batch_game, 1, len(BATCH_SEEDS)),
+}
+
+def run(names=None, repeat=5, scale=1.0):
+    """Run the benchmarks; returns {name: microseconds per operation}."""
+    results = {}
+    for name in names or BENCHMARKS:
+        setup, number, ops = BENCHMARKS[name]
+        func = setup()
+        number = max(1, int(number * scale))
+        best = min(timeit.repeat(func, number=number, repeat=repeat))
+        results[name] = best / (number * ops) * 1e6
+    return results
+
+def games_per_second(results):
+    """{name: games per second} for the whole-game benchmarks among ``results``."""
+    return {name: 1e6 / results[name] for name in GAME_BENCHMARKS if name in results}
+
+def compare(results, baseline, threshold):
+    """Return [(name, baseline, current, ratio)] for benchmarks slower than baseline by more than threshold."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous and current > previous * (1 + threshold):
+            regressions.append((name, previous, current, current / previous))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Game hot paths.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default all): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply iteration counts")
+    args = parser.parse_args(argv)
+
+    results = run(args.names, args.repeat, args.scale)
+    throughput = games_per_second(results)
+    report = {"python": platform.python_version(), "unit": "us/op", "results": results,
+              "games_per_second": throughput}
+    for name, value in results.items():
+        games = f" {throughput[name]:10.1f} games/s" if name in throughput else ""
+        print(f"{name:34} {value:12.2f} us{games}")
+    if args.out:
+        with open(args.out, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, previous, current, ratio in regressions:
+            print(f"REGRESSION {name}: {previous:.2f} -> {current:.2f} us ({ratio:.2f}x)", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Persistent per-deal result cache.
+
+Results are keyed by the 52-byte initial deal (``Game.initial_deal``), the
+rule variant and the policy that produced them. A small in-memory LRU sits
+in front of an SQLite file so repeated lookups within a run never touch
+disk, and later runs skip every deal already recorded.
+"""
+from collections import OrderedDict
+from play import encode_move, decode_move
+from solver import WON
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    deal BLOB NOT NULL,
+    variant TEXT NOT NULL,
+    policy TEXT NOT NULL,
+    status TEXT NOT NULL,
+    foundation INTEGER NOT NULL,
+    length INTEGER,
+    moves BLOB,
+    PRIMARY KEY (deal, variant, policy)
+)
+"""
+
+def variant_name(draw_count=1, max_recycles=None, auto_foundation=False):
+    """Cache name of a rule variant; lines played with auto_foundation leave its safe moves out."""
+    name = f"draw{draw_count}-recycles{'inf' if max_recycles is None else max_recycles}"
+    return name + "-auto" if auto_foundation else name
+
+def pack_moves(moves):
+    """Flattened moves -> 4 bytes per move."""
+    return bytes(value for move in moves for value in encode_move(move))
+
+def unpack_moves(blob):
+    return [decode_move(tuple(blob[i:i + 4])) for i in range(0, len(blob), 4)]
+
+
+class CachedResult:
+    def __init__(self, status, foundation, length, moves):
+        self.status = status          # "won", "lost" or "unknown"
+        self.foundation = foundation  # cards on the foundations at the end
+        self.length = length          # moves played (the best known winning line once won), or None
+        self.moves = moves            # packed line (see unpack_moves), or None
+
+    def __repr__(self):
+        return f"CachedResult({self.status}, foundation={self.foundation}, length={self.length})"
+
+
+class ResultCache:
+    def __init__(self, path=":memory:", memory_size=100000):
+        self.db = sqlite3.connect(path)
+        self.db.execute(SCHEMA)
+        self.memory = OrderedDict()
+        self.memory_size = memory_size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, deal, variant, policy):
+        result = self._lookup((bytes(deal), variant, policy))
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def put(self, deal, variant, policy, status, foundation, moves=None, length=None):
+        """Record a result, keeping the shorter line if the deal was already won.
+
+        ``length`` is the number of moves played and defaults to the length
+        of ``moves``; pass it alone to record a game without keeping its line.
+        """
+        key = (bytes(deal), variant, policy)
+        if length is None and moves is not None:
+            length = len(moves)
+        existing = self._lookup(key)
+        if existing is not None and existing.status == WON:
+            shorter = status == WON and length is not None and (existing.length is None or length < existing.length)
+            if not shorter:
+                return existing
+        packed = pack_moves(moves) if moves is not None else None
+        result = CachedResult(status, foundation, length, packed)
+        self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        key + (status, foundation, length, packed))
+        self._remember(key, result)
+        return result
+
+    def _lookup(self, key):
+        result = self.memory.get(key)
+        if result is not None:
+            self.memory.move_to_end(key)
+            return result
+        row = self.db.execute(
+            "SELECT status, foundation, length, moves FROM results WHERE deal = ? AND variant = ? AND policy = ?",
+            key).fetchone()
+        if row is None:
+            return None
+        result = CachedResult(*row)
+        self._remember(key, result)
+        return result
+
+    def _remember(self, key, result):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def flush(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,111 @@
+"""Canonical positions: one key for every arrangement of the same game.
+
+Which column holds which pile makes no difference to how a position plays
+on, and neither does relabelling ♠ and ♣ (or ♥ and ♦) throughout: every
+move in one arrangement has a twin in the other. canonical_form sorts the
+columns (empty ones included) and, with ``suits``, also picks the smallest
+of the four color-preserving suit relabellings, so all such twins share
+one key. It works on main.Game and compact.CompactGame alike.
+
+Moves carry real column and suit indices. to_canonical and from_canonical
+translate ``(kind, a, b, c)`` moves (see main.MOVE_TYPES) between a real
+position and its canonical arrangement, as returned by canonical_game.
+"""
+from main import WASTE_TO_TABLEAU, TABLEAU_TO_FOUNDATION, TABLEAU_TO_TABLEAU, FOUNDATION_TO_TABLEAU
+from compact import CompactGame, RANK, SUIT, TABLEAU_CAPACITY, BYTES
+from deadend import columns, foundation_ranks
+
+# Color-preserving suit relabellings (SUITS order ♠♥♦♣); each is its own inverse
+SUIT_MAPS = [(0, 1, 2, 3), (3, 1, 2, 0), (0, 2, 1, 3), (3, 2, 1, 0)]
+# The same relabellings over card ints, as bytes.translate tables
+CARD_MAPS = [bytes(suit_map[SUIT[c]] * 13 + RANK[c] - 1 for c in range(52)) + bytes(range(52, 256))
+             for suit_map in SUIT_MAPS]
+
+def _parts(game):
+    """(foundations, cursor, pile, recycles, [(down, cards)]), laid out as in CompactGame.canonical_key."""
+    if isinstance(game, CompactGame):
+        pile = bytes(game.pile)
+        piles = [(game.down[i], bytes(game.cells[i * TABLEAU_CAPACITY:i * TABLEAU_CAPACITY + game.heights[i]]))
+                 for i in range(7)]
+    else:
+        pile = bytes(card.index for card in game.pile)
+        piles = [(down, bytes(cards)) for cards, down in columns(game)]
+    # Passes left only matter once they are limited
+    recycles = [BYTES[game.recycles]] if game.max_recycles is not None else []
+    return foundation_ranks(game), BYTES[game.cursor], pile, recycles, piles
+
+def canonical_form(game, suits=False):
+    """(key, order, swap) for ``game``.
+
+    ``key`` is equal for positions that differ only in column order (and,
+    with ``suits``, in same-color suit labels). Canonical column ``j`` is
+    real column ``order[j]``, and ``swap`` indexes SUIT_MAPS.
+    """
+    foundations, cursor, pile, recycles, piles = _parts(game)
+    best = None
+    for swap in range(4) if suits else (0,):
+        table, suit_map = CARD_MAPS[swap], SUIT_MAPS[swap]
+        encoded = sorted((BYTES[down] + cards.translate(table), i) for i, (down, cards) in enumerate(piles))
+        key = b"|".join([bytes(foundations[suit_map[s]] for s in range(4)), cursor, pile.translate(table)]
+                        + recycles + [column for column, i in encoded])
+        if best is None or key < best[0]:
+            best = (key, [i for column, i in encoded], swap)
+    return best
+
+def canonical_key(game, suits=False):
+    """Hashable key shared by every rearrangement of the position (see canonical_form)."""
+    if suits:
+        return canonical_form(game, suits)[0]
+    if isinstance(game, CompactGame):
+        return game.canonical_key()
+    foundations, cursor, pile, recycles, piles = _parts(game)
+    return b"|".join([bytes(foundations), cursor, pile] + recycles + sorted(BYTES[down] + cards for down, cards in piles))
+
+def canonical_game(game, suits=False):
+    """A CompactGame holding ``game`` rearranged as canonical_form describes."""
+    key, order, swap = canonical_form(game, suits)
+    foundations, cursor, pile, recycles, piles = _parts(game)
+    table, suit_map = CARD_MAPS[swap], SUIT_MAPS[swap]
+    canonical = CompactGame(deal=False, draw_count=game.draw_count, max_recycles=game.max_recycles)
+    for j, i in enumerate(order):
+        down, cards = piles[i]
+        base = j * TABLEAU_CAPACITY
+        canonical.cells[base:base + len(cards)] = cards.translate(table)
+        canonical.heights[j] = len(cards)
+        canonical.down[j] = down
+    canonical.foundations[:] = bytes(foundations[suit_map[s]] for s in range(4))
+    canonical.pile = bytearray(pile.translate(table))
+    canonical.cursor = game.cursor
+    canonical.recycles = game.recycles
+    canonical.initial_deal = game.initial_deal
+    return canonical
+
+def is_pointless(game, move):
+    """True for flattened moves that only change which column a whole pile sits in.
+
+    The position after such a move has the same canonical key as before it.
+    """
+    if move[0] != "tableau_to_tableau" or move[3]:
+        return False
+    if isinstance(game, CompactGame):
+        return not game.down[move[1]] and not game.heights[move[2]]
+    source, target = game.tableaus[move[1]], game.tableaus[move[2]]
+    return not source["face_down"] and not target["face_up"] and not target["face_down"]
+
+def _translate(move, column, suit_map):
+    kind, a, b, c = move
+    if kind in (WASTE_TO_TABLEAU, TABLEAU_TO_FOUNDATION):
+        return (kind, column(a), b, c)
+    elif kind == TABLEAU_TO_TABLEAU:
+        return (kind, column(a), column(b), c)
+    elif kind == FOUNDATION_TO_TABLEAU:
+        return (kind, suit_map[a], column(b), c)
+    return move
+
+def to_canonical(move, order, swap=0):
+    """A real ``(kind, a, b, c)`` move as played on the canonical arrangement."""
+    return _translate(move, order.index, SUIT_MAPS[swap])
+
+def from_canonical(move, order, swap=0):
+    """A ``(kind, a, b, c)`` move on the canonical arrangement as played on the real position."""
+    return _translate(move, order.__getitem__, SUIT_MAPS[swap])
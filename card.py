@@ -1,15 +1,55 @@
+SUITS = ["♠", "♥", "♦", "♣"]
+RANK_VALUES = {1:"A", 2:"2", 3:"3", 4:"4", 5:"5", 6:"6", 7:"7", 8:"8", 9:"9", 10:"10", 11:"J", 12:"Q", 13:"K"}
+
 class Card:
-    def __init__(self, rank, suit):
-        self.rank = rank
-        self.suit = suit
-        self.color = "red" if suit in ["♥", "♦"] else "black"
+    """An immutable playing card.
+
+    Cards are interned: ``Card(rank, suit)`` always returns the same object
+    for the same rank and suit, so equality is identity and dealing a game
+    only shuffles references. ``index`` is the card's position 0-51 in a
+    fresh deck (suit-major, as Deck.make_deck orders it). ``slot`` numbers
+    the card's (rank, color) and ``needs`` is the slot of the cards that go
+    on top of it, as in compact.SLOT and compact.NEEDS.
+    """
+
+    __slots__ = ("rank", "suit", "color", "index", "slot", "needs", "_str")
+    _interned = {}
+
+    def __new__(cls, rank, suit):
+        card = cls._interned.get((rank, suit))
+        if card is None:
+            card = object.__new__(cls)
+            object.__setattr__(card, "rank", rank)
+            object.__setattr__(card, "suit", suit)
+            object.__setattr__(card, "color", "red" if suit in ["♥", "♦"] else "black")
+            object.__setattr__(card, "index", SUITS.index(suit) * 13 + rank - 1 if suit in SUITS else -1)
+            red = card.color == "red"
+            object.__setattr__(card, "slot", rank * 2 + red)
+            object.__setattr__(card, "needs", (rank - 1) * 2 + (not red))
+            object.__setattr__(card, "_str", f"{RANK_VALUES.get(rank, rank)}{suit}")
+            cls._interned[(rank, suit)] = card
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card is immutable")
 
     def __str__(self):
-        RANK_VALUES = {1:"A", 2:"2", 3:"3", 4:"4", 5:"5", 6:"6", 7:"7", 8:"8", 9:"9", 10:"10", 11:"J", 12:"Q", 13:"K"}
-        return f"{RANK_VALUES[self.rank]}{self.suit}"
+        return self._str
 
     def __repr__(self):
-        return self.__str__()
+        return self._str
+
+    def __hash__(self):
+        return self.index
+
+    def __reduce__(self):
+        return (Card, (self.rank, self.suit))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
-    def __eq__(self, other):
-        return isinstance(other, Card) and self.rank == other.rank and self.suit == other.suit
\ No newline at end of file
+# The 52 cards in fresh-deck order
+DECK = tuple(Card(rank, suit) for suit in SUITS for rank in range(1, 14))
@@ -0,0 +1,206 @@
+"""Compact binary formats for deals, moves, positions and played games.
+
+    python -m codec --record games.ktr --deals 10000 --ranked
+    python -m codec --show games.ktr --index 42 --move 100
+
+* Deals: the 52-byte deck order (Game.initial_deal), or its rank among all
+  52! orders in DEAL_RANK_SIZE (29) bytes.
+* Moves: one opcode byte, plus a start-index byte for tableau-to-tableau
+  moves (see OPCODES).
+* Positions: Game.to_bytes / CompactGame.to_bytes, compact.STATE_RECORD.size
+  bytes each, so a file of them can be indexed like an array.
+* Traces: TRACE_HEADER, the deal, then the opcodes of every move played.
+  A trace file is traces back to back.
+
+Readers take any buffer (bytes, memoryview, mmap) and read fields in
+place with struct.unpack_from and indexing, so a file can be mapped and
+replayed without being read into memory or parsed first.
+"""
+from main import Game, DRAW, WASTE_TO_TABLEAU, WASTE_TO_FOUNDATION, TABLEAU_TO_FOUNDATION, TABLEAU_TO_TABLEAU, \
+    FOUNDATION_TO_TABLEAU
+from compact import CompactGame, STATE_RECORD, NO_LIMIT
+from play import encode_move
+from batch import play_random
+import argparse
+import math
+import mmap
+import random
+import struct
+import sys
+
+DEAL_SIZE = 52
+DEAL_RANK_SIZE = (math.factorial(52).bit_length() + 7) // 8
+
+# One-byte opcodes for every move but tableau-to-tableau, indexed by
+# (kind, a, b). Tableau-to-tableau moves take two bytes: TABLEAU_TO_TABLEAU_OP
+# | from * 7 + to, then the start index.
+OPCODES = {(DRAW, 0, 0): 0, (WASTE_TO_FOUNDATION, 0, 0): 1}
+OPCODES.update({(WASTE_TO_TABLEAU, i, 0): 2 + i for i in range(7)})
+OPCODES.update({(TABLEAU_TO_FOUNDATION, i, 0): 9 + i for i in range(7)})
+OPCODES.update({(FOUNDATION_TO_TABLEAU, s, i): 16 + s * 7 + i for s in range(4) for i in range(7)})
+OPCODE_MOVES = {op: (kind, a, b, 0) for (kind, a, b), op in OPCODES.items()}
+TABLEAU_TO_TABLEAU_OP = 0x80
+
+# magic, flags, draw count, max recycles (NO_LIMIT for none), opcode bytes
+TRACE_HEADER = struct.Struct("<4sBBBI")
+TRACE_MAGIC = b"KTR1"
+RANKED_DEAL = 1
+AUTO_FOUNDATION = 2
+
+def deal_rank(deal):
+    """The deal's rank among all 52! deck orders (its Lehmer code as one number)."""
+    remaining = list(range(52))
+    rank = 0
+    for card in deal:
+        i = remaining.index(card)
+        rank = rank * len(remaining) + i
+        remaining.pop(i)
+    return rank
+
+def deal_from_rank(rank):
+    """Inverse of deal_rank."""
+    digits = []
+    for radix in range(1, 53):
+        rank, digit = divmod(rank, radix)
+        digits.append(digit)
+    remaining = list(range(52))
+    return bytes(remaining.pop(digit) for digit in reversed(digits))
+
+def pack_deal(deal, ranked=False):
+    return deal_rank(deal).to_bytes(DEAL_RANK_SIZE, "little") if ranked else bytes(deal)
+
+def unpack_deal(buffer, offset=0, ranked=False):
+    if ranked:
+        return deal_from_rank(int.from_bytes(buffer[offset:offset + DEAL_RANK_SIZE], "little"))
+    return bytes(buffer[offset:offset + DEAL_SIZE])
+
+def move_opcodes(moves):
+    """Flattened moves (see play.flatten_moves) -> opcode bytes."""
+    out = bytearray()
+    for move in moves:
+        kind, a, b, c = encode_move(move)
+        if kind == TABLEAU_TO_TABLEAU:
+            out += bytes((TABLEAU_TO_TABLEAU_OP | a * 7 + b, c))
+        else:
+            out.append(OPCODES[kind, a, b])
+    return bytes(out)
+
+def iter_moves(buffer, start=0, end=None):
+    """Yield the ``(kind, a, b, c)`` moves (see main.MOVE_TYPES) of opcodes in ``buffer[start:end]``."""
+    end = len(buffer) if end is None else end
+    i = start
+    while i < end:
+        op = buffer[i]
+        if op & TABLEAU_TO_TABLEAU_OP:
+            a, b = divmod(op & ~TABLEAU_TO_TABLEAU_OP, 7)
+            yield (TABLEAU_TO_TABLEAU, a, b, buffer[i + 1])
+            i += 2
+        else:
+            yield OPCODE_MOVES[op]
+            i += 1
+
+def pack_trace(deal, moves, draw_count=1, max_recycles=None, auto_foundation=False, ranked=False):
+    """One played game as a trace: header, deal, then the opcodes of its flattened ``moves``."""
+    opcodes = move_opcodes(moves)
+    flags = (RANKED_DEAL if ranked else 0) | (AUTO_FOUNDATION if auto_foundation else 0)
+    header = TRACE_HEADER.pack(TRACE_MAGIC, flags, draw_count, NO_LIMIT if max_recycles is None else max_recycles,
+                               len(opcodes))
+    return header + pack_deal(deal, ranked) + opcodes
+
+
+class Trace:
+    """One game of a trace buffer. Moves are decoded from the buffer on demand."""
+
+    def __init__(self, buffer, offset=0):
+        magic, flags, self.draw_count, max_recycles, length = TRACE_HEADER.unpack_from(buffer, offset)
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"no trace at offset {offset}")
+        self.max_recycles = None if max_recycles == NO_LIMIT else max_recycles
+        self.auto_foundation = bool(flags & AUTO_FOUNDATION)
+        ranked = bool(flags & RANKED_DEAL)
+        start = offset + TRACE_HEADER.size
+        self.deal = unpack_deal(buffer, start, ranked)
+        self.buffer = buffer
+        self.start = start + (DEAL_RANK_SIZE if ranked else DEAL_SIZE)
+        self.end = self.start + length
+        if self.end > len(buffer):
+            raise ValueError(f"trace at offset {offset} is cut short")
+
+    def __iter__(self):
+        return iter_moves(self.buffer, self.start, self.end)
+
+    def game(self):
+        """A fresh Game at the start of the trace."""
+        return Game(draw_count=self.draw_count, max_recycles=self.max_recycles, auto_foundation=self.auto_foundation,
+                    initial_deal=self.deal)
+
+    def replay(self, moves=None):
+        """The Game after the first ``moves`` moves (all of them when None)."""
+        game = self.game()
+        for i, move in enumerate(self):
+            if i == moves:
+                break
+            game.make_move(move)
+        return game
+
+    def positions(self):
+        """Yield (move, game) after each move; the same Game object is updated in place."""
+        game = self.game()
+        for move in self:
+            game.make_move(move)
+            yield move, game
+
+
+def read_traces(buffer):
+    """Yield every Trace in a buffer of back-to-back traces."""
+    offset = 0
+    while offset < len(buffer):
+        trace = Trace(buffer, offset)
+        yield trace
+        offset = trace.end
+
+def iter_states(buffer):
+    """Yield a CompactGame for every STATE_RECORD in ``buffer``."""
+    for offset in range(0, len(buffer) - STATE_RECORD.size + 1, STATE_RECORD.size):
+        yield CompactGame.from_bytes(buffer, offset)
+
+def map_file(path):
+    """Map ``path`` read-only; use as ``with map_file(path) as buffer: ...``."""
+    with open(path, "rb") as handle:
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and replay binary Klondike game traces.")
+    parser.add_argument("--record", metavar="PATH", help="play random-bot games and write their traces")
+    parser.add_argument("--show", metavar="PATH", help="print a position from a trace file")
+    parser.add_argument("--deals", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first deal")
+    parser.add_argument("--max-moves", type=int, default=2000)
+    parser.add_argument("--ranked", action="store_true", help="store deals as 29-byte ranks")
+    parser.add_argument("--auto-foundation", action="store_true", help="follow every move with the safe foundation moves")
+    parser.add_argument("--index", type=int, default=0, help="trace to show")
+    parser.add_argument("--move", type=int, default=None, help="moves to replay before showing (default all)")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        size = 0
+        with open(args.record, "wb") as handle:
+            for seed in range(args.seed, args.seed + args.deals):
+                game = Game(seed=seed, auto_foundation=args.auto_foundation)
+                moves, outcome = play_random(game, random.Random(seed), args.max_moves)
+                size += handle.write(pack_trace(game.initial_deal, moves, auto_foundation=args.auto_foundation,
+                                                ranked=args.ranked))
+        print(f"{args.deals} traces, {size} bytes", file=sys.stderr)
+    if args.show:
+        with map_file(args.show) as buffer:
+            count = 0
+            for trace in read_traces(buffer):
+                if count == args.index:
+                    trace.replay(args.move).print_state()
+                    break
+                count += 1
+            else:
+                sys.exit(f"{args.show} holds only {count} traces")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+from card import DECK, SUITS, RANK_VALUES
+import random
+import struct
+
+# Cards are encoded as integers 0-51: suit_index * 13 + (rank - 1).
+# This matches the order Deck.make_deck builds the deck in, so a seeded
+# CompactGame deals exactly the same cards as a seeded Game.
+SUIT_INDEX = {suit: idx for idx, suit in enumerate(SUITS)}
+
+RANK = tuple(c % 13 + 1 for c in range(52))
+SUIT = tuple(c // 13 for c in range(52))
+COLOR = tuple(1 if SUIT[c] in (1, 2) else 0 for c in range(52))  # 1 = red, 0 = black
+# SLOT identifies a card by (rank, color); NEEDS is the slot a card accepts on top of it
+SLOT = tuple(RANK[c] * 2 + COLOR[c] for c in range(52))
+NEEDS = tuple((RANK[c] - 1) * 2 + 1 - COLOR[c] for c in range(52))
+CARD_STR = tuple(f"{RANK_VALUES[RANK[c]]}{SUITS[SUIT[c]]}" for c in range(52))
+
+# 6 face-down cards under a full King..Ace run is the tallest pile possible
+TABLEAU_CAPACITY = 19
+ALL_COMPLETE = bytes((13, 13, 13, 13))
+BYTES = tuple(bytes((i,)) for i in range(256))
+
+# Fixed-size position record (see CompactGame.to_bytes): cells, heights,
+# down, foundations, pile (zero-padded to the 24 cards it can hold), pile
+# length, cursor, recycles, draw count, max recycles (NO_LIMIT for none),
+# moves since progress and the initial deal (all zeros when unknown).
+# Without a limit the recycle count doesn't affect play and is stored
+# clamped to 255, like moves since progress to 0xFFFF; limits must stay
+# below NO_LIMIT.
+STATE_RECORD = struct.Struct(f"<{7 * TABLEAU_CAPACITY}s7s7s4s24sBBBBBH52s")
+NO_LIMIT = 255
+
+def card_to_int(card):
+    return card.index
+
+def int_to_card(c):
+    return DECK[c]
+
+def is_safe_to_foundation(card, foundations):
+    """Whether card int ``card``, next up on its foundation, can go there without ever hurting.
+
+    ``foundations`` holds the four foundation ranks in SUITS order. Aces
+    and Twos are always safe. Any other card must no longer be needed to
+    hold an opposite-color card one rank lower, so both of those are up,
+    and must not be needed back on the tableau under a card taken down
+    from a foundation, so the same-color suit is at most two ranks behind.
+    """
+    rank = RANK[card]
+    if rank <= 2:
+        return True
+    if COLOR[card]:  # red: both black foundations
+        opposite = min(foundations[0], foundations[3])
+    else:
+        opposite = min(foundations[1], foundations[2])
+    return opposite >= rank - 1 and foundations[3 - SUIT[card]] >= rank - 2
+
+def deal_for_seed(seed):
+    """The 52-byte deal Game(seed=seed) and CompactGame(seed=seed) start from."""
+    deck = list(range(52))
+    random.Random(seed).shuffle(deck)
+    return bytes(deck)
+
+
+class CompactGame:
+    """Integer-encoded Klondike state with the same move API as main.Game.
+
+    Each tableau lives in a fixed slot of ``cells``: ``heights[i]`` cards in
+    total, the first ``down[i]`` of them face down. Foundations are four rank
+    counters. Stock and waste share one array split by ``cursor``: cards
+    before the cursor are the waste (top at ``cursor - 1``), cards from the
+    cursor on are the stock (next draw at ``cursor``). ``draw_count`` and
+    ``max_recycles`` select the rule variant as in main.Game.
+    """
+
+    __slots__ = ("cells", "heights", "down", "foundations", "pile", "cursor",
+                 "draw_count", "max_recycles", "recycles", "initial_deal",
+                 "history", "moves_since_progress")
+
+    def __init__(self, deal=True, seed=None, draw_count=1, max_recycles=None):
+        self.cells = bytearray(7 * TABLEAU_CAPACITY)
+        self.heights = bytearray(7)
+        self.down = bytearray(7)
+        self.foundations = bytearray(4)
+        self.pile = bytearray()
+        self.cursor = 0
+        self.draw_count = draw_count
+        self.max_recycles = max_recycles
+        self.recycles = 0
+        self.history = {}
+        self.moves_since_progress = 0
+        self.initial_deal = None
+        if deal:
+            deck = list(range(52))
+            (random.Random(seed) if seed is not None else random).shuffle(deck)
+            self.initial_deal = bytes(deck)
+            for i in range(7):
+                base = i * TABLEAU_CAPACITY
+                for j in range(i + 1):
+                    self.cells[base + j] = deck.pop()
+                self.heights[i] = i + 1
+                self.down[i] = i
+            self.pile = bytearray(deck)
+
+    @classmethod
+    def from_game(cls, game):
+        """Build a CompactGame holding the same position as a main.Game."""
+        compact = cls(deal=False, draw_count=game.draw_count, max_recycles=game.max_recycles)
+        for i, pile in enumerate(game.tableaus):
+            cards = [card_to_int(c) for c in pile["face_down"] + pile["face_up"]]
+            base = i * TABLEAU_CAPACITY
+            compact.cells[base:base + len(cards)] = bytes(cards)
+            compact.heights[i] = len(cards)
+            compact.down[i] = len(pile["face_down"])
+        for suit, foundation in game.foundations.items():
+            compact.foundations[SUIT_INDEX[suit]] = len(foundation)
+        compact.pile = bytearray(card_to_int(c) for c in list(game.waste) + list(game.stock))
+        compact.cursor = len(game.waste)
+        compact.recycles = game.recycles
+        compact.initial_deal = game.initial_deal
+        compact.moves_since_progress = game.moves_since_progress
+        return compact
+
+    def to_bytes(self):
+        """The position as one STATE_RECORD.size-byte record."""
+        return STATE_RECORD.pack(bytes(self.cells), bytes(self.heights), bytes(self.down), bytes(self.foundations),
+                                 bytes(self.pile), len(self.pile), self.cursor,
+                                 min(self.recycles, 0xFF) if self.max_recycles is None else self.recycles,
+                                 self.draw_count, NO_LIMIT if self.max_recycles is None else self.max_recycles,
+                                 min(self.moves_since_progress, 0xFFFF), self.initial_deal or bytes(52))
+
+    @classmethod
+    def from_bytes(cls, buffer, offset=0):
+        """Read a to_bytes record at ``offset`` of any buffer (bytes, memoryview, mmap) without copying it first."""
+        (cells, heights, down, foundations, pile, pile_len, cursor, recycles, draw_count, max_recycles,
+         moves_since_progress, initial_deal) = STATE_RECORD.unpack_from(buffer, offset)
+        game = cls(deal=False, draw_count=draw_count, max_recycles=None if max_recycles == NO_LIMIT else max_recycles)
+        game.cells[:] = cells
+        game.heights[:] = heights
+        game.down[:] = down
+        game.foundations[:] = foundations
+        game.pile = bytearray(pile[:pile_len])
+        game.cursor = cursor
+        game.recycles = recycles
+        game.moves_since_progress = moves_since_progress
+        game.initial_deal = initial_deal if any(initial_deal) else None
+        return game
+
+    def copy(self):
+        other = CompactGame(deal=False, draw_count=self.draw_count, max_recycles=self.max_recycles)
+        other.cells[:] = self.cells
+        other.heights[:] = self.heights
+        other.down[:] = self.down
+        other.foundations[:] = self.foundations
+        other.pile = bytearray(self.pile)
+        other.cursor = self.cursor
+        other.recycles = self.recycles
+        other.initial_deal = self.initial_deal
+        other.moves_since_progress = self.moves_since_progress
+        return other
+
+    @property
+    def stock(self):
+        return bytes(self.pile[self.cursor:])
+
+    @property
+    def waste(self):
+        return bytes(self.pile[:self.cursor])
+
+    def format_state(self):
+        """Same text as Game.format_state."""
+        lines = ["Tableaus:"]
+        for idx in range(7):
+            base = idx * TABLEAU_CAPACITY
+            face_up = "".join(CARD_STR[c] + " " for c in self.cells[base + self.down[idx]:base + self.heights[idx]])
+            lines.append(f"Pile {idx}: " + "XX " * self.down[idx] + face_up)
+
+        lines.append("\nFoundations:")
+        for s, suit in enumerate(SUITS):
+            if self.foundations[s]:
+                lines.append(f"{suit}: " + "".join(CARD_STR[s * 13 + r] + " " for r in range(self.foundations[s])))
+            else:
+                lines.append(f"{suit}: -")
+
+        lines.append(f"\nStock cards remaining: {len(self.pile) - self.cursor}")
+        lines.append(f"Top of Waste: {CARD_STR[self.pile[self.cursor - 1]] if self.cursor else '-'}")
+        lines.append("-"*40)
+        return "\n".join(lines) + "\n"
+
+    def print_state(self):
+        print(self.format_state(), end="")
+
+    def can_recycle(self):
+        return self.max_recycles is None or self.recycles < self.max_recycles
+
+    def recycle_stock(self):
+        if self.cursor and self.can_recycle():
+            self.cursor = 0
+            self.recycles += 1
+            return True
+        return False
+
+    def draw_from_stock(self):
+        if self.cursor == len(self.pile):
+            self.recycle_stock()
+
+        count = min(self.draw_count, len(self.pile) - self.cursor)
+        if count:
+            self.cursor += count
+            self.increment_moves()  # drawing doesn't improve progress
+            return self.pile[self.cursor - 1]
+        return None
+
+    def can_place_on_tableau(self, card, tableau_index):
+        if 0 <= tableau_index < 7:
+            height = self.heights[tableau_index]
+            if height > self.down[tableau_index]:
+                top_card = self.cells[tableau_index * TABLEAU_CAPACITY + height - 1]
+                return RANK[top_card] == RANK[card] + 1 and COLOR[top_card] != COLOR[card]
+            elif not height:
+                return RANK[card] == 13
+        return False
+
+    def _push(self, tableau_index, card):
+        height = self.heights[tableau_index]
+        self.cells[tableau_index * TABLEAU_CAPACITY + height] = card
+        self.heights[tableau_index] = height + 1
+
+    def _pop_waste(self):
+        self.cursor -= 1
+        card = self.pile[self.cursor]
+        del self.pile[self.cursor]
+        return card
+
+    def move_from_waste_to_tableau(self, tableau_index):
+        if 0 <= tableau_index < 7 and self.cursor:
+            card = self.pile[self.cursor - 1]
+            if self.can_place_on_tableau(card, tableau_index):
+                self._push(tableau_index, self._pop_waste())
+                self.make_progress()
+                return True
+        self.increment_moves()
+        return False
+
+    def move_from_tableau_to_tableau(self, from_tableau, to_tableau, start_index):
+        if 0 <= from_tableau < 7 and 0 <= to_tableau < 7:
+            down = self.down[from_tableau]
+            height = self.heights[from_tableau]
+            if start_index < height - down:
+                src = from_tableau * TABLEAU_CAPACITY + down + start_index
+                if self.can_place_on_tableau(self.cells[src], to_tableau):
+                    count = height - down - start_index
+                    dst = to_tableau * TABLEAU_CAPACITY + self.heights[to_tableau]
+                    self.cells[dst:dst + count] = self.cells[src:src + count]
+                    self.heights[to_tableau] += count
+                    self.heights[from_tableau] = height - count
+                    if down and start_index == 0:
+                        self.down[from_tableau] = down - 1
+                        self.make_progress()  # flipped card is progress
+                    else:
+                        self.increment_moves()
+                    return True
+        self.increment_moves()
+        return False
+
+    def can_move_to_foundation(self, card):
+        return RANK[card] == self.foundations[SUIT[card]] + 1
+
+    def move_from_tableau_to_foundation(self, tableau_index):
+        if 0 <= tableau_index < 7:
+            height = self.heights[tableau_index]
+            if height > self.down[tableau_index]:
+                card = self.cells[tableau_index * TABLEAU_CAPACITY + height - 1]
+                if self.can_move_to_foundation(card):
+                    self.heights[tableau_index] = height - 1
+                    self.foundations[SUIT[card]] += 1
+                    self.flip_next_card_if_needed(tableau_index)
+                    self.make_progress()
+                    return True
+        self.increment_moves()
+        return False
+
+    def move_from_waste_to_foundation(self):
+        if self.cursor:
+            card = self.pile[self.cursor - 1]
+            if self.can_move_to_foundation(card):
+                self._pop_waste()
+                self.foundations[SUIT[card]] += 1
+                self.make_progress()
+                return True
+        self.increment_moves()
+        return False
+
+    def move_from_foundation_to_tableau(self, suit, tableau_index):
+        if 0 <= tableau_index < 7:
+            s = SUIT_INDEX.get(suit)
+            if s is not None and self.foundations[s]:
+                card = s * 13 + self.foundations[s] - 1
+                if self.can_place_on_tableau(card, tableau_index):
+                    self.foundations[s] -= 1
+                    self._push(tableau_index, card)
+                    self.increment_moves()  # this is usually back-and-forth, not progress
+                    return True
+        self.increment_moves()
+        return False
+
+    def flip_next_card_if_needed(self, tableau_index):
+        down = self.down[tableau_index]
+        if down and self.heights[tableau_index] == down:
+            self.down[tableau_index] = down - 1
+            self.make_progress()
+
+    def is_won(self):
+        return self.foundations == ALL_COMPLETE
+
+    def foundation_count(self):
+        return sum(self.foundations)
+
+    def get_all_legal_moves(self):
+        """Same layout as Game.get_all_legal_moves, with int cards in place of Card objects."""
+        moves = {
+            "draw": [],
+            "waste_to_tableau": [],
+            "waste_to_foundation": [],
+            "tableau_to_foundation": [],
+            "tableau_to_tableau": [],
+            "foundation_to_tableau": []
+        }
+        cells = self.cells
+        heights = self.heights
+        down = self.down
+        foundations = self.foundations
+
+        # Index of which piles accept each (rank, color) slot, so targets are a lookup
+        accepts = {}
+        for i in range(7):
+            height = heights[i]
+            if height > down[i]:
+                top = cells[i * TABLEAU_CAPACITY + height - 1]
+                accepts.setdefault(NEEDS[top], []).append(i)
+            elif not height:
+                accepts.setdefault(26, []).append(i)  # empty pile takes a King of either color
+                accepts.setdefault(27, []).append(i)
+        targets = accepts.get
+        no_targets = ()
+
+        if self.cursor < len(self.pile) or (self.cursor and self.can_recycle()):
+            moves["draw"].append(None)
+
+        if self.cursor:
+            top_waste = self.pile[self.cursor - 1]
+            moves["waste_to_tableau"].extend(targets(SLOT[top_waste], no_targets))
+            if RANK[top_waste] == foundations[SUIT[top_waste]] + 1:
+                moves["waste_to_foundation"].append(top_waste)
+
+        for i in range(7):
+            height = heights[i]
+            if height > down[i]:
+                top = cells[i * TABLEAU_CAPACITY + height - 1]
+                if RANK[top] == foundations[SUIT[top]] + 1:
+                    moves["tableau_to_foundation"].append((i, top))
+
+        for from_idx in range(7):
+            base = from_idx * TABLEAU_CAPACITY
+            first = down[from_idx]
+            for start in range(heights[from_idx] - first):
+                for to_idx in targets(SLOT[cells[base + first + start]], no_targets):
+                    if to_idx != from_idx:
+                        moves["tableau_to_tableau"].append((from_idx, to_idx, start))
+
+        for s in range(4):
+            if foundations[s]:
+                for idx in targets(SLOT[s * 13 + foundations[s] - 1], no_targets):
+                    moves["foundation_to_tableau"].append((SUITS[s], idx))
+
+        return moves
+
+    def make_progress(self):
+        """Call when a move improves the game (foundation or flip)."""
+        self.moves_since_progress = 0
+
+    def increment_moves(self):
+        """Call for moves that don't improve the game."""
+        self.moves_since_progress += 1
+
+    def snapshot(self):
+        """Same tuple layout as Game.snapshot, so the two engines compare directly."""
+        def pair(c):
+            return (RANK[c], SUITS[SUIT[c]])
+        tableaus_snapshot = []
+        for i in range(7):
+            base = i * TABLEAU_CAPACITY
+            split = base + self.down[i]
+            tableaus_snapshot.append((tuple(pair(c) for c in self.cells[base:split]),
+                                      tuple(pair(c) for c in self.cells[split:base + self.heights[i]])))
+        foundations_snapshot = tuple(
+            tuple(pair(s * 13 + r) for r in range(self.foundations[s]))
+            for s in range(4)
+        )
+        stock_snapshot = tuple(pair(c) for c in self.pile[self.cursor:])
+        waste_snapshot = tuple(pair(c) for c in self.pile[:self.cursor])
+        return (tuple(tableaus_snapshot), foundations_snapshot, stock_snapshot, waste_snapshot)
+
+    @property
+    def state_hash(self):
+        """Hash of canonical_key, so like Game.state_hash it ignores column order."""
+        return hash(self.canonical_key())
+
+    def key(self):
+        """Compact hashable encoding of the position (30-ish bytes vs. a nested tuple)."""
+        parts = [bytes(self.foundations), bytes(self.down), bytes((self.cursor,)), bytes(self.pile)]
+        if self.max_recycles is not None:
+            parts.append(bytes((self.recycles,)))  # passes left matter once they are limited
+        for i in range(7):
+            base = i * TABLEAU_CAPACITY
+            parts.append(bytes(self.cells[base:base + self.heights[i]]))
+        return b"|".join(parts)
+
+    def canonical_key(self):
+        """Like key(), but equal for positions that differ only in column order (see canon.py)."""
+        cells, heights, down = self.cells, self.heights, self.down
+        parts = [bytes(self.foundations), BYTES[self.cursor], bytes(self.pile)]
+        if self.max_recycles is not None:
+            parts.append(BYTES[self.recycles])
+        parts += sorted([BYTES[down[i]] + cells[i * TABLEAU_CAPACITY:i * TABLEAU_CAPACITY + heights[i]]
+                         for i in range(7)])
+        return b"|".join(parts)
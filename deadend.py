@@ -0,0 +1,95 @@
+"""Static dead-end checks: positions that provably can't be won.
+
+Both checks work on main.Game and compact.CompactGame alike and are sound:
+when they report a dead end, no sequence of moves wins from there.
+
+* stock_is_dead: nothing but draws is legal, and no card the stock can
+  bring to the top of the waste (within the recycles left) would play.
+  Drawing never changes the tableau or the foundations, so the stock just
+  cycles forever.
+* blocked_card: some tableau card can never leave its column, because both
+  cards it could be moved onto and a lower card of its own suit are buried
+  beneath it. That lower card can then never reach its foundation.
+
+play.is_softlocked catches what these miss: positions that keep coming
+back because the moves being played go in circles.
+"""
+from compact import CompactGame, RANK, SUIT, COLOR, SLOT, NEEDS, TABLEAU_CAPACITY
+
+DEAD_STOCK = "dead_stock"
+BLOCKED = "blocked"
+
+# Bit masks over card ints: the two cards each card can be moved onto and
+# the lower cards of its suit. Kings can go to any empty column, so they
+# get no lower cards and never count as blocked.
+PARENTS_MASK = tuple(sum(1 << (s * 13 + RANK[c]) for s in range(4) if RANK[c] < 13 and COLOR[s * 13] != COLOR[c])
+                     for c in range(52))
+LOWER_MASK = tuple(0 if RANK[c] == 13 else sum(1 << (SUIT[c] * 13 + r) for r in range(RANK[c] - 1))
+                   for c in range(52))
+
+def columns(game):
+    """Each tableau as (card ints bottom to top, face-down count)."""
+    if isinstance(game, CompactGame):
+        return [(game.cells[i * TABLEAU_CAPACITY:i * TABLEAU_CAPACITY + game.heights[i]], game.down[i])
+                for i in range(7)]
+    return [([card.index for card in pile["face_down"] + pile["face_up"]], len(pile["face_down"]))
+            for pile in game.tableaus]
+
+def foundation_ranks(game):
+    """Cards on each foundation, in SUITS order."""
+    if isinstance(game, CompactGame):
+        return list(game.foundations)
+    return [len(foundation) for foundation in game.foundations.values()]
+
+def waste_tops(game):
+    """Every card that can be on top of the waste by drawing alone."""
+    pile = game.pile if isinstance(game, CompactGame) else [card.index for card in game.pile]
+    step = game.draw_count
+    tops = set()
+    if game.cursor:
+        tops.add(pile[game.cursor - 1])
+    # The rest of this pass, then every later pass if the stock may be turned over
+    starts = [game.cursor, 0] if game.can_recycle() else [game.cursor]
+    for start in starts:
+        for cursor in range(start + step, len(pile) + step, step):
+            tops.add(pile[min(cursor, len(pile)) - 1])
+    return tops
+
+def stock_is_dead(game, legal_moves):
+    """True when only draws are legal and drawing can never change that."""
+    if not legal_moves["draw"] or any(moves for kind, moves in legal_moves.items() if kind != "draw"):
+        return False
+    foundations = foundation_ranks(game)
+    accepts = set()
+    empty_column = False
+    for cards, down in columns(game):
+        if cards:
+            accepts.add(NEEDS[cards[-1]])
+        else:
+            empty_column = True
+    for card in waste_tops(game):
+        if foundations[SUIT[card]] == RANK[card] - 1 or SLOT[card] in accepts or (empty_column and RANK[card] == 13):
+            return False
+    return True
+
+def blocked_card(game):
+    """A tableau card (int) that can never move and keeps a lower card of its suit buried, or None.
+
+    Only face-down cards and the lowest face-up card of each column are
+    checked: cards above those can still leave as part of a run.
+    """
+    for cards, down in columns(game):
+        beneath = 0
+        for card in cards[:down + 1] if down else ():
+            if beneath & PARENTS_MASK[card] == PARENTS_MASK[card] and beneath & LOWER_MASK[card]:
+                return card
+            beneath |= 1 << card
+    return None
+
+def dead_end(game, legal_moves):
+    """DEAD_STOCK or BLOCKED when the position is provably lost, otherwise None."""
+    if stock_is_dead(game, legal_moves):
+        return DEAD_STOCK
+    if blocked_card(game) is not None:
+        return BLOCKED
+    return None
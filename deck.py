@@ -1,4 +1,4 @@
-from card import Card
+from card import DECK
 import random
 
 class Deck:
@@ -6,12 +6,11 @@ class Deck:
         self.deck = self.make_deck()
 
     def make_deck(self):
-        RANKS = list(range(1, 14))
-        SUITS = ["♠", "♥", "♦", "♣"]
-        return [Card(rank, suit) for suit in SUITS for rank in RANKS]
+        return list(DECK)  # cards are interned, so a new deck is just new references
 
-    def shuffle(self):
-        random.shuffle(self.deck)
+    def shuffle(self, rng=None):
+        """Shuffle with ``rng`` (e.g. random.Random(seed)) for a reproducible deal."""
+        (rng or random).shuffle(self.deck)
 
     def draw(self):
         if len(self.deck) > 0:
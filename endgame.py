@@ -0,0 +1,166 @@
+"""Exact endgame solving once every tableau card is face up.
+
+With nothing face down the deal holds no more surprises, so the rest of
+the game can be settled exactly:
+
+* Stock and waste empty: always won. Every column is then a single run,
+  so the lowest card still in play sits on top of its column and is the
+  next card its foundation needs. Sending tops home greedily wins.
+* Otherwise: a depth-first search over positions, with safe foundation
+  moves collapsed as in the solver and a node budget.
+
+An EndgameTable remembers what its searches learn, keyed by canonical
+position (canon.canonical_form) and rules, so one table serves every
+game of a batch: a won position stores its next move, a lost one LOST.
+It is a bounded LRU, so memory stays flat however many games use it.
+"""
+from compact import CompactGame, TABLEAU_CAPACITY
+from canon import canonical_form, to_canonical, from_canonical, is_pointless
+from play import flatten_moves, apply_move, encode_move, decode_move
+from solver import play_safe_moves, WON, LOST, UNKNOWN
+from collections import OrderedDict
+
+# Move kinds in the order the search tries them
+MOVE_ORDER = {"tableau_to_foundation": 0, "waste_to_foundation": 0, "waste_to_tableau": 1,
+              "tableau_to_tableau": 2, "draw": 3, "foundation_to_tableau": 4}
+
+def is_endgame(game):
+    """True once no tableau card is face down."""
+    if isinstance(game, CompactGame):
+        return not any(game.down)
+    return not any(pile["face_down"] for pile in game.tableaus)
+
+def greedy_line(game):
+    """Foundation moves that win an endgame with an empty stock and waste, played on ``game``."""
+    line = []
+    moved = True
+    while moved:
+        moved = False
+        for i in range(7):
+            height = game.heights[i]
+            if height > game.down[i] and game.can_move_to_foundation(game.cells[i * TABLEAU_CAPACITY + height - 1]):
+                move = ("tableau_to_foundation", i, None)
+                apply_move(game, move)
+                line.append(move)
+                moved = True
+    return line
+
+def ordered_moves(game):
+    moves = [move for move in flatten_moves(game.get_all_legal_moves()) if not is_pointless(game, move)]
+    moves.sort(key=lambda move: MOVE_ORDER[move[0]])
+    return moves
+
+
+class EndgameTable:
+    """Bounded memo of endgame results shared across games.
+
+    ``max_entries`` bounds the table; ``max_nodes`` bounds each search, and
+    a search that runs out reports UNKNOWN without recording anything.
+    """
+
+    def __init__(self, max_entries=200000, max_nodes=5000):
+        self.max_entries = max_entries
+        self.max_nodes = max_nodes
+        self.entries = OrderedDict()  # (rules, canonical key) -> canonical next move, or LOST
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, game, canonical):
+        return (game.draw_count, game.max_recycles, canonical)
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def solve(self, game):
+        """(status, line) for an endgame position; ``game`` itself is left alone.
+
+        ``line`` is the winning list of flattened moves when status is WON,
+        otherwise None.
+        """
+        state = game.copy() if isinstance(game, CompactGame) else CompactGame.from_game(game)
+        line = play_safe_moves(state)
+        if state.is_won() or not state.pile:
+            return WON, line + greedy_line(state)
+        canonical, order, swap = canonical_form(state)
+        key = self._key(state, canonical)
+        entry = self._get(key)
+        if entry == LOST:
+            self.hits += 1
+            return LOST, None
+        if entry is None:
+            self.misses += 1
+            status, rest = self._search(state, key, order)
+        else:
+            self.hits += 1
+            status, rest = WON, self._replay(state, key, order, entry)
+        return (WON, line + rest) if status == WON else (status, None)
+
+    def _replay(self, state, key, order, entry):
+        """Follow stored moves from a known-won ``state``, played on it, to the end of the game."""
+        line = []
+        while True:
+            move = decode_move(from_canonical(entry, order))
+            apply_move(state, move)
+            line.append(move)
+            line += play_safe_moves(state)
+            if state.is_won() or not state.pile:
+                return line + greedy_line(state)
+            canonical, order, swap = canonical_form(state)
+            key = self._key(state, canonical)
+            entry = self._get(key)
+            if entry is None:  # evicted since it was stored: search again from here
+                status, rest = self._search(state, key, order)
+                return line + rest
+
+    def _search(self, root, root_key, root_order):
+        """Depth-first search from ``root``; returns (status, winning line or None) and records the result."""
+        visited = [root_key]
+        seen = {root_key}
+        # Each frame: [state, key, order, untried moves, moves taken to the next frame]
+        stack = [[root, root_key, root_order, iter(ordered_moves(root)), None]]
+        nodes = 0
+        while stack:
+            frame = stack[-1]
+            move = next(frame[3], None)
+            if move is None:
+                stack.pop()
+                continue
+            child = frame[0].copy()
+            apply_move(child, move)
+            frame[4] = [move] + play_safe_moves(child)
+            if child.is_won() or not child.pile:
+                tail = greedy_line(child)
+                break
+            canonical, order, swap = canonical_form(child)
+            key = self._key(child, canonical)
+            entry = self.entries.get(key)
+            if entry is not None and entry != LOST:
+                tail = self._replay(child, key, order, entry)
+                break
+            if entry == LOST or key in seen:
+                continue
+            nodes += 1
+            if nodes > self.max_nodes:
+                return UNKNOWN, None
+            seen.add(key)
+            visited.append(key)
+            stack.append([child, key, order, iter(ordered_moves(child)), None])
+        else:
+            # Everything reachable from the root was explored without a win
+            for key in visited:
+                self._put(key, LOST)
+            return LOST, None
+        line = []
+        for state, key, order, moves, segment in stack:
+            self._put(key, to_canonical(encode_move(segment[0]), order))
+            line += segment
+        return WON, line + tail
@@ -0,0 +1,184 @@
+"""Opt-in instrumentation for main.Game.
+
+    python -m instrument --deals 50 --policy random --out profile.json --trace 100
+
+A Profiler attached to a Game wraps the game's move, undo, legal-move and
+hashing methods with timing wrappers set on that one instance. Games that
+are never attached run the plain class methods, so instrumentation costs
+nothing unless it is switched on. Times are inclusive: a draw that has to
+recycle the stock counts towards both draw_from_stock and recycle_stock,
+and play_safe_moves includes the foundation moves it triggers.
+
+The summary (see Profiler.summary) has call counts and seconds per method,
+the legal moves seen per step, search node rates reported by the solver
+and hit rates of watched caches. ``sample_every`` keeps every n-th call
+as a trace event, up to ``max_trace`` events.
+"""
+from main import Game
+from compact import deal_for_seed
+from batch import POLICIES, cached_policy
+from solver import Solver, WON
+from cache import ResultCache, variant_name
+from collections import Counter
+import argparse
+import json
+import random
+import sys
+import time
+
+MOVE_METHODS = ["draw_from_stock", "recycle_stock", "move_from_waste_to_tableau", "move_from_waste_to_foundation",
+                "move_from_tableau_to_foundation", "move_from_tableau_to_tableau", "move_from_foundation_to_tableau",
+                "play_safe_moves", "undo"]
+STATE_METHODS = ["snapshot", "rehash"]
+LEGAL_METHOD = "get_all_legal_moves"
+METHODS = MOVE_METHODS + STATE_METHODS + [LEGAL_METHOD]
+
+
+class Profiler:
+    def __init__(self, sample_every=0, max_trace=10000, clock=time.perf_counter):
+        self.sample_every = sample_every
+        self.max_trace = max_trace
+        self.clock = clock
+        self.started = clock()
+        self.calls = dict.fromkeys(METHODS, 0)
+        self.seconds = dict.fromkeys(METHODS, 0.0)
+        self.legal_moves = Counter()  # legal moves per step -> steps
+        self.nodes = 0
+        self.generated = 0            # children generated by the solver
+        self.duplicates = 0           # ... that were already in its seen set
+        self.search_seconds = 0.0
+        self.caches = {}              # name -> (cache, hits, misses) when first watched
+        self.trace = []
+        self._count = 0
+
+    def attach(self, game):
+        """Instrument ``game`` (a main.Game); returns it."""
+        for name in METHODS:
+            method = getattr(type(game), name).__get__(game)
+            setattr(game, name, self._wrap(game, name, method))
+        return game
+
+    def detach(self, game):
+        """Put ``game`` back on the plain class methods."""
+        for name in METHODS:
+            game.__dict__.pop(name, None)
+
+    def _wrap(self, game, name, method):
+        clock = self.clock
+        calls, seconds = self.calls, self.seconds
+        legal = name == LEGAL_METHOD
+
+        def timed(*args):
+            start = clock()
+            result = method(*args)
+            elapsed = clock() - start
+            calls[name] += 1
+            seconds[name] += elapsed
+            if legal:
+                self.legal_moves[sum(map(len, result.values()))] += 1
+            self._count += 1
+            if self.sample_every and self._count % self.sample_every == 0 and len(self.trace) < self.max_trace:
+                self.trace.append({"call": self._count, "at": round(start - self.started, 6), "method": name,
+                                   "seconds": elapsed, "ok": result is not False and result is not None,
+                                   "hash": game.state_hash})
+            return result
+        return timed
+
+    def add_search(self, nodes, generated, duplicates, seconds):
+        """Record one solver search (see Solver's ``profiler`` argument)."""
+        self.nodes += nodes
+        self.generated += generated
+        self.duplicates += duplicates
+        self.search_seconds += seconds
+
+    def watch_cache(self, cache, name="results"):
+        """Report ``cache``'s hits and misses (from now on) in the summary."""
+        self.caches[name] = (cache, cache.hits, cache.misses)
+
+    def summary(self):
+        """Everything recorded so far as a JSON-ready dict."""
+        steps = sum(self.legal_moves.values())
+        total_legal = sum(moves * count for moves, count in self.legal_moves.items())
+        caches = {}
+        for name, (cache, hits, misses) in self.caches.items():
+            hits, misses = cache.hits - hits, cache.misses - misses
+            caches[name] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else None}
+        return {
+            "elapsed": self.clock() - self.started,
+            "methods": {name: {"calls": self.calls[name], "seconds": self.seconds[name],
+                               "mean_us": 1e6 * self.seconds[name] / self.calls[name] if self.calls[name] else None}
+                        for name in METHODS},
+            "steps": steps,
+            "legal_moves": {"mean": total_legal / steps if steps else None, "max": max(self.legal_moves, default=None),
+                            "histogram": {str(moves): self.legal_moves[moves] for moves in sorted(self.legal_moves)}},
+            "search": {"nodes": self.nodes, "seconds": self.search_seconds,
+                       "nodes_per_second": self.nodes / self.search_seconds if self.search_seconds else None,
+                       "transposition_hit_rate": self.duplicates / self.generated if self.generated else None},
+            "caches": caches,
+            "trace": self.trace,
+        }
+
+    def dump(self, path):
+        with open(path, "w") as handle:
+            json.dump(self.summary(), handle, indent=2)
+
+
+def profile_deals(seeds, policy="random", profiler=None, max_moves=2000, max_nodes=20000, draw_count=1,
+                  max_recycles=None, cache=None, auto_foundation=False):
+    """Play seeded deals on an instrumented Game in this process; returns the Profiler.
+
+    Deals the ResultCache already holds for this variant (auto_foundation
+    included) and policy, under the same name as batch.cached_policy, are
+    skipped.
+    """
+    profiler = profiler or Profiler()
+    variant = variant_name(draw_count, max_recycles, auto_foundation)
+    name = cached_policy(policy, max_moves, max_nodes=max_nodes)
+    if cache is not None:
+        profiler.watch_cache(cache)
+    for seed in seeds:
+        if cache is not None and cache.get(deal_for_seed(seed), variant, name) is not None:
+            continue
+        game = profiler.attach(Game(seed=seed, draw_count=draw_count, max_recycles=max_recycles,
+                                    auto_foundation=auto_foundation))
+        if policy == "solver":
+            result = Solver(max_nodes=max_nodes, profiler=profiler).solve(game)
+            status, moves = result.status, result.moves or []
+        else:
+            moves, status = POLICIES[policy](game, random.Random(seed), max_moves)
+        if cache is not None:
+            cache.put(deal_for_seed(seed), variant, name, status, game.foundation_count(),
+                      moves if status == WON else None, len(moves))
+    return profiler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile seeded Klondike deals on an instrumented Game.")
+    parser.add_argument("--deals", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first deal")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--max-moves", type=int, default=2000)
+    parser.add_argument("--max-nodes", type=int, default=20000, help="solver node budget per deal")
+    parser.add_argument("--draw", type=int, choices=[1, 3], default=1, help="cards per draw")
+    parser.add_argument("--max-recycles", type=int, default=None, help="passes through the stock (default unlimited)")
+    parser.add_argument("--cache", default=None, help="SQLite result cache shared across runs")
+    parser.add_argument("--auto-foundation", action="store_true", help="follow every move with the safe foundation moves")
+    parser.add_argument("--trace", type=int, default=0, metavar="N", help="keep every N-th call as a trace event")
+    parser.add_argument("--out", default=None, help="JSON file for the summary (default stdout)")
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.cache) if args.cache else None
+    try:
+        profiler = profile_deals(range(args.seed, args.seed + args.deals), args.policy, Profiler(args.trace),
+                                 args.max_moves, args.max_nodes, args.draw, args.max_recycles, cache,
+                                 args.auto_foundation)
+    finally:
+        if cache is not None:
+            cache.close()
+    if args.out:
+        profiler.dump(args.out)
+    else:
+        json.dump(profiler.summary(), sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Load test for server.py: many bot sessions at once, with latency percentiles.
+
+    python -m loadtest --sessions 1000 --steps 50 --hint-every 25
+    python -m loadtest --socket /tmp/klondike.sock --sessions 5000 --connections 50
+
+Without --socket or --port a server is started in this process first, so
+a single command measures the whole stack. Each session plays random legal
+moves, undoing now and then and asking for a hint every ``hint_every``
+steps. Sessions share ``connections`` connections and pipeline their
+requests on them.
+"""
+from server import SessionManager, start_server
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+class Client:
+    """One connection to the server; ``request`` may be awaited by many tasks at once."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}  # request id -> future of its reply
+        self._ids = itertools.count()
+        self._listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, path=None, host="127.0.0.1", port=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=2 ** 20)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=2 ** 20)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self.waiting.pop(reply.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("server closed the connection"))
+
+    async def request(self, op, **fields):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        self.writer.write(json.dumps({"op": op, "id": request_id, **fields}).encode() + b"\n")
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self._listener
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+async def play_session(client, seed, steps, hint_every, undo_every, latencies):
+    """Play one random bot session; latencies[op] collects seconds per request."""
+    rng = random.Random(seed)
+
+    async def timed(op, **fields):
+        start = time.perf_counter()
+        reply = await client.request(op, **fields)
+        latencies.setdefault(op, []).append(time.perf_counter() - start)
+        if not reply["ok"]:
+            raise RuntimeError(f"{op} failed: {reply['error']}")
+        return reply
+
+    reply = await timed("new", seed=seed)
+    session = reply["session"]
+    for i in range(1, steps + 1):
+        if reply["won"] or not reply["moves"]:
+            break
+        if hint_every and i % hint_every == 0:
+            await timed("hint", session=session)
+        if undo_every and i % undo_every == 0:
+            reply = await timed("undo", session=session)
+        else:
+            reply = await timed("apply", session=session, move=rng.choice(reply["moves"]))
+    await timed("close", session=session)
+
+async def load_test(sessions=100, steps=100, hint_every=0, undo_every=10, connections=10, path=None,
+                    host="127.0.0.1", port=None, seed=0):
+    """Run ``sessions`` concurrent bot sessions against a server; returns a JSON-ready report."""
+    clients = [await Client.connect(path, host, port) for _ in range(connections)]
+    latencies = {}
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(play_session(clients[i % connections], seed + i, steps, hint_every, undo_every,
+                                            latencies) for i in range(sessions)))
+    finally:
+        for client in clients:
+            await client.close()
+    elapsed = time.perf_counter() - start
+    everything = sorted(itertools.chain.from_iterable(latencies.values()))
+    report = {"sessions": sessions, "connections": connections, "requests": len(everything),
+              "seconds": elapsed, "requests_per_second": len(everything) / elapsed if elapsed else None, "ops": {}}
+    for op, values in sorted(latencies.items()) + [("all", everything)]:
+        values.sort()
+        stats = {"count": len(values), "p50_ms": 1e3 * percentile(values, 0.5),
+                 "p99_ms": 1e3 * percentile(values, 0.99), "max_ms": 1e3 * values[-1]}
+        if op == "all":
+            report.update(stats)
+        else:
+            report["ops"][op] = stats
+    return report
+
+async def run_local(workers=None, max_nodes=20000, **options):
+    """load_test against a server started in this process on a temporary Unix socket."""
+    manager = SessionManager(workers=workers, max_nodes=max_nodes)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "server.sock")
+        server = await start_server(manager, path)
+        try:
+            async with server:
+                report = await load_test(path=path, **options)
+                if manager.clients:  # let the server see every connection close
+                    await asyncio.wait(manager.clients)
+                return report
+        finally:
+            manager.shutdown()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure server.py latency with many concurrent bot sessions.")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--steps", type=int, default=100, help="moves per session")
+    parser.add_argument("--hint-every", type=int, default=0, metavar="N", help="ask for a hint every N steps")
+    parser.add_argument("--undo-every", type=int, default=10, metavar="N", help="undo instead of moving every N steps")
+    parser.add_argument("--connections", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first session's deal")
+    parser.add_argument("--socket", default=None, help="server Unix socket (default: start a server here)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="server TCP port")
+    parser.add_argument("--workers", type=int, default=None, help="solver processes of the local server")
+    parser.add_argument("--max-nodes", type=int, default=20000, help="solver budget of the local server")
+    args = parser.parse_args(argv)
+
+    options = {"sessions": args.sessions, "steps": args.steps, "hint_every": args.hint_every,
+               "undo_every": args.undo_every, "connections": args.connections, "seed": args.seed}
+    if args.socket or args.port:
+        report = asyncio.run(load_test(path=args.socket, host=args.host, port=args.port, **options))
+    else:
+        report = asyncio.run(run_local(args.workers, args.max_nodes, **options))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,117 @@
 from card import *
 from deck import *
+from compact import CompactGame, TABLEAU_CAPACITY, is_safe_to_foundation
+import random
+
+SUIT_INDEX = {suit: idx for idx, suit in enumerate(SUITS)}
+
+# Move kinds used by Game.generate_moves, in get_all_legal_moves order
+MOVE_TYPES = ["draw", "waste_to_tableau", "waste_to_foundation",
+              "tableau_to_foundation", "tableau_to_tableau", "foundation_to_tableau"]
+DRAW, WASTE_TO_TABLEAU, WASTE_TO_FOUNDATION, TABLEAU_TO_FOUNDATION, TABLEAU_TO_TABLEAU, FOUNDATION_TO_TABLEAU = range(6)
+
+# Zobrist keys: one random 64-bit value per (location, position, card).
+# Location 0 is a face-down pile, 1 a face-up pile, 2 the stock and waste
+# pile and 3-6 the foundations. Cards only ever leave the pile, so within
+# one game the cards it holds fix their order: the pile is hashed by
+# membership (position 0) plus a CURSOR_KEYS entry, and drawing or
+# recycling only swaps cursor keys. Passes left only count once they are
+# limited, through RECYCLE_KEYS.
+#
+# Each column is hashed on its own with the same keys whichever column it
+# is, and enters the position hash through column_key. XOR-ing those is
+# blind to column order, so like canon.canonical_key the hash treats
+# rearranged columns as one position, and a move only rehashes the columns
+# it touches.
+FACE_DOWN_LOCATION = 0
+FACE_UP_LOCATION = 1
+PILE_LOCATION = 2
+FOUNDATION_LOCATION = 3
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST = [_zobrist_rng.getrandbits(64) for _ in range(7 * 52 * 52)]
+CURSOR_KEYS = [_zobrist_rng.getrandbits(64) for _ in range(53)]
+RECYCLE_KEYS = [_zobrist_rng.getrandbits(64) for _ in range(256)]
+_MASK = (1 << 64) - 1
+
+def zobrist_key(location, position, card):
+    return ZOBRIST[(location * 52 + position) * 52 + card.index]
+
+def column_key(column_hash):
+    """Scramble a column's hash, so that XOR-ing columns together keeps cards in different columns apart."""
+    column_hash = column_hash * 0x9E3779B97F4A7C15 & _MASK
+    return column_hash ^ column_hash >> 32
+
+class StockView:
+    """List-like view of the cards left to draw, next draw first."""
+
+    def __init__(self, game):
+        self.game = game
+
+    def _cards(self):
+        return self.game.pile[self.game.cursor:]
+
+    def __len__(self):
+        return len(self.game.pile) - self.game.cursor
+
+    def __iter__(self):
+        return iter(self._cards())
+
+    def __reversed__(self):
+        return reversed(self._cards())
+
+    def __getitem__(self, index):
+        return self._cards()[index]
+
+    def __eq__(self, other):
+        return self._cards() == list(other)
+
+    def __repr__(self):
+        return repr(self._cards())
+
+    def append(self, card):
+        self.game.pile.append(card)
+
+
+class WasteView(StockView):
+    """List-like view of the waste, top card last."""
+
+    def _cards(self):
+        return self.game.pile[:self.game.cursor]
+
+    def __len__(self):
+        return self.game.cursor
+
+    def append(self, card):
+        self.game.pile.insert(self.game.cursor, card)
+        self.game.cursor += 1
+
+    def pop(self):
+        self.game.cursor -= 1
+        return self.game.pile.pop(self.game.cursor)
+
 
 class Game:
-    def __init__(self):
+    """Klondike game state.
+
+    Stock and waste share one list, ``pile``: cards before ``cursor`` are the
+    waste (top at ``cursor - 1``), cards from ``cursor`` on are the stock
+    (next draw at ``cursor``). Drawing and recycling only move the cursor.
+    ``stock`` and ``waste`` are list-like views over it. ``draw_count`` is 1
+    or 3 cards per draw and ``max_recycles`` limits passes through the stock
+    (None for unlimited). With ``auto_foundation`` every move played through
+    make_move or play.apply_move is followed by all safe foundation moves
+    (see play_safe_moves). ``initial_deal`` deals a given 52-byte deck order
+    instead of shuffling.
+    """
+
+    def __init__(self, seed=None, draw_count=1, max_recycles=None, auto_foundation=False, initial_deal=None):
         self.deck = Deck()
-        self.deck.shuffle()
+        if initial_deal is not None:
+            self.deck.deck = [DECK[c] for c in initial_deal]
+        else:
+            self.deck.shuffle(random.Random(seed) if seed is not None else None)
+        # The shuffled deck as 52 card indices fully identifies the deal
+        self.initial_deal = bytes(c.index for c in self.deck.deck)
         self.tableaus = []
         for i in range(7):
             pile = {"face_down": [], "face_up": []}
@@ -13,52 +120,119 @@ class Game:
             pile["face_up"].append(self.deck.draw()) 
             self.tableaus.append(pile)  
         self.foundations = {"♠": [], "♥": [], "♦": [], "♣": []}
-        self.waste = []
-        self.stock = self.deck.deck
+        self.pile = self.deck.deck
+        self.cursor = 0
         self.deck.deck = []
-        self.history = []
+        self.draw_count = draw_count
+        self.max_recycles = max_recycles
+        self.auto_foundation = auto_foundation
+        self.recycles = 0
+        self.history = {}
         self.moves_since_progress = 0
+        self.rehash()
 
-    def print_state(self):
-        print("Tableaus:")
+    @classmethod
+    def from_compact(cls, compact, auto_foundation=False):
+        """Build a Game holding the same position as a compact.CompactGame."""
+        game = cls(draw_count=compact.draw_count, max_recycles=compact.max_recycles, auto_foundation=auto_foundation,
+                   initial_deal=compact.initial_deal or bytes(range(52)))
+        game.initial_deal = compact.initial_deal
+        for i in range(7):
+            base, down = i * TABLEAU_CAPACITY, compact.down[i]
+            cards = compact.cells[base:base + compact.heights[i]]
+            game.tableaus[i] = {"face_down": [DECK[c] for c in cards[:down]], "face_up": [DECK[c] for c in cards[down:]]}
+        for suit, count in zip(SUITS, compact.foundations):
+            game.foundations[suit] = [Card(rank, suit) for rank in range(1, count + 1)]
+        game.pile = [DECK[c] for c in compact.pile]
+        game.cursor = compact.cursor
+        game.recycles = compact.recycles
+        game.moves_since_progress = compact.moves_since_progress
+        game.rehash()
+        return game
+
+    def to_bytes(self):
+        """The position as one fixed-size record (see compact.STATE_RECORD)."""
+        return CompactGame.from_game(self).to_bytes()
+
+    @classmethod
+    def from_bytes(cls, buffer, offset=0, auto_foundation=False):
+        """Inverse of to_bytes; reads straight from bytes, a memoryview or an mmap."""
+        return cls.from_compact(CompactGame.from_bytes(buffer, offset), auto_foundation)
+
+    def format_state(self):
+        """The board as text, built in one go so it can be written with a single call."""
+        lines = ["Tableaus:"]
         for idx, pile in enumerate(self.tableaus):
-            print(f"Pile {idx}: ", end="")
-            for card in pile["face_down"]:
-                print("XX", end=" ")
-            for card in pile["face_up"]:
-                print(card, end=" ")
-            print()
-        
-        print("\nFoundations:")
+            lines.append(f"Pile {idx}: " + "XX " * len(pile["face_down"]) + "".join(f"{card} " for card in pile["face_up"]))
+
+        lines.append("\nFoundations:")
         for suit in self.foundations:
             if self.foundations[suit]:
-                print(f"{suit}: ", end="")
-                for card in self.foundations[suit]:
-                    print(card, end=" ")
-                print()
+                lines.append(f"{suit}: " + "".join(f"{card} " for card in self.foundations[suit]))
             else:
-                print(f"{suit}: -")
-        
-        print("\nStock cards remaining:", len(self.stock))
-        print("Top of Waste:", self.waste[-1] if self.waste else "-")
-        print("-"*40)
+                lines.append(f"{suit}: -")
+
+        lines.append(f"\nStock cards remaining: {len(self.pile) - self.cursor}")
+        lines.append(f"Top of Waste: {self.pile[self.cursor - 1] if self.cursor else '-'}")
+        lines.append("-"*40)
+        return "\n".join(lines) + "\n"
+
+    def print_state(self):
+        print(self.format_state(), end="")
+
+    @property
+    def stock(self):
+        return StockView(self)
+
+    @stock.setter
+    def stock(self, cards):
+        self.pile[self.cursor:] = list(cards)
+
+    @property
+    def waste(self):
+        return WasteView(self)
+
+    @waste.setter
+    def waste(self, cards):
+        self.pile[:self.cursor] = list(cards)
+        self.cursor = len(cards)
+
+    def can_recycle(self):
+        return self.max_recycles is None or self.recycles < self.max_recycles
 
     def recycle_stock(self):
-        if self.waste:
-            self.stock = self.waste[:]  # keep the same order
-            self.waste = []
+        if self.cursor and self.can_recycle():
+            record = ("recycle", self.cursor, None, None, False, self.moves_since_progress, self._hash)
+            self._hash ^= CURSOR_KEYS[self.cursor] ^ CURSOR_KEYS[0]
+            if self.max_recycles is not None:
+                self._hash ^= RECYCLE_KEYS[self.recycles] ^ RECYCLE_KEYS[self.recycles + 1]
+            self.cursor = 0  # keep the same order
+            self.recycles += 1
+            return record
+        return False
 
     def draw_from_stock(self):
-        if not self.stock:
-            self.recycle_stock()
-        
-        if self.stock:
-            card = self.stock.pop(0)  # remove the first card (FIFO)
-            self.waste.append(card)
+        recycled = False
+        record_hash = self._hash
+        moves_since_progress = self.moves_since_progress
+        if self.cursor == len(self.pile):
+            recycled = bool(self.recycle_stock())
+
+        count = min(self.draw_count, len(self.pile) - self.cursor)
+        if count:
+            self._hash ^= CURSOR_KEYS[self.cursor] ^ CURSOR_KEYS[self.cursor + count]
+            self.cursor += count
             self.increment_moves()  # drawing doesn't improve progress
-            return card
+            return ("draw", recycled, count, None, False, moves_since_progress, record_hash)
         return None
 
+    def _pop_waste(self):
+        self._hash ^= CURSOR_KEYS[self.cursor] ^ CURSOR_KEYS[self.cursor - 1]
+        self.cursor -= 1
+        card = self.pile.pop(self.cursor)
+        self._hash ^= zobrist_key(PILE_LOCATION, 0, card)
+        return card
+
     def can_place_on_tableau(self, card, tableau_index):
         if 0 <= tableau_index < len(self.tableaus):
             tableau = self.tableaus[tableau_index]
@@ -71,13 +245,13 @@ class Game:
 
     def move_from_waste_to_tableau(self, tableau_index):
         if 0 <= tableau_index < len(self.tableaus):
-            if self.waste:
-                card = self.waste[-1]
+            if self.cursor:
+                card = self.pile[self.cursor - 1]
                 if self.can_place_on_tableau(card, tableau_index):
-                    self.waste.pop()
-                    self.tableaus[tableau_index]["face_up"].append(card)
+                    record = ("waste_to_tableau", tableau_index, None, None, False, self.moves_since_progress, self._hash)
+                    self._push_face_up(tableau_index, self._pop_waste())
                     self.make_progress()
-                    return True
+                    return record
         self.increment_moves()
         return False
 
@@ -86,16 +260,25 @@ class Game:
             if start_index < len(self.tableaus[from_tableau]["face_up"]):
                 moving_card = self.tableaus[from_tableau]["face_up"][start_index]
                 if self.can_place_on_tableau(moving_card, to_tableau):
-                    for i in range(start_index, len(self.tableaus[from_tableau]["face_up"])):
-                        self.tableaus[to_tableau]["face_up"].append(self.tableaus[from_tableau]["face_up"][i])  
-                    del self.tableaus[from_tableau]["face_up"][start_index:]
-                    if self.tableaus[from_tableau]["face_down"] and not self.tableaus[from_tableau]["face_up"]:
-                        self.tableaus[from_tableau]["face_up"].append(self.tableaus[from_tableau]["face_down"].pop())
+                    face_up, to_face_up = self.tableaus[from_tableau]["face_up"], self.tableaus[to_tableau]["face_up"]
+                    count = len(face_up) - start_index
+                    moves_since_progress, state_hash = self.moves_since_progress, self._hash
+                    from_key = to_key = 0
+                    for i, card in enumerate(face_up[start_index:]):
+                        from_key ^= zobrist_key(FACE_UP_LOCATION, start_index + i, card)
+                        to_key ^= zobrist_key(FACE_UP_LOCATION, len(to_face_up) + i, card)
+                    to_face_up.extend(face_up[start_index:])
+                    del face_up[start_index:]
+                    self._update_column(from_tableau, from_key)
+                    self._update_column(to_tableau, to_key)
+                    flipped = bool(self.tableaus[from_tableau]["face_down"]) and not self.tableaus[from_tableau]["face_up"]
+                    if flipped:
+                        self._flip(from_tableau)
                         self.make_progress()  # flipped card is progress
                     else:
                         self.increment_moves()
                     self.flip_next_card_if_needed(from_tableau)
-                    return True
+                    return ("tableau_to_tableau", from_tableau, to_tableau, count, flipped, moves_since_progress, state_hash)
         self.increment_moves()
         return False
     
@@ -109,22 +292,24 @@ class Game:
         if 0 <= tableau_index < len(self.tableaus) and self.tableaus[tableau_index]["face_up"]:
             card = self.tableaus[tableau_index]["face_up"][-1]
             if self.can_move_to_foundation(card):
+                moves_since_progress, state_hash = self.moves_since_progress, self._hash
                 card = self.tableaus[tableau_index]["face_up"].pop()
-                self.foundations[card.suit].append(card)
-                self.flip_next_card_if_needed(tableau_index)
+                self._update_column(tableau_index, zobrist_key(FACE_UP_LOCATION, len(self.tableaus[tableau_index]["face_up"]), card))
+                self._push_foundation(card)
+                flipped = self.flip_next_card_if_needed(tableau_index)
                 self.make_progress()
-                return True
+                return ("tableau_to_foundation", tableau_index, card.suit, None, flipped, moves_since_progress, state_hash)
         self.increment_moves()
         return False
 
     def move_from_waste_to_foundation(self):
-        if self.waste:
-            card = self.waste[-1]
+        if self.cursor:
+            card = self.pile[self.cursor - 1]
             if self.can_move_to_foundation(card):
-                card = self.waste.pop()
-                self.foundations[card.suit].append(card)
+                record = ("waste_to_foundation", card.suit, None, None, False, self.moves_since_progress, self._hash)
+                self._push_foundation(self._pop_waste())
                 self.make_progress()
-                return True
+                return record
         self.increment_moves()
         return False
 
@@ -133,73 +318,252 @@ class Game:
             if suit in self.foundations and self.foundations[suit]:
                 card = self.foundations[suit][-1]
                 if self.can_place_on_tableau(card, tableau_index):
+                    record = ("foundation_to_tableau", suit, tableau_index, None, False, self.moves_since_progress, self._hash)
                     card = self.foundations[suit].pop()
-                    self.tableaus[tableau_index]["face_up"].append(card)
+                    self._hash ^= zobrist_key(FOUNDATION_LOCATION + SUIT_INDEX[suit], card.rank - 1, card)
+                    self._push_face_up(tableau_index, card)
                     self.increment_moves()  # this is usually back-and-forth, not progress
-                    return True
+                    return record
         self.increment_moves()
         return False
 
     def flip_next_card_if_needed(self, tableau_index):
         tableau = self.tableaus[tableau_index]
         if not tableau["face_up"] and tableau["face_down"]:
-            tableau["face_up"].append(tableau["face_down"].pop())
+            self._flip(tableau_index)
             self.make_progress()
+            return True
+        return False
+
+    def undo(self, record):
+        """Restore the exact position from before the move that returned ``record``.
+
+        Records are plain tuples ``(kind, a, b, c, flipped, moves_since_progress,
+        state_hash)``; undo them in reverse order of play. An "auto" record
+        holds a move's own record in ``a`` and the records of the safe moves
+        that followed it in ``b``.
+        """
+        kind, a, b, c, flipped, moves_since_progress, state_hash = record
+        if kind == "auto":
+            for safe in reversed(b):
+                self.undo(safe)
+            self.undo(a)
+            return
+        touched = (a,) if flipped or kind in ("waste_to_tableau", "tableau_to_foundation") else ()
+        if kind == "tableau_to_tableau":
+            touched = (a, b)
+        elif kind == "foundation_to_tableau":
+            touched = (b,)
+        if flipped:
+            pile = self.tableaus[a]
+            pile["face_down"].append(pile["face_up"].pop())
+        if kind == "draw":
+            self.cursor -= b
+            if a:  # the draw recycled the waste first
+                self.cursor = len(self.pile)
+                self.recycles -= 1
+        elif kind == "recycle":
+            self.cursor = a
+            self.recycles -= 1
+        elif kind == "waste_to_tableau":
+            self.pile.insert(self.cursor, self.tableaus[a]["face_up"].pop())
+            self.cursor += 1
+        elif kind == "tableau_to_tableau":
+            to_pile = self.tableaus[b]["face_up"]
+            self.tableaus[a]["face_up"].extend(to_pile[-c:])
+            del to_pile[-c:]
+        elif kind == "tableau_to_foundation":
+            self.tableaus[a]["face_up"].append(self.foundations[b].pop())
+        elif kind == "waste_to_foundation":
+            self.pile.insert(self.cursor, self.foundations[a].pop())
+            self.cursor += 1
+        elif kind == "foundation_to_tableau":
+            self.foundations[a].append(self.tableaus[b]["face_up"].pop())
+        self.moves_since_progress = moves_since_progress
+        self._hash = state_hash
+        for i in touched:
+            self._columns[i] = self._column_hash(i)
+
+    def _update_column(self, tableau_index, key):
+        """XOR ``key`` into one column's hash and swap its column_key in state_hash."""
+        old = self._columns[tableau_index]
+        self._columns[tableau_index] = new = old ^ key
+        self._hash ^= column_key(old) ^ column_key(new)
+
+    def _column_hash(self, tableau_index):
+        pile, h = self.tableaus[tableau_index], 0
+        for i, card in enumerate(pile["face_down"]):
+            h ^= zobrist_key(FACE_DOWN_LOCATION, i, card)
+        for i, card in enumerate(pile["face_up"]):
+            h ^= zobrist_key(FACE_UP_LOCATION, i, card)
+        return h
+
+    def _flip(self, tableau_index):
+        face_down = self.tableaus[tableau_index]["face_down"]
+        card = face_down.pop()
+        self._update_column(tableau_index, zobrist_key(FACE_DOWN_LOCATION, len(face_down), card)
+                            ^ zobrist_key(FACE_UP_LOCATION, 0, card))
+        self.tableaus[tableau_index]["face_up"].append(card)
+
+    def _push_face_up(self, tableau_index, card):
+        face_up = self.tableaus[tableau_index]["face_up"]
+        self._update_column(tableau_index, zobrist_key(FACE_UP_LOCATION, len(face_up), card))
+        face_up.append(card)
+
+    def _push_foundation(self, card):
+        self._hash ^= zobrist_key(FOUNDATION_LOCATION + SUIT_INDEX[card.suit], card.rank - 1, card)
+        self.foundations[card.suit].append(card)
 
     def is_won(self):
         return all(len(foundation) == 13 for foundation in self.foundations.values())
 
+    def foundation_count(self):
+        return sum(len(foundation) for foundation in self.foundations.values())
+
     def get_all_legal_moves(self):
-        moves = {
-            "draw": [],
-            "waste_to_tableau": [],
-            "waste_to_foundation": [],
-            "tableau_to_foundation": [],
-            "tableau_to_tableau": [],
-            "foundation_to_tableau": []
+        draw, waste_to_tableau, waste_to_foundation = [], [], []
+        tableau_to_foundation, tableau_to_tableau, foundation_to_tableau = [], [], []
+        for kind, a, b, c in self.generate_moves():
+            if kind == TABLEAU_TO_TABLEAU:
+                tableau_to_tableau.append((a, b, c))
+            elif kind == DRAW:
+                draw.append(None)
+            elif kind == WASTE_TO_TABLEAU:
+                waste_to_tableau.append(a)
+            elif kind == WASTE_TO_FOUNDATION:
+                waste_to_foundation.append(self.pile[self.cursor - 1])
+            elif kind == TABLEAU_TO_FOUNDATION:
+                tableau_to_foundation.append((a, self.tableaus[a]["face_up"][-1]))
+            else:
+                foundation_to_tableau.append((SUITS[a], b))
+        return {
+            "draw": draw,
+            "waste_to_tableau": waste_to_tableau,
+            "waste_to_foundation": waste_to_foundation,
+            "tableau_to_foundation": tableau_to_foundation,
+            "tableau_to_tableau": tableau_to_tableau,
+            "foundation_to_tableau": foundation_to_tableau
         }
 
+    def generate_moves(self):
+        """Yield every legal move as a ``(kind, a, b, c)`` tuple of ints.
+
+        ``kind`` indexes MOVE_TYPES and the order matches get_all_legal_moves.
+        Tableau targets come from an index of the card slot (see Card.slot)
+        each pile top accepts, so each face-up card costs one dict lookup
+        instead of a can_place_on_tableau call per pile. Foundations hold
+        Ace up, so a foundation of n cards takes rank n + 1.
+        """
+        foundations = self.foundations
+        ups = []
+        to_foundation = []
+        accepts = {}
+        empty = None
+        for i, tableau in enumerate(self.tableaus):
+            face_up = tableau["face_up"]
+            ups.append(face_up)
+            if face_up:
+                top = face_up[-1]
+                if top.rank == len(foundations[top.suit]) + 1:
+                    to_foundation.append(i)
+                slot = top.needs
+                if slot in accepts:
+                    accepts[slot] = accepts[slot] + (i,)
+                else:
+                    accepts[slot] = (i,)
+            elif not tableau["face_down"]:
+                empty = empty + (i,) if empty else (i,)
+        if empty:  # an empty pile takes a King of either color
+            accepts[26] = accepts[27] = empty
+        targets = accepts.get
+
         # 0. Draw from Stock
-        if self.stock or self.waste:
-            moves["draw"].append(None)
-
-        # 1. Waste → Tableau
-        if self.waste:
-            top_waste = self.waste[-1]
-            for i in range(len(self.tableaus)):
-                if self.can_place_on_tableau(top_waste, i):
-                    moves["waste_to_tableau"].append(i)
-
-        # 2. Waste → Foundation
-        if self.waste:
-            top_waste = self.waste[-1]
-            if self.can_move_to_foundation(top_waste):
-                moves["waste_to_foundation"].append(top_waste)
+        pile, cursor = self.pile, self.cursor
+        if cursor < len(pile) or (cursor and self.can_recycle()):
+            yield (DRAW, 0, 0, 0)
+
+        # 1. Waste → Tableau, 2. Waste → Foundation
+        if cursor:
+            top_waste = pile[cursor - 1]
+            for i in targets(top_waste.slot, ()):
+                yield (WASTE_TO_TABLEAU, i, 0, 0)
+            if top_waste.rank == len(foundations[top_waste.suit]) + 1:
+                yield (WASTE_TO_FOUNDATION, 0, 0, 0)
 
         # 3. Tableau → Foundation
-        for i, tableau in enumerate(self.tableaus):
-            if tableau["face_up"]:
-                top_card = tableau["face_up"][-1]
-                if self.can_move_to_foundation(top_card):
-                    moves["tableau_to_foundation"].append((i, top_card))
-
-        # 4. Tableau → Tableau
-        for from_idx, tableau in enumerate(self.tableaus):
-            for start in range(len(tableau["face_up"])):
-                moving_card = tableau["face_up"][start]
-                for to_idx in range(len(self.tableaus)):
-                    if from_idx != to_idx and self.can_place_on_tableau(moving_card, to_idx):
-                        moves["tableau_to_tableau"].append((from_idx, to_idx, start))
-        
+        for i in to_foundation:
+            yield (TABLEAU_TO_FOUNDATION, i, 0, 0)
+
+        # 4. Tableau → Tableau (cards are unique, so index finds a match's start)
+        from_idx = 0
+        for face_up in ups:
+            for card in face_up:
+                if card.slot in accepts:
+                    start = face_up.index(card)
+                    for to_idx in accepts[card.slot]:
+                        if to_idx != from_idx:
+                            yield (TABLEAU_TO_TABLEAU, from_idx, to_idx, start)
+            from_idx += 1
+
         # 5. Foundation → Tableau
-        for suit, foundation in self.foundations.items():
+        for suit, foundation in foundations.items():
             if foundation:
-                top_card = foundation[-1]
-                for idx in range(len(self.tableaus)):
-                    if self.can_place_on_tableau(top_card, idx):
-                        moves["foundation_to_tableau"].append((suit, idx))
+                for idx in targets(foundation[-1].slot, ()):
+                    yield (FOUNDATION_TO_TABLEAU, SUIT_INDEX[suit], idx, 0)
+
+    def make_move(self, move):
+        """Play a ``(kind, a, b, c)`` move from generate_moves; returns its undo record."""
+        kind, a, b, c = move
+        if kind == DRAW:
+            record = self.draw_from_stock()
+        elif kind == WASTE_TO_TABLEAU:
+            record = self.move_from_waste_to_tableau(a)
+        elif kind == WASTE_TO_FOUNDATION:
+            record = self.move_from_waste_to_foundation()
+        elif kind == TABLEAU_TO_FOUNDATION:
+            record = self.move_from_tableau_to_foundation(a)
+        elif kind == TABLEAU_TO_TABLEAU:
+            record = self.move_from_tableau_to_tableau(a, b, c)
+        else:
+            record = self.move_from_foundation_to_tableau(SUITS[a], b)
+        if record and self.auto_foundation:
+            return self.play_safe_moves(record)
+        return record
+
+    def safe_foundation_move(self):
+        """A ``(kind, a, b, c)`` foundation move that can never hurt, or None.
+
+        Uses the same rule as the solver, see ``compact.is_safe_to_foundation``.
+        """
+        candidates = []
+        if self.cursor:
+            candidates.append((self.pile[self.cursor - 1], (WASTE_TO_FOUNDATION, 0, 0, 0)))
+        for i, tableau in enumerate(self.tableaus):
+            if tableau["face_up"]:
+                candidates.append((tableau["face_up"][-1], (TABLEAU_TO_FOUNDATION, i, 0, 0)))
+        foundations = [len(self.foundations[suit]) for suit in SUITS]
+        for card, move in candidates:
+            if self.can_move_to_foundation(card) and is_safe_to_foundation(card.index, foundations):
+                return move
+        return None
 
-        return moves
+    def play_safe_moves(self, record):
+        """Follow the move that returned ``record`` with every safe foundation move.
+
+        Returns ``record`` itself when nothing was safe, otherwise an "auto"
+        record, so one undo takes back the move and everything it triggered.
+        """
+        safe = []
+        move = self.safe_foundation_move()
+        while move is not None:
+            if move[0] == WASTE_TO_FOUNDATION:
+                safe.append(self.move_from_waste_to_foundation())
+            else:
+                safe.append(self.move_from_tableau_to_foundation(move[1]))
+            move = self.safe_foundation_move()
+        if not safe:
+            return record
+        return ("auto", record, tuple(safe), None, False, record[5], record[6])
 
     def make_progress(self):
         """Call when a move improves the game (foundation or flip)."""
@@ -218,8 +582,34 @@ class Game:
         )
         foundations_snapshot = tuple(
             tuple((c.rank, c.suit) for c in self.foundations[suit])
-            for suit in ["♠", "♥", "♦", "♣"]
+            for suit in SUITS
         )
-        stock_snapshot = tuple((c.rank, c.suit) for c in self.stock)
-        waste_snapshot = tuple((c.rank, c.suit) for c in self.waste)
+        stock_snapshot = tuple((c.rank, c.suit) for c in self.pile[self.cursor:])
+        waste_snapshot = tuple((c.rank, c.suit) for c in self.pile[:self.cursor])
         return (tableaus_snapshot, foundations_snapshot, stock_snapshot, waste_snapshot)
+
+    @property
+    def state_hash(self):
+        """64-bit Zobrist hash of the position, kept up to date by every move.
+
+        Like canon.canonical_key it ignores column order, so positions that
+        differ only in which column holds which pile hash alike.
+        """
+        return self._hash
+
+    def rehash(self):
+        """Recompute state_hash from scratch; call after editing piles directly."""
+        self._columns = [self._column_hash(i) for i in range(len(self.tableaus))]
+        h = 0
+        for column in self._columns:
+            h ^= column_key(column)
+        for suit, foundation in self.foundations.items():
+            for card in foundation:
+                h ^= zobrist_key(FOUNDATION_LOCATION + SUIT_INDEX[suit], card.rank - 1, card)
+        for card in self.pile:
+            h ^= zobrist_key(PILE_LOCATION, 0, card)
+        h ^= CURSOR_KEYS[self.cursor]
+        if self.max_recycles is not None:
+            h ^= RECYCLE_KEYS[self.recycles]
+        self._hash = h
+        return h
@@ -0,0 +1,216 @@
+"""Streaming winnability analysis for very large deal sets.
+
+    python -m pipeline --out deals.kres --start 0 --count 1000000 --method solver --workers 8
+    python -m pipeline --out deals.kres --summary
+
+Seeds are fed to a worker pool a block at a time. Each finished block is
+appended to a columnar results file, then a checkpoint next to it records
+how far the run got. Run the same command again after a crash or a kill
+and it carries on from the checkpoint: seeds already in the file are not
+replayed, and anything written after the checkpoint is cut off first.
+Memory use depends on the block size, not on how many deals are run.
+
+Results file: MAGIC, then blocks. Each block is a little-endian uint32 row
+count followed by one array per column of COLUMNS, in that order.
+"""
+from compact import CompactGame
+from solver import Solver, WON, LOST, UNKNOWN
+from batch import POLICIES
+from array import array
+from itertools import count as count_from, islice
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+MAGIC = b"KRES2\n"  # KRES1 files stored moves as uint16
+# (name, array typecode): seed, outcome index into OUTCOMES, moves in the line
+# played or found, search nodes expanded and wall time in seconds
+COLUMNS = [("seed", "Q"), ("outcome", "B"), ("moves", "I"), ("nodes", "I"), ("seconds", "f")]
+OUTCOMES = [WON, LOST, UNKNOWN]
+METHODS = ["solver"] + sorted(policy for policy in POLICIES if policy != "solver")
+BLOCK_HEADER = struct.Struct("<I")
+
+def seeded_deals(start=0, stop=None):
+    """Seeds start, start + 1, ... up to ``stop`` (forever when None)."""
+    return iter(range(start, stop)) if stop is not None else count_from(start)
+
+def analyse_deal(seed, method="solver", max_nodes=20000, time_limit=None, max_moves=2000, draw_count=1,
+                 max_recycles=None):
+    """Classify one seeded deal; returns a row of COLUMNS.
+
+    The solver reports won, lost (search space exhausted) or unknown (budget
+    hit). A policy reports what batch.play_policy does: lost only for a
+    proven dead end, and unknown when it just didn't win.
+    """
+    start = time.perf_counter()
+    if method == "solver":
+        game = CompactGame(seed=seed, draw_count=draw_count, max_recycles=max_recycles)
+        result = Solver(max_nodes=max_nodes, time_limit=time_limit).solve(game)
+        status, moves, nodes = result.status, len(result.moves) if result.moves else 0, result.nodes
+    else:
+        game = CompactGame(seed=seed, draw_count=draw_count, max_recycles=max_recycles)
+        played, status = POLICIES[method](game, random.Random(seed), max_moves)
+        moves, nodes = len(played), 0
+    return (seed, OUTCOMES.index(status), moves, nodes, time.perf_counter() - start)
+
+def encode_block(rows):
+    """Rows of COLUMNS -> one block of the results file."""
+    parts = [BLOCK_HEADER.pack(len(rows))]
+    for i, (name, typecode) in enumerate(COLUMNS):
+        column = array(typecode, (row[i] for row in rows))
+        if sys.byteorder != "little":
+            column.byteswap()
+        parts.append(column.tobytes())
+    return b"".join(parts)
+
+def read_blocks(path):
+    """Yield every complete block of a results file as {column name: array}."""
+    with open(path, "rb") as handle:
+        if handle.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a results file")
+        while True:
+            header = handle.read(BLOCK_HEADER.size)
+            if len(header) < BLOCK_HEADER.size:
+                return
+            rows, = BLOCK_HEADER.unpack(header)
+            block = {}
+            for name, typecode in COLUMNS:
+                column = array(typecode)
+                data = handle.read(rows * column.itemsize)
+                if len(data) < rows * column.itemsize:
+                    return  # torn block from a killed run
+                column.frombytes(data)
+                if sys.byteorder != "little":
+                    column.byteswap()
+                block[name] = column
+            yield block
+
+def read_results(path):
+    """Yield every row of a results file as a tuple of COLUMNS, outcome as a string."""
+    for block in read_blocks(path):
+        for row in zip(*(block[name] for name, typecode in COLUMNS)):
+            yield (row[0], OUTCOMES[row[1]]) + row[2:]
+
+def summarize(path):
+    """{outcome: count} plus total rows, nodes and seconds over a results file."""
+    summary = dict.fromkeys(OUTCOMES, 0)
+    summary.update(deals=0, nodes=0, seconds=0.0)
+    for block in read_blocks(path):
+        for outcome in block["outcome"]:
+            summary[OUTCOMES[outcome]] += 1
+        summary["deals"] += len(block["seed"])
+        summary["nodes"] += sum(block["nodes"])
+        summary["seconds"] += sum(block["seconds"])
+    return summary
+
+def checkpoint_path(out):
+    return out + ".checkpoint"
+
+def load_checkpoint(out):
+    try:
+        with open(checkpoint_path(out)) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+def save_checkpoint(out, state):
+    """Write the checkpoint atomically, so a kill leaves the old one or the new one."""
+    temp = checkpoint_path(out) + ".tmp"
+    with open(temp, "w") as handle:
+        json.dump(state, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp, checkpoint_path(out))
+
+def run(out, start=0, count=None, method="solver", workers=None, block_size=1024, chunksize=16, resume=True,
+        **options):
+    """Analyse seeds ``start`` to ``start + count`` (forever when count is None) into ``out``.
+
+    ``options`` go to analyse_deal. With ``resume`` an existing checkpoint
+    for ``out`` is picked up, provided it was written with the same start,
+    method and options; otherwise ``out`` is started afresh. Returns the
+    number of deals analysed by this call.
+    """
+    settings = {"start": start, "method": method, "options": options}
+    state = load_checkpoint(out) if resume else None
+    if state is not None:
+        if state["settings"] != settings:
+            raise ValueError(f"{checkpoint_path(out)} was written with {state['settings']}, not {settings}")
+        handle = open(out, "r+b")
+        handle.truncate(state["offset"])  # drop a block written after the last checkpoint
+        handle.seek(state["offset"])
+    else:
+        handle = open(out, "wb")
+        handle.write(MAGIC)
+        # The checkpoint below vouches for the magic, so it has to be on disk first
+        handle.flush()
+        os.fsync(handle.fileno())
+        state = {"settings": settings, "next_seed": start, "offset": len(MAGIC), "deals": 0}
+        save_checkpoint(out, state)
+
+    stop = start + count if count is not None else None
+    deals = seeded_deals(state["next_seed"], stop)
+    analysed = 0
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            while True:
+                seeds = list(islice(deals, block_size))
+                if not seeds:
+                    break
+                rows = list(pool.imap(_analyse, ((seed, method, options) for seed in seeds), chunksize))
+                handle.write(encode_block(rows))
+                handle.flush()
+                os.fsync(handle.fileno())
+                state.update(next_seed=seeds[-1] + 1, offset=handle.tell(), deals=state["deals"] + len(rows))
+                save_checkpoint(out, state)
+                analysed += len(rows)
+    finally:
+        handle.close()
+    return analysed
+
+def _analyse(task):
+    seed, method, options = task
+    return analyse_deal(seed, method, **options)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify seeded Klondike deals as won, lost or unknown.")
+    parser.add_argument("--out", required=True, help="results file (a checkpoint is kept next to it)")
+    parser.add_argument("--start", type=int, default=0, help="seed of the first deal")
+    parser.add_argument("--count", type=int, default=None, help="deals to analyse (default: until killed)")
+    parser.add_argument("--method", choices=METHODS, default="solver")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument("--block", type=int, default=1024, help="deals per block and checkpoint")
+    parser.add_argument("--max-nodes", type=int, default=20000, help="solver node budget per deal")
+    parser.add_argument("--time-limit", type=float, default=None, help="solver seconds per deal")
+    parser.add_argument("--max-moves", type=int, default=2000, help="policy move limit per deal")
+    parser.add_argument("--draw", type=int, choices=[1, 3], default=1, help="cards per draw")
+    parser.add_argument("--max-recycles", type=int, default=None, help="passes through the stock (default unlimited)")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint and start over")
+    parser.add_argument("--summary", action="store_true", help="print totals for --out and exit")
+    args = parser.parse_args(argv)
+
+    if not args.summary:
+        options = {"max_moves": args.max_moves, "draw_count": args.draw, "max_recycles": args.max_recycles}
+        if args.method == "solver":
+            options = {"max_nodes": args.max_nodes, "time_limit": args.time_limit,
+                       "draw_count": args.draw, "max_recycles": args.max_recycles}
+        start = time.perf_counter()
+        try:
+            analysed = run(args.out, args.start, args.count, args.method, args.workers, args.block,
+                           resume=not args.fresh, **options)
+        except KeyboardInterrupt:
+            analysed = None  # the checkpoint covers every block that was written
+        elapsed = time.perf_counter() - start
+        if analysed is not None:
+            print(f"{analysed} deals analysed in {elapsed:.1f}s", file=sys.stderr)
+    summary = summarize(args.out)
+    print(" ".join(f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                   for key, value in summary.items()))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
-from main import Game
+from main import Game, MOVE_TYPES, SUITS
 from card import Card
-import os
+from render import AnsiRenderer, TextRenderer, NullRenderer
+from deadend import dead_end
+from canon import canonical_key, is_pointless
 import random
 import time
 
@@ -14,6 +16,9 @@ MOVE_WEIGHTS = {
     "draw": 40
 }
 
+# Visits to the same position before play counts as going in circles
+SOFTLOCK_VISITS = 10
+
 def create_test_game():
     game = Game()
 
@@ -46,89 +51,182 @@ def create_test_game():
             if not any(card.rank == rank and card.suit == suit for pile in game.tableaus for card in pile["face_up"]):
                 game.stock.append(Card(rank, suit))
 
+    game.rehash()
     return game
 
-def play(bot_mode=True, delay=0.01):
-    game = create_test_game()
+def flatten_moves(legal_moves):
+    """Turn the dict from get_all_legal_moves into a list of (move_type, *args) tuples."""
+    flat_moves = []
+    for move_type, details in legal_moves.items():
+        for detail in details:
+            if isinstance(detail, tuple):
+                flat_moves.append((move_type, *detail))
+            else:
+                flat_moves.append((move_type, detail))
+    return flat_moves
+
+def apply_move(game, move):
+    """Execute a flattened move on any engine exposing the Game move API.
+
+    A main.Game with ``auto_foundation`` set also plays the safe foundation
+    moves that follow (see Game.play_safe_moves).
+    """
+    move_type = move[0]
+    if move_type == "draw":
+        record = game.draw_from_stock()
+    elif move_type == "waste_to_foundation":
+        record = game.move_from_waste_to_foundation()
+    elif move_type == "waste_to_tableau":
+        record = game.move_from_waste_to_tableau(move[1])
+    elif move_type == "tableau_to_foundation":
+        record = game.move_from_tableau_to_foundation(move[1])
+    elif move_type == "tableau_to_tableau":
+        record = game.move_from_tableau_to_tableau(move[1], move[2], move[3])
+    elif move_type == "foundation_to_tableau":
+        record = game.move_from_foundation_to_tableau(move[1], move[2])
+    else:
+        return None
+    if record and getattr(game, "auto_foundation", False):
+        return game.play_safe_moves(record)
+    return record
+
+def choose_bot_move(flat_moves, rng=random):
+    """Weighted random selection for the bot."""
+    weighted_moves = []
+    for move in flat_moves:
+        move_type = move[0]
+        weight = MOVE_WEIGHTS.get(move_type, 50)
+        weighted_moves.append((move, weight))
+    moves, weights = zip(*weighted_moves)
+    return rng.choices(moves, weights=weights, k=1)[0]
+
+def is_softlocked(game):
+    """Record the current position and report whether play is going in circles.
+
+    ``game.history`` maps the state_hash of every position of the game to
+    its visits. Positions that differ only in column order hash alike, so
+    shuffling piles between empty columns counts as going in circles too.
+    Only a repeated hash pays for canonical_key: from then on its visits
+    are counted per key, so a hash collision adds one visit at most. Nothing
+    irreversible can happen between two visits to one position, so its
+    SOFTLOCK_VISITS-th visit ends the game.
+    """
+    h = game.state_hash
+    seen = game.history.get(h)
+    if seen is None:
+        game.history[h] = 1
+        return SOFTLOCK_VISITS <= 1
+    key = canonical_key(game)
+    if not isinstance(seen, dict):
+        seen = game.history[h] = {key: seen}
+    visits = seen[key] = seen.get(key, 0) + 1
+    return visits >= SOFTLOCK_VISITS
+
+def encode_move(move):
+    """Pack a flattened move into a (kind, a, b, c) tuple of small ints (see main.MOVE_TYPES)."""
+    kind = MOVE_TYPES.index(move[0])
+    if move[0] == "tableau_to_tableau":
+        return (kind, move[1], move[2], move[3])
+    elif move[0] == "foundation_to_tableau":
+        return (kind, SUITS.index(move[1]), move[2], 0)
+    elif move[0] in ("waste_to_tableau", "tableau_to_foundation"):
+        return (kind, move[1], 0, 0)
+    return (kind, 0, 0, 0)
+
+def decode_move(encoded):
+    """Inverse of encode_move; card details that apply_move ignores come back as None."""
+    kind, a, b, c = encoded
+    move_type = MOVE_TYPES[kind]
+    if move_type == "tableau_to_tableau":
+        return (move_type, a, b, c)
+    elif move_type == "foundation_to_tableau":
+        return (move_type, SUITS[a], b)
+    elif move_type == "waste_to_tableau":
+        return (move_type, a)
+    elif move_type == "tableau_to_foundation":
+        return (move_type, a, None)
+    return (move_type, None)
+
+# Outcomes reported by step() and play()
+WON = "won"
+NO_MOVES = "no_moves"
+SOFTLOCK = "softlock"
+DEAD_END = "dead_end"
+QUIT = "quit"
+
+OUTCOME_MESSAGES = {
+    WON: "🎉 You won!",
+    NO_MOVES: "No more legal moves. Game over.",
+    SOFTLOCK: "Softlock detected! No real progress can be made.",
+    DEAD_END: "Dead end: this deal can't be won from here.",
+    QUIT: "Exiting game.",
+}
 
+def step(game, choose):
+    """Advance ``game`` by one move, with no I/O.
+
+    ``choose(game, flat_moves)`` picks the move, or returns None to quit.
+    Moves that only carry a whole pile to another empty column are not
+    offered (see canon.is_pointless).
+    Returns (outcome, move): outcome is None while the game goes on,
+    otherwise one of WON, NO_MOVES, DEAD_END, SOFTLOCK or QUIT.
+    """
+    if game.is_won():
+        return WON, None
+    legal_moves = game.get_all_legal_moves()
+    # Moving a whole pile to an empty column leaves the canonical position as it was
+    flat_moves = [move for move in flatten_moves(legal_moves) if not is_pointless(game, move)]
+    if not flat_moves:
+        return NO_MOVES, None
+    if dead_end(game, legal_moves):
+        return DEAD_END, None
+    if is_softlocked(game):
+        return SOFTLOCK, None
+    move = choose(game, flat_moves)
+    if move is None:
+        return QUIT, None
+    apply_move(game, move)
+    return None, move
+
+def choose_manually(game, flat_moves):
+    """Ask the player for a move on the console; None means quit."""
+    while True:
+        print("\nLegal moves:")
+        for idx, move in enumerate(flat_moves):
+            print(f"{idx}: {('draw', 'Draw from stock') if move[0] == 'draw' else move}")
+        choice = input("\nEnter move number (q to quit): ").strip()
+        if choice.lower() == 'q':
+            return None
+        if choice.isdigit() and int(choice) in range(len(flat_moves)):
+            return flat_moves[int(choice)]
+        print("Invalid choice. Try again.")
+
+def play(bot_mode=True, delay=None, game=None, renderer=None):
+    """Play a game to the end and return its outcome.
+
+    The bot redraws through an AnsiRenderer by default, pausing ``delay``
+    seconds (0.01 unless given) after each move. With render.NullRenderer()
+    nothing is drawn, so there is no pause and the game runs at full speed.
+    """
+    if game is None:
+        game = create_test_game()
+    if renderer is None:
+        renderer = AnsiRenderer() if bot_mode else TextRenderer()
+    if isinstance(renderer, NullRenderer):
+        delay = 0
+    elif delay is None:
+        delay = 0.01
+    choose = (lambda game, flat_moves: choose_bot_move(flat_moves)) if bot_mode else choose_manually
+
+    renderer.render(game)
     while True:
-        os.system('cls')  # clear console (Windows)
-        print("\n=== Current State ===")
-        game.print_state()
-
-        if game.is_won():
-            print("🎉 You won!")
-            break
-
-        legal_moves = game.get_all_legal_moves()
-
-        # Include draw from stock as a legal move
-        if game.stock or game.waste:
-            legal_moves["draw"] = ["Draw from stock"]
-
-        # Flatten moves
-        flat_moves = []
-        for move_type, details in legal_moves.items():
-            for detail in details:
-                if isinstance(detail, tuple):
-                    flat_moves.append((move_type, *detail))
-                else:
-                    flat_moves.append((move_type, detail))
-
-        if not flat_moves:
-            print("No more legal moves. Game over.")
-            break
-
-        # Detect softlocks
-        current_snapshot = game.snapshot()
-        if current_snapshot in game.history and game.moves_since_progress >= 50:
-            print("Softlock detected! No real progress can be made.")
-            break
-        else:
-            game.history.append(current_snapshot)
-            if len(game.history) > 20:  # keep only last 20 snapshots
-                game.history.pop(0)
-
-        if bot_mode:
-            # Weighted random selection for the bot
-            weighted_moves = []
-            for move in flat_moves:
-                move_type = move[0]
-                weight = MOVE_WEIGHTS.get(move_type, 50)
-                weighted_moves.append((move, weight))
-            moves, weights = zip(*weighted_moves)
-            selected_move = random.choices(moves, weights=weights, k=1)[0]
-            print(f"\nBot chooses: {selected_move}")
+        outcome, move = step(game, choose)
+        if outcome is not None:
+            renderer.finish(game, OUTCOME_MESSAGES[outcome])
+            return outcome
+        renderer.render(game, f"Bot chooses: {move}" if bot_mode else "")
+        if delay:
             time.sleep(delay)
-        else:
-            # Manual mode
-            print("\nLegal moves:")
-            for idx, move in enumerate(flat_moves):
-                print(f"{idx}: {move}")
-            choice = input("\nEnter move number (q to quit): ").strip()
-            if choice.lower() == 'q':
-                print("Exiting game.")
-                break
-            if not choice.isdigit() or int(choice) not in range(len(flat_moves)):
-                print("Invalid choice. Try again.")
-                input("Press Enter to continue...")
-                continue
-            selected_move = flat_moves[int(choice)]
-
-        # Execute the chosen move
-        move_type = selected_move[0]
-        if move_type == "draw":
-            game.draw_from_stock()
-        elif move_type == "waste_to_foundation":
-            game.move_from_waste_to_foundation()
-        elif move_type == "waste_to_tableau":
-            game.move_from_waste_to_tableau(selected_move[1])
-        elif move_type == "tableau_to_foundation":
-            game.move_from_tableau_to_foundation(selected_move[1])
-        elif move_type == "tableau_to_tableau":
-            game.move_from_tableau_to_tableau(selected_move[1], selected_move[2], selected_move[3])
-        elif move_type == "foundation_to_tableau":
-            game.move_from_foundation_to_tableau(selected_move[1], selected_move[2])
 
 if __name__ == "__main__":
     #mode = input("Enter 'b' for bot mode or 'm' for manual mode: ").strip().lower()
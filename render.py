@@ -0,0 +1,67 @@
+"""Renderers for play.play.
+
+A renderer gets ``render(game, message)`` after every move and
+``finish(game, message)`` once the game ends. The game loop never prints
+on its own, so with NullRenderer a bot game runs at full speed.
+"""
+import sys
+import time
+
+class NullRenderer:
+    """Draws nothing."""
+
+    def render(self, game, message=""):
+        pass
+
+    def finish(self, game, message=""):
+        pass
+
+
+class TextRenderer:
+    """Writes every frame to ``stream`` in a single write call."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def frame(self, game, message=""):
+        text = "\n=== Current State ===\n" + game.format_state()
+        if message:
+            text += f"\n{message}\n"
+        return text
+
+    def draw(self, game, message=""):
+        self.stream.write(self.frame(game, message))
+        self.stream.flush()
+
+    def render(self, game, message=""):
+        self.draw(game, message)
+
+    def finish(self, game, message=""):
+        self.draw(game, message)
+
+
+class AnsiRenderer(TextRenderer):
+    """Redraws in place with ANSI escapes, at most ``fps`` frames per second.
+
+    Frames that arrive sooner than 1/fps after the last one drawn are
+    dropped; the final frame is always drawn.
+    """
+
+    CLEAR = "\x1b[H\x1b[2J"
+
+    def __init__(self, fps=30, stream=None, clock=time.monotonic):
+        super().__init__(stream)
+        self.interval = 1.0 / fps
+        self.clock = clock
+        self.last_frame = None
+        self.frames = 0
+
+    def draw(self, game, message=""):
+        self.stream.write(self.CLEAR + self.frame(game, message))
+        self.stream.flush()
+        self.last_frame = self.clock()
+        self.frames += 1
+
+    def render(self, game, message=""):
+        if self.last_frame is None or self.clock() - self.last_frame >= self.interval:
+            self.draw(game, message)
@@ -0,0 +1,99 @@
+"""Monte Carlo rollout policy.
+
+At each decision every legal move is scored by playing the MOVE_WEIGHTS bot
+forward from it a number of times on a CompactGame copy. Every candidate
+is rolled out with the same playout seeds (common random numbers), so
+differences between candidates come from the move rather than the dice.
+"""
+from compact import CompactGame
+from play import MOVE_WEIGHTS, flatten_moves, apply_move, choose_bot_move
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from itertools import repeat
+import random
+import time
+
+WIN_BONUS = 100
+
+def score(game):
+    return game.foundation_count() + (WIN_BONUS if game.is_won() else 0)
+
+def playout(game, rng, depth):
+    """Play the MOVE_WEIGHTS bot on ``game`` for up to ``depth`` moves; returns the final score."""
+    for _ in range(depth):
+        if game.is_won():
+            break
+        flat_moves = flatten_moves(game.get_all_legal_moves())
+        if not flat_moves:
+            break
+        apply_move(game, choose_bot_move(flat_moves, rng))
+    return score(game)
+
+def evaluate(state, move, seeds, depth):
+    """Total playout score of ``move`` from ``state``, one playout per seed."""
+    child = state.copy()
+    apply_move(child, move)
+    return sum(playout(child.copy(), random.Random(seed), depth) for seed in seeds)
+
+
+class RolloutPolicy:
+    """Pick moves by the average score of random playouts after each of them.
+
+    ``playouts`` playouts of at most ``depth`` moves are run per candidate,
+    in rounds of ``chunk`` playouts. Once ``time_budget`` seconds have
+    passed no new round starts, so a decision costs at most one round over
+    budget. ``executor`` is None (run inline), "thread" or "process";
+    with a pool each round runs the candidates in parallel on ``workers``
+    workers.
+    """
+
+    def __init__(self, playouts=8, depth=100, time_budget=None, executor=None, workers=None, chunk=None, rng=None):
+        self.playouts = playouts
+        self.depth = depth
+        self.time_budget = time_budget
+        self.executor = executor
+        self.workers = workers
+        self.chunk = chunk or (1 if executor is None else playouts)
+        self.rng = rng or random.Random()
+        self._pool = None
+
+    def _map(self, root, moves, seeds):
+        if self.executor is None:
+            return [evaluate(root, move, seeds, self.depth) for move in moves]
+        if self._pool is None:
+            pool_class = ThreadPoolExecutor if self.executor == "thread" else ProcessPoolExecutor
+            self._pool = pool_class(self.workers)
+        return list(self._pool.map(evaluate, repeat(root), moves, repeat(seeds), repeat(self.depth)))
+
+    def choose(self, game, moves=None):
+        """Return the best of ``moves`` (default: every legal move of ``game``), or None."""
+        if moves is None:
+            moves = flatten_moves(game.get_all_legal_moves())
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+
+        start = time.perf_counter()
+        root = game.copy() if isinstance(game, CompactGame) else CompactGame.from_game(game)
+        totals = [0] * len(moves)
+        done = 0
+        while done < self.playouts:
+            seeds = [self.rng.getrandbits(32) for _ in range(min(self.chunk, self.playouts - done))]
+            for i, total in enumerate(self._map(root, moves, seeds)):
+                totals[i] += total
+            done += len(seeds)
+            if self.time_budget is not None and time.perf_counter() - start > self.time_budget:
+                break
+        # Every candidate ran the same playouts, so totals compare directly;
+        # MOVE_WEIGHTS breaks ties
+        best = max(range(len(moves)), key=lambda i: (totals[i], MOVE_WEIGHTS.get(moves[i][0], 50)))
+        return moves[best]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,314 @@
+"""Asyncio game server: many concurrent Game sessions over line-delimited JSON.
+
+    python -m server --socket /tmp/klondike.sock --workers 4
+    python -m server --port 8765
+
+Every request is one JSON object on one line and gets one JSON line back.
+``op`` names the operation; an ``id`` field, if given, is echoed so a
+client can pipeline requests on one connection.
+
+    {"op": "new", "seed": 7, "draw": 1, "max_recycles": null, "auto_foundation": false}
+    {"op": "moves", "session": 1}
+    {"op": "apply", "session": 1, "move": [4, 2, 5, 1]}
+    {"op": "undo", "session": 1}
+    {"op": "state", "session": 1}
+    {"op": "hint", "session": 1}
+    {"op": "solve", "session": 1}
+    {"op": "close", "session": 1}
+
+Moves are ``[kind, a, b, c]`` lists (see main.MOVE_TYPES and
+Game.generate_moves). Replies carry ``"ok": true`` and the legal moves
+after any change of position, or ``"ok": false`` and an ``error``.
+
+Sessions belong to the server, not to a connection, so a client can drop
+and reconnect. Hints and solves run the solver in a process pool and the
+event loop only ever does single moves, so no request stalls the others.
+A session remembers the line a solve found for as long as its moves are
+followed, so hints along that line are answered without solving again.
+In auto_foundation sessions lines leave out the safe foundation moves
+the game plays by itself, so they replay move for move through apply.
+"""
+from main import Game, WASTE_TO_FOUNDATION, TABLEAU_TO_FOUNDATION
+from compact import CompactGame, NO_LIMIT
+from solver import Solver, WON
+from play import encode_move
+from batch import ENDGAME_TABLE
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import sys
+
+class SessionError(Exception):
+    """A request the server can't carry out; its message goes back to the client."""
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class Session:
+    def __init__(self, game):
+        self.game = game
+        self.undo_stack = []  # undo records of the moves played, latest last
+        self._legal = None    # legal moves of the current position, once asked for
+        self.line = None      # rest of a winning line found by the solver, as (kind, a, b, c) tuples
+
+    def legal_moves(self):
+        if self._legal is None:
+            self._legal = list(self.game.generate_moves())
+        return self._legal
+
+    def make_move(self, move):
+        if move not in self.legal_moves():
+            raise SessionError(f"illegal move {list(move)}")
+        self.undo_stack.append(self.game.make_move(move))
+        self._legal = None
+        # Following the solver's line keeps the rest of it good for later hints
+        self.line = self.line[1:] if self.line and self.line[0] == move else None
+
+    def undo(self):
+        if not self.undo_stack:
+            raise SessionError("nothing to undo")
+        self.game.undo(self.undo_stack.pop())
+        self._legal = None
+        self.line = None
+
+
+def _solve(state, max_nodes, auto_foundation=False):
+    """Solve a Game.to_bytes record in a worker; returns (status, encoded line, nodes).
+
+    With ``auto_foundation`` the line is the one to play in such a game: it
+    leaves out the safe foundation moves Game.make_move already plays.
+    """
+    solver = Solver(max_nodes=max_nodes, endgame=ENDGAME_TABLE)
+    result = solver.solve(CompactGame.from_bytes(state))
+    if result.status != WON:
+        return result.status, None, result.nodes
+    moves = [encode_move(move) for move in result.moves]
+    if not auto_foundation:
+        return WON, moves, result.nodes
+    game = Game.from_compact(CompactGame.from_bytes(state), auto_foundation=True)
+    line, nodes = [], result.nodes
+    while True:
+        # Follow the line in a plain copy too, to tell which card each foundation move plays
+        plain = Game.from_compact(CompactGame.from_game(game))
+        for move in moves:
+            card = None
+            if move[0] == WASTE_TO_FOUNDATION:
+                card = plain.pile[plain.cursor - 1]
+            elif move[0] == TABLEAU_TO_FOUNDATION:
+                card = plain.tableaus[move[1]]["face_up"][-1]
+            plain.make_move(move)
+            if card is not None and len(game.foundations[card.suit]) >= card.rank:
+                continue  # auto_foundation played it already
+            if move not in game.generate_moves():
+                break
+            game.make_move(move)
+            line.append(move)
+        else:
+            return WON, line, nodes
+        # Cards that went up early broke the rest of the line; solve again from here
+        result = solver.solve(game)
+        nodes += result.nodes
+        if result.status != WON:
+            return result.status, None, nodes
+        moves = [encode_move(move) for move in result.moves]
+
+
+class SessionManager:
+    """Hosts Game sessions and answers protocol requests (see handle).
+
+    ``executor`` runs the solver; by default a ProcessPoolExecutor with
+    ``workers`` processes is started on first use. ``max_nodes`` is the
+    solver budget per hint or solve.
+    """
+
+    def __init__(self, executor=None, workers=None, max_nodes=20000, max_sessions=100000):
+        self.executor = executor
+        self.workers = workers
+        self.max_nodes = max_nodes
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        self.clients = set()  # tasks serving open connections
+        self.handlers = {"new": self.new, "moves": self.moves, "apply": self.apply, "undo": self.undo,
+                         "state": self.state, "hint": self.hint, "solve": self.solve, "close": self.close}
+
+    async def handle(self, request):
+        """One decoded request -> its reply dict.
+
+        Every request gets a reply: a failure the handlers didn't foresee
+        is reported as an internal error rather than left unanswered.
+        """
+        reply = {"id": request["id"]} if "id" in request else {}
+        try:
+            op = request.get("op")
+            handler = self.handlers.get(op) if isinstance(op, str) else None
+            if handler is None:
+                raise SessionError(f"unknown op {op!r}")
+            reply.update(await handler(request))
+            reply["ok"] = True
+        except SessionError as error:
+            reply.update(ok=False, error=str(error))
+        except Exception as error:
+            reply.update(ok=False, error=f"internal error: {type(error).__name__}: {error}")
+        return reply
+
+    def session(self, request):
+        session_id = request.get("session")
+        session = self.sessions.get(session_id) if _is_int(session_id) else None
+        if session is None:
+            raise SessionError(f"no session {session_id!r}")
+        return session
+
+    def position(self, session):
+        game = session.game
+        return {"moves": [list(move) for move in session.legal_moves()], "won": game.is_won(),
+                "foundation": game.foundation_count()}
+
+    async def new(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            raise SessionError("too many sessions")
+        draw_count, seed, max_recycles = request.get("draw", 1), request.get("seed"), request.get("max_recycles")
+        if not _is_int(draw_count) or draw_count not in (1, 3):
+            raise SessionError("draw must be 1 or 3")
+        if seed is not None and not _is_int(seed):
+            raise SessionError("seed must be an integer or null")
+        if max_recycles is not None and not (_is_int(max_recycles) and 0 <= max_recycles < NO_LIMIT):
+            raise SessionError(f"max_recycles must be an integer from 0 to {NO_LIMIT - 1} or null")
+        game = Game(seed=seed, draw_count=draw_count, max_recycles=max_recycles,
+                    auto_foundation=bool(request.get("auto_foundation")))
+        session_id = next(self._ids)
+        session = self.sessions[session_id] = Session(game)
+        return {"session": session_id, **self.position(session)}
+
+    async def moves(self, request):
+        return self.position(self.session(request))
+
+    async def apply(self, request):
+        session = self.session(request)
+        move = request.get("move")
+        if not isinstance(move, list) or len(move) != 4 or not all(_is_int(value) for value in move):
+            raise SessionError("apply needs a move [kind, a, b, c]")
+        session.make_move(tuple(move))
+        return self.position(session)
+
+    async def undo(self, request):
+        session = self.session(request)
+        session.undo()
+        return self.position(session)
+
+    async def state(self, request):
+        session = self.session(request)
+        return {"text": session.game.format_state(), "hash": session.game.state_hash, **self.position(session)}
+
+    async def _run_solver(self, request):
+        """(status, line, nodes) for the session's position, reusing the line of an earlier solve."""
+        session = self.session(request)
+        if session.line and session.line[0] in session.legal_moves():
+            return WON, session.line, 0
+        if self.executor is None:
+            # Forking from a running event loop can copy held locks into the worker
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("forkserver"))
+        loop = asyncio.get_running_loop()
+        state = session.game.to_bytes()
+        status, moves, nodes = await loop.run_in_executor(self.executor, _solve, state, self.max_nodes,
+                                                          session.game.auto_foundation)
+        if moves is not None and session.game.to_bytes() == state:
+            session.line = [tuple(move) for move in moves]
+        return status, moves, nodes
+
+    async def hint(self, request):
+        """The first move of a winning line, if the solver finds one in budget."""
+        status, moves, nodes = await self._run_solver(request)
+        return {"status": status, "move": list(moves[0]) if moves else None, "nodes": nodes}
+
+    async def solve(self, request):
+        status, moves, nodes = await self._run_solver(request)
+        return {"status": status, "line": [list(move) for move in moves] if moves is not None else None,
+                "nodes": nodes}
+
+    async def close(self, request):
+        self.session(request)
+        del self.sessions[request["session"]]
+        return {}
+
+    async def serve_client(self, reader, writer):
+        """Answer the requests of one connection, one reply line per request line.
+
+        Requests are handled concurrently, so a slow hint doesn't hold up the
+        replies to later requests; match replies to requests by ``id``.
+        """
+        pending = set()
+        self.clients.add(asyncio.current_task())
+
+        async def answer(line):
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("not an object")
+            except ValueError as error:
+                reply = {"ok": False, "error": f"bad request: {error}"}
+            else:
+                reply = await self.handle(request)
+            writer.write(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.ensure_future(answer(line))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            self.clients.discard(asyncio.current_task())
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+
+async def start_server(manager, path=None, host="127.0.0.1", port=None):
+    """Listen on a Unix socket at ``path``, or on ``host``:``port``; returns the asyncio Server."""
+    if path is not None:
+        return await asyncio.start_unix_server(manager.serve_client, path, limit=2 ** 20)
+    return await asyncio.start_server(manager.serve_client, host, port, limit=2 ** 20)
+
+async def serve(path=None, host="127.0.0.1", port=None, workers=None, max_nodes=20000):
+    manager = SessionManager(workers=workers, max_nodes=max_nodes)
+    server = await start_server(manager, path, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        manager.shutdown()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Klondike sessions over line-delimited JSON.")
+    parser.add_argument("--socket", default=None, help="Unix socket path (default: TCP on --host/--port)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="solver processes (default the CPU count)")
+    parser.add_argument("--max-nodes", type=int, default=20000, help="solver node budget per hint or solve")
+    args = parser.parse_args(argv)
+
+    where = args.socket or f"{args.host}:{args.port}"
+    print(f"serving on {where}", file=sys.stderr)
+    try:
+        asyncio.run(serve(args.socket, args.host, args.port, args.workers, args.max_nodes))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+from compact import CompactGame, RANK, SUIT, TABLEAU_CAPACITY, is_safe_to_foundation
+from play import flatten_moves, apply_move
+from deadend import blocked_card
+from canon import canonical_key, is_pointless
+import heapq
+import itertools
+import time
+
+WON = "won"
+LOST = "lost"
+UNKNOWN = "unknown"
+
+class SolveResult:
+    def __init__(self, status, moves, nodes, elapsed):
+        self.status = status      # WON, LOST (search space exhausted) or UNKNOWN (budget hit)
+        self.moves = moves        # winning line as flattened moves, None unless WON
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        length = len(self.moves) if self.moves is not None else "-"
+        return f"SolveResult({self.status}, moves={length}, nodes={self.nodes}, {self.elapsed:.3f}s)"
+
+
+def safe_foundation_move(game):
+    """Return a flattened foundation move that can never hurt, or None (see compact.is_safe_to_foundation)."""
+    foundations = game.foundations
+    candidates = []
+    if game.cursor:
+        card = game.pile[game.cursor - 1]
+        candidates.append((card, ("waste_to_foundation", card)))
+    for i in range(7):
+        height = game.heights[i]
+        if height > game.down[i]:
+            card = game.cells[i * TABLEAU_CAPACITY + height - 1]
+            candidates.append((card, ("tableau_to_foundation", i, card)))
+    for card, move in candidates:
+        if RANK[card] == foundations[SUIT[card]] + 1 and is_safe_to_foundation(card, foundations):
+            return move
+    return None
+
+def play_safe_moves(game):
+    """Apply safe foundation moves until none remain; returns the moves played."""
+    played = []
+    move = safe_foundation_move(game)
+    while move is not None:
+        apply_move(game, move)
+        played.append(move)
+        move = safe_foundation_move(game)
+    return played
+
+def heuristic(game):
+    """Lower is better: cards still hidden or off the foundations."""
+    return 2 * sum(game.down) + 52 - sum(game.foundations)
+
+def unwind(path):
+    """Rebuild the flat move list from a chain of (moves, parent) links."""
+    chunks = []
+    while path is not None:
+        chunks.append(path[0])
+        path = path[1]
+    return [move for chunk in reversed(chunks) for move in chunk]
+
+
+class Solver:
+    """Best-first search over CompactGame positions.
+
+    Positions are expanded in order of ``heuristic`` with safe foundation
+    moves collapsed into the move that enabled them. ``max_nodes`` and
+    ``time_limit`` bound the work; ``table_size`` bounds the transposition
+    table. A deal is only reported LOST when the whole reachable space was
+    explored without the table overflowing.
+
+    The table holds canonical keys (see canon.py), so positions that only
+    differ in column order are expanded once; ``suits`` also merges
+    positions that differ by swapping same-color suits. An instrument.Profiler passed
+    as ``profiler`` gets the node and transposition counts of every search.
+    With an endgame.EndgameTable as ``endgame``, positions with nothing face
+    down are settled by the table instead of being expanded.
+    """
+
+    def __init__(self, max_nodes=200000, time_limit=None, table_size=1000000, profiler=None, suits=False,
+                 endgame=None):
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.table_size = table_size
+        self.profiler = profiler
+        self.suits = suits
+        self.endgame = endgame
+        self.generated = 0
+        self.duplicates = 0
+
+    def solve(self, game):
+        result = self._search(game)
+        if self.profiler is not None:
+            self.profiler.add_search(result.nodes, self.generated, self.duplicates, result.elapsed)
+        return result
+
+    def _search(self, game):
+        start_time = time.perf_counter()
+        self.generated = self.duplicates = 0
+        root = game.copy() if isinstance(game, CompactGame) else CompactGame.from_game(game)
+        # Lines are stored as (moves, parent) links so siblings share their prefix
+        path = (tuple(play_safe_moves(root)), None)
+        if root.is_won():
+            return SolveResult(WON, unwind(path), 0, time.perf_counter() - start_time)
+        if blocked_card(root) is not None:
+            return SolveResult(LOST, None, 0, time.perf_counter() - start_time)
+
+        suits = self.suits
+        seen = {canonical_key(root, suits)}
+        counter = itertools.count()  # tie-breaker so heapq never compares games
+        frontier = [(heuristic(root), next(counter), root, path)]
+        complete = True
+        nodes = generated = duplicates = 0
+
+        while frontier:
+            if nodes >= self.max_nodes or (self.time_limit is not None and nodes % 256 == 0
+                                           and time.perf_counter() - start_time > self.time_limit):
+                self.generated, self.duplicates = generated, duplicates
+                return SolveResult(UNKNOWN, None, nodes, time.perf_counter() - start_time)
+
+            _, _, state, path = heapq.heappop(frontier)
+            nodes += 1
+            if self.endgame is not None and not any(state.down):
+                status, line = self.endgame.solve(state)
+                if status == WON:
+                    self.generated, self.duplicates = generated, duplicates
+                    return SolveResult(WON, unwind(path) + line, nodes, time.perf_counter() - start_time)
+                if status == LOST:
+                    continue
+            for move in flatten_moves(state.get_all_legal_moves()):
+                if is_pointless(state, move):
+                    continue
+                child = state.copy()
+                apply_move(child, move)
+                line = ((move, *play_safe_moves(child)), path)
+                generated += 1
+                if child.is_won():
+                    self.generated, self.duplicates = generated, duplicates
+                    return SolveResult(WON, unwind(line), nodes, time.perf_counter() - start_time)
+                key = canonical_key(child, suits)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                if len(seen) < self.table_size:
+                    seen.add(key)
+                else:
+                    complete = False  # can no longer prove the deal lost
+                heapq.heappush(frontier, (heuristic(child), next(counter), child, line))
+
+        self.generated, self.duplicates = generated, duplicates
+        status = LOST if complete else UNKNOWN
+        return SolveResult(status, None, nodes, time.perf_counter() - start_time)
+
+
+def solve(game, max_nodes=200000, time_limit=None, table_size=1000000):
+    return Solver(max_nodes, time_limit, table_size).solve(game)
@@ -0,0 +1,33 @@
+import csv
+import os
+import tempfile
+import unittest
+from main import Game
+from compact import CompactGame
+from batch import run_deal, run_batch, FIELDS
+
+class TestBatch(unittest.TestCase):
+
+    def test_seeded_deals_are_reproducible(self):
+        self.assertEqual(Game(seed=42).snapshot(), Game(seed=42).snapshot())
+        self.assertNotEqual(Game(seed=42).snapshot(), Game(seed=43).snapshot())
+        self.assertEqual(CompactGame(seed=42).snapshot(), Game(seed=42).snapshot())
+
+    def test_run_deal_is_deterministic_across_engines(self):
+        first = run_deal(5, engine="game", max_moves=300)
+        second = run_deal(5, engine="compact", max_moves=300)
+        self.assertEqual(first[:4], second[:4])
+
+    def test_run_batch_streams_rows_in_seed_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "results.csv")
+            won, played = run_batch(6, workers=2, seed=10, max_moves=200, out=out, chunksize=2)
+            with open(out, newline="") as handle:
+                rows = list(csv.reader(handle))
+        self.assertEqual(played, 6)
+        self.assertEqual(rows[0], FIELDS)
+        self.assertEqual([int(row[0]) for row in rows[1:]], list(range(10, 16)))
+        self.assertEqual(won, sum(int(row[1]) for row in rows[1:]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from bench import run, compare, find_move, games_per_second
+from play import apply_move
+
+class TestBench(unittest.TestCase):
+
+    def test_every_move_type_has_a_fixed_position(self):
+        for move_type in ["draw", "waste_to_tableau", "waste_to_foundation",
+                          "tableau_to_foundation", "tableau_to_tableau", "foundation_to_tableau"]:
+            game, move = find_move(move_type)
+            self.assertEqual(move[0], move_type)
+
+    def test_move_and_undo_leave_position_unchanged(self):
+        for move_type in ["draw", "tableau_to_tableau", "tableau_to_foundation"]:
+            game, move = find_move(move_type)
+            before = (game.snapshot(), game.state_hash)
+            for _ in range(3):
+                game.undo(apply_move(game, move))
+            self.assertEqual((game.snapshot(), game.state_hash), before)
+
+    def test_run_reports_every_requested_benchmark(self):
+        results = run(["snapshot", "draw_from_stock"], repeat=1, scale=0.01)
+        self.assertEqual(set(results), {"snapshot", "draw_from_stock"})
+        self.assertTrue(all(value > 0 for value in results.values()))
+
+    def test_game_benchmarks_report_games_per_second(self):
+        results = run(["batch_game"], repeat=2)
+        throughput = games_per_second(results)
+        self.assertEqual(set(throughput), {"batch_game"})
+        self.assertAlmostEqual(throughput["batch_game"], 1e6 / results["batch_game"])
+
+    def test_compare_flags_only_regressions_over_threshold(self):
+        baseline = {"a": 10.0, "b": 10.0, "c": 10.0}
+        results = {"a": 11.0, "b": 13.0, "c": 5.0, "new": 1.0}
+        self.assertEqual([r[0] for r in compare(results, baseline, 0.2)], ["b"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from main import Game
+from compact import CompactGame, deal_for_seed
+from play import apply_move
+from solver import solve, WON, UNKNOWN
+from cache import ResultCache, variant_name, pack_moves, unpack_moves
+from batch import run_batch, cached_policy
+
+class TestResultCache(unittest.TestCase):
+
+    def test_deal_encoding_is_canonical(self):
+        self.assertEqual(Game(seed=9).initial_deal, deal_for_seed(9))
+        self.assertEqual(CompactGame(seed=9).initial_deal, deal_for_seed(9))
+        self.assertEqual(sorted(deal_for_seed(9)), list(range(52)))
+
+    def test_packed_solution_replays(self):
+        game = Game(seed=0)
+        result = solve(game, max_nodes=20000)
+        self.assertEqual(result.status, WON)
+        blob = pack_moves(result.moves)
+        self.assertEqual(len(blob), 4 * len(result.moves))
+        for move in unpack_moves(blob):
+            apply_move(game, move)
+        self.assertTrue(game.is_won())
+
+    def test_results_persist_across_connections(self):
+        variant = variant_name()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "results.db")
+            cache = ResultCache(path)
+            cache.put(deal_for_seed(1), variant, "solver", "lost", 3)
+            cache.close()
+            cache = ResultCache(path)
+            result = cache.get(deal_for_seed(1), variant, "solver")
+            self.assertEqual((result.status, result.foundation, result.length), ("lost", 3, None))
+            self.assertIsNone(cache.get(deal_for_seed(1), variant, "random"))
+            self.assertIsNone(cache.get(deal_for_seed(1), variant_name(3), "solver"))
+            self.assertEqual((cache.hits, cache.misses), (1, 2))
+            cache.close()
+
+    def test_keeps_shortest_solution(self):
+        cache = ResultCache()
+        deal = deal_for_seed(2)
+        cache.put(deal, "v", "p", "won", 52, [("draw", None)] * 5)
+        cache.put(deal, "v", "p", "won", 52, [("draw", None)] * 9)
+        self.assertEqual(cache.get(deal, "v", "p").length, 5)
+        cache.put(deal, "v", "p", "won", 52, [("draw", None)] * 3)
+        self.assertEqual(cache.get(deal, "v", "p").length, 3)
+
+    def test_memory_tier_is_lru(self):
+        cache = ResultCache(memory_size=2)
+        for seed in range(3):
+            cache.put(deal_for_seed(seed), "v", "p", "lost", seed)
+        self.assertEqual(len(cache.memory), 2)
+        self.assertNotIn((deal_for_seed(0), "v", "p"), cache.memory)
+        self.assertEqual(cache.get(deal_for_seed(0), "v", "p").foundation, 0)  # still on disk
+
+    def test_batch_rerun_is_served_from_cache(self):
+        cache = ResultCache()
+        first = run_batch(4, workers=1, seed=20, max_moves=100, cache=cache)
+        misses = cache.misses
+        self.assertEqual(run_batch(4, workers=1, seed=20, max_moves=100, cache=cache), first)
+        self.assertEqual(cache.misses, misses)
+        self.assertEqual(cache.hits, 4)
+
+    def test_batch_rows_from_cache_match_played_rows(self):
+        cache = ResultCache()
+        with tempfile.TemporaryDirectory() as tmp:
+            rows = []
+            for run in range(2):
+                out = os.path.join(tmp, f"run{run}.csv")
+                run_batch(4, workers=1, seed=20, max_moves=100, cache=cache, out=out)
+                with open(out) as handle:
+                    rows.append([line.rsplit(",", 1)[0] for line in handle])
+        self.assertEqual(rows[0], rows[1])
+        self.assertEqual(cache.hits, 4)
+        for seed in range(20, 24):
+            result = cache.get(deal_for_seed(seed), variant_name(), cached_policy("random", 100))
+            self.assertIn(result.status, (WON, UNKNOWN))
+            self.assertGreater(result.length, 0)
+
+    def test_batch_keys_on_max_moves(self):
+        cache = ResultCache()
+        run_batch(4, workers=1, seed=20, max_moves=100, cache=cache)
+        run_batch(4, workers=1, seed=20, max_moves=50, cache=cache)
+        self.assertEqual(cache.hits, 0)
+
+    def test_lost_result_gives_way_to_a_win(self):
+        cache = ResultCache()
+        deal = deal_for_seed(3)
+        cache.put(deal, "v", "p", UNKNOWN, 10, length=100)
+        self.assertEqual(cache.get(deal, "v", "p").length, 100)
+        cache.put(deal, "v", "p", WON, 52, [("draw", None)] * 200)
+        self.assertEqual(cache.get(deal, "v", "p").status, WON)
+        cache.put(deal, "v", "p", UNKNOWN, 10, length=50)
+        self.assertEqual(cache.get(deal, "v", "p").length, 200)
+
+    def test_batch_keeps_endgame_results_apart(self):
+        cache = ResultCache()
+        run_batch(4, workers=1, seed=20, max_moves=100, cache=cache)
+        misses = cache.misses
+        run_batch(4, workers=1, seed=20, max_moves=100, cache=cache, endgame=True)
+        self.assertEqual(cache.misses, misses + 4)
+
+if __name__ == "__main__":
+    unittest.main()
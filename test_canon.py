@@ -0,0 +1,98 @@
+import random
+import unittest
+from main import Game
+from compact import CompactGame
+from play import flatten_moves, apply_move, choose_bot_move, encode_move, decode_move, is_softlocked
+from canon import canonical_form, canonical_key, canonical_game, to_canonical, from_canonical
+from solver import Solver, WON
+
+def random_position(seed, moves=60):
+    game = CompactGame(seed=seed)
+    rng = random.Random(seed)
+    for _ in range(moves):
+        flat_moves = flatten_moves(game.get_all_legal_moves())
+        if not flat_moves:
+            break
+        apply_move(game, choose_bot_move(flat_moves, rng))
+    return game
+
+def legal(game):
+    return sorted(encode_move(move) for move in flatten_moves(game.get_all_legal_moves()))
+
+class TestCanonicalKey(unittest.TestCase):
+
+    def test_column_order_does_not_matter(self):
+        game = Game(seed=7)
+        key = canonical_key(game)
+        game.tableaus.reverse()
+        game.rehash()
+        self.assertEqual(canonical_key(game), key)
+        self.assertEqual(canonical_key(CompactGame.from_game(game)), key)
+
+    def test_different_positions_keep_different_keys(self):
+        game = CompactGame(seed=7)
+        key = canonical_key(game)
+        game.draw_from_stock()
+        self.assertNotEqual(canonical_key(game), key)
+        self.assertNotEqual(canonical_key(CompactGame(seed=8)), key)
+
+    def test_suit_swap_shares_key_only_when_asked(self):
+        game = random_position(3)
+        twin = canonical_game(game, suits=True)
+        self.assertEqual(canonical_key(twin, suits=True), canonical_key(game, suits=True))
+        self.assertEqual(canonical_key(canonical_game(game)), canonical_key(game))
+        for seed in range(10):
+            position = random_position(seed)
+            self.assertEqual(canonical_form(position)[0], canonical_key(position))
+
+    def test_canonical_game_has_sorted_columns(self):
+        game = random_position(5)
+        key, order, swap = canonical_form(game)
+        self.assertEqual(sorted(order), list(range(7)))
+        self.assertEqual(canonical_form(canonical_game(game))[1], list(range(7)))
+
+
+class TestCanonicalMoves(unittest.TestCase):
+
+    def check_moves_map_to_real_columns(self, game, suits):
+        key, order, swap = canonical_form(game, suits)
+        twin = canonical_game(game, suits)
+        canonical_moves = legal(twin)
+        self.assertEqual(sorted(to_canonical(move, order, swap) for move in legal(game)), canonical_moves)
+        for move in canonical_moves:
+            real = from_canonical(move, order, swap)
+            self.assertEqual(to_canonical(real, order, swap), move)
+            played, played_twin = game.copy(), twin.copy()
+            apply_move(played, decode_move(real))
+            apply_move(played_twin, decode_move(move))
+            self.assertEqual(canonical_key(played, suits), canonical_key(played_twin, suits))
+
+    def test_moves_decode_to_real_columns(self):
+        for seed in range(8):
+            game = random_position(seed, moves=seed * 15)
+            self.check_moves_map_to_real_columns(game, suits=False)
+            self.check_moves_map_to_real_columns(game, suits=True)
+
+
+class TestCanonicalSearch(unittest.TestCase):
+
+    def test_softlock_sees_columns_swapped_back_and_forth(self):
+        game = Game(seed=11)
+        game.history = {}
+        self.assertFalse(is_softlocked(game))
+        game.tableaus[0], game.tableaus[6] = game.tableaus[6], game.tableaus[0]
+        game.rehash()
+        is_softlocked(game)
+        self.assertEqual(len(game.history), 1)
+
+    def test_solver_still_finds_replayable_wins(self):
+        for suits in (False, True):
+            game = CompactGame(seed=0)
+            result = Solver(max_nodes=20000, suits=suits).solve(game)
+            self.assertEqual(result.status, WON)
+            for move in result.moves:
+                apply_move(game, move)
+            self.assertTrue(game.is_won())
+
+if __name__ == "__main__":
+    unittest.main()
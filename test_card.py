@@ -0,0 +1,40 @@
+import copy
+import pickle
+import unittest
+from card import Card, DECK
+from deck import Deck
+
+class TestCard(unittest.TestCase):
+
+    def test_cards_are_interned(self):
+        self.assertIs(Card(12, "♥"), Card(12, "♥"))
+        self.assertEqual(Card(12, "♥"), Card(12, "♥"))
+        self.assertNotEqual(Card(12, "♥"), Card(12, "♦"))
+        self.assertIs(copy.deepcopy(Card(3, "♣")), Card(3, "♣"))
+        self.assertIs(pickle.loads(pickle.dumps(Card(3, "♣"))), Card(3, "♣"))
+
+    def test_cards_are_hashable_and_immutable(self):
+        self.assertEqual(len({Card(1, "♠"), Card(1, "♠"), Card(2, "♠")}), 2)
+        with self.assertRaises(AttributeError):
+            Card(1, "♠").rank = 2
+        with self.assertRaises(AttributeError):
+            Card(1, "♠").extra = 1
+
+    def test_precomputed_fields(self):
+        card = Card(11, "♦")
+        self.assertEqual(card.color, "red")
+        self.assertEqual(Card(11, "♣").color, "black")
+        self.assertEqual(str(card), "J♦")
+        self.assertEqual(repr(Card(10, "♠")), "10♠")
+        self.assertEqual([c.index for c in DECK], list(range(52)))
+
+    def test_new_deck_reuses_the_same_cards(self):
+        first = Deck().deck
+        second = Deck().deck
+        self.assertEqual(len(first), 52)
+        self.assertTrue(all(a is b for a, b in zip(first, second)))
+        first.pop()
+        self.assertEqual(len(Deck().deck), 52)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import math
+import os
+import random
+import tempfile
+import unittest
+from main import Game
+from compact import CompactGame, STATE_RECORD, deal_for_seed
+from play import flatten_moves, apply_move, encode_move
+from batch import play_random
+from codec import (deal_rank, deal_from_rank, pack_deal, unpack_deal, move_opcodes, iter_moves, pack_trace,
+                   read_traces, iter_states, map_file, Trace, OPCODE_MOVES, DEAL_RANK_SIZE)
+
+def random_game(seed, moves, **options):
+    game = Game(seed=seed, **options)
+    rng = random.Random(seed)
+    played = []
+    for _ in range(moves):
+        flat_moves = flatten_moves(game.get_all_legal_moves())
+        if not flat_moves:
+            break
+        played.append(rng.choice(flat_moves))
+        apply_move(game, played[-1])
+    return game, played
+
+class TestDeals(unittest.TestCase):
+
+    def test_rank_round_trip(self):
+        self.assertEqual(DEAL_RANK_SIZE, 29)
+        self.assertEqual(deal_rank(bytes(range(52))), 0)
+        self.assertEqual(deal_rank(bytes(reversed(range(52)))), math.factorial(52) - 1)
+        for seed in range(20):
+            deal = deal_for_seed(seed)
+            self.assertEqual(deal_from_rank(deal_rank(deal)), deal)
+            for ranked in (False, True):
+                packed = pack_deal(deal, ranked)
+                self.assertEqual(len(packed), 29 if ranked else 52)
+                self.assertEqual(unpack_deal(memoryview(packed), ranked=ranked), deal)
+
+    def test_game_from_initial_deal(self):
+        self.assertEqual(Game(initial_deal=deal_for_seed(4)).snapshot(), Game(seed=4).snapshot())
+
+
+class TestMoves(unittest.TestCase):
+
+    def test_every_opcode_round_trips(self):
+        for op, move in OPCODE_MOVES.items():
+            self.assertEqual(list(iter_moves(bytes((op,)))), [move])
+
+    def test_played_moves_round_trip(self):
+        game, played = random_game(3, 300)
+        opcodes = move_opcodes(played)
+        self.assertLessEqual(len(opcodes), 2 * len(played))
+        self.assertEqual(list(iter_moves(memoryview(opcodes))), [encode_move(move) for move in played])
+
+
+class TestStates(unittest.TestCase):
+
+    def test_game_round_trip(self):
+        for seed in range(10):
+            game, played = random_game(seed, 20 * seed, max_recycles=2 if seed % 2 else None)
+            data = game.to_bytes()
+            self.assertEqual(len(data), STATE_RECORD.size)
+            loaded = Game.from_bytes(data)
+            self.assertEqual(loaded.snapshot(), game.snapshot())
+            self.assertEqual(loaded.state_hash, game.state_hash)
+            self.assertEqual((loaded.initial_deal, loaded.recycles, loaded.max_recycles, loaded.moves_since_progress),
+                             (game.initial_deal, game.recycles, game.max_recycles, game.moves_since_progress))
+            self.assertEqual(loaded.get_all_legal_moves(), game.get_all_legal_moves())
+
+    def test_unlimited_recycle_count_is_clamped(self):
+        game = Game(seed=1)
+        game.pile, game.cursor = game.pile[:1], 0
+        game.rehash()
+        for _ in range(300):
+            game.draw_from_stock()
+        self.assertEqual(game.recycles, 299)
+        loaded = Game.from_bytes(game.to_bytes())
+        self.assertEqual(loaded.recycles, 255)
+        self.assertEqual(loaded.snapshot(), game.snapshot())
+        self.assertEqual(loaded.get_all_legal_moves(), game.get_all_legal_moves())
+
+    def test_records_are_read_in_place(self):
+        games = [CompactGame.from_game(random_game(seed, 50)[0]) for seed in range(5)]
+        buffer = memoryview(b"".join(game.to_bytes() for game in games))
+        self.assertEqual([game.key() for game in iter_states(buffer)], [game.key() for game in games])
+        self.assertEqual(CompactGame.from_bytes(buffer, 3 * STATE_RECORD.size).key(), games[3].key())
+
+
+class TestTraces(unittest.TestCase):
+
+    def test_replay_rebuilds_every_position(self):
+        game, played = random_game(6, 200, draw_count=3, max_recycles=1)
+        trace = Trace(pack_trace(game.initial_deal, played, draw_count=3, max_recycles=1, ranked=True))
+        self.assertEqual(trace.replay().snapshot(), game.snapshot())
+        replayed, expected = Game(seed=6, draw_count=3, max_recycles=1), []
+        for move in played:
+            apply_move(replayed, move)
+            expected.append(replayed.snapshot())
+        self.assertEqual([position.snapshot() for move, position in trace.positions()], expected)
+        self.assertEqual(trace.replay(17).snapshot(), expected[16])
+
+    def test_trace_file_with_auto_foundation(self):
+        games = []
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "games.ktr")
+            with open(path, "wb") as handle:
+                for seed in range(4):
+                    game = Game(seed=seed, auto_foundation=True)
+                    moves, outcome = play_random(game, random.Random(seed), 300)
+                    handle.write(pack_trace(game.initial_deal, moves, auto_foundation=True, ranked=seed % 2))
+                    games.append(game)
+            with map_file(path) as buffer:
+                replayed = [trace.replay().snapshot() for trace in read_traces(buffer)]
+        self.assertEqual(replayed, [game.snapshot() for game in games])
+
+    def test_truncated_trace_is_rejected(self):
+        data = pack_trace(deal_for_seed(0), random_game(0, 30)[1])
+        with self.assertRaises(ValueError):
+            list(read_traces(data[:-1]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import random
+import unittest
+from card import Card
+from main import Game
+from compact import CompactGame, card_to_int, int_to_card, RANK, SUIT, COLOR
+from play import flatten_moves, apply_move
+
+def compact_moves(game):
+    """Game's legal moves with Card objects swapped for their int encoding."""
+    moves = game.get_all_legal_moves()
+    moves["waste_to_foundation"] = [card_to_int(c) for c in moves["waste_to_foundation"]]
+    moves["tableau_to_foundation"] = [(i, card_to_int(c)) for i, c in moves["tableau_to_foundation"]]
+    return moves
+
+class TestCompactGame(unittest.TestCase):
+
+    def test_card_encoding_round_trip(self):
+        for c in range(52):
+            card = int_to_card(c)
+            self.assertEqual(card_to_int(card), c)
+            self.assertEqual(RANK[c], card.rank)
+            self.assertEqual(COLOR[c] == 1, card.color == "red")
+        self.assertEqual(SUIT[card_to_int(Card(13, "♣"))], 3)
+
+    def test_seeded_deal_matches_game(self):
+        random.seed(7)
+        game = Game()
+        random.seed(7)
+        compact = CompactGame()
+        self.assertEqual(compact.snapshot(), game.snapshot())
+
+    def test_from_game_matches_snapshot(self):
+        random.seed(11)
+        game = Game()
+        self.assertEqual(CompactGame.from_game(game).snapshot(), game.snapshot())
+
+    def test_random_playouts_match_game(self):
+        """Differential test: both engines must agree move for move."""
+        for seed in range(25):
+            self.check_random_playout(seed)
+
+    def test_random_playouts_match_game_with_draw_three_and_recycle_limit(self):
+        for seed in range(10):
+            self.check_random_playout(seed, draw_count=3, max_recycles=2)
+
+    def check_random_playout(self, seed, **rules):
+        random.seed(seed)
+        game = Game(**rules)
+        compact = CompactGame.from_game(game)
+        rng = random.Random(seed)
+        for _ in range(300):
+            self.assertEqual(compact.get_all_legal_moves(), compact_moves(game))
+            flat_moves = flatten_moves(game.get_all_legal_moves())
+            if not flat_moves or game.is_won():
+                break
+            move = rng.choice(flat_moves)
+            apply_move(game, move)
+            apply_move(compact, move)
+            self.assertEqual(compact.snapshot(), game.snapshot())
+            self.assertEqual(compact.moves_since_progress, game.moves_since_progress)
+            self.assertEqual(compact.is_won(), game.is_won())
+
+    def test_illegal_moves_are_rejected(self):
+        random.seed(3)
+        game = Game()
+        compact = CompactGame.from_game(game)
+        for move in [("waste_to_foundation",), ("tableau_to_tableau", 0, 0, 0),
+                     ("tableau_to_tableau", 2, 5, 4), ("foundation_to_tableau", "♠", 1)]:
+            self.assertEqual(apply_move(compact, move), apply_move(game, move))
+        self.assertEqual(compact.snapshot(), game.snapshot())
+        self.assertEqual(compact.moves_since_progress, game.moves_since_progress)
+
+    def test_copy_is_independent(self):
+        random.seed(5)
+        compact = CompactGame()
+        clone = compact.copy()
+        clone.draw_from_stock()
+        self.assertNotEqual(clone.snapshot(), compact.snapshot())
+        self.assertEqual(clone.copy().key(), clone.key())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import random
+import unittest
+from card import Card
+from main import Game
+from compact import CompactGame
+from play import step, choose_bot_move, is_softlocked, DEAD_END, SOFTLOCK_VISITS
+from deadend import blocked_card, stock_is_dead, waste_tops, dead_end, DEAD_STOCK, BLOCKED
+from batch import play_deal
+from solver import solve, LOST
+
+def layout(columns, pile, cursor=0, max_recycles=None):
+    """A Game with the given columns of (face_down, face_up) cards and stock/waste pile."""
+    game = Game(max_recycles=max_recycles)
+    for pile_dict in game.tableaus:
+        pile_dict["face_down"] = []
+        pile_dict["face_up"] = []
+    for i, (face_down, face_up) in enumerate(columns):
+        game.tableaus[i]["face_down"] = list(face_down)
+        game.tableaus[i]["face_up"] = list(face_up)
+    game.waste = pile[:cursor]
+    game.stock = pile[cursor:]
+    game.rehash()
+    return game
+
+def stuck_stock_game(pile, cursor=0, max_recycles=None):
+    """Aces buried under cards that accept nothing from ``pile`` and can't move themselves."""
+    columns = [([Card(1, "♠")], [Card(3, "♠")]),
+               ([Card(1, "♥")], [Card(3, "♣")]),
+               ([Card(1, "♦")], [Card(5, "♠")]),
+               ([Card(1, "♣")], [Card(5, "♣")])]
+    return layout(columns, pile, cursor, max_recycles)
+
+class TestStockIsDead(unittest.TestCase):
+
+    def check(self, game, expected):
+        self.assertEqual(stock_is_dead(game, game.get_all_legal_moves()), expected)
+        compact = CompactGame.from_game(game)
+        self.assertEqual(stock_is_dead(compact, compact.get_all_legal_moves()), expected)
+
+    def test_stock_of_unplayable_cards_is_dead(self):
+        self.check(stuck_stock_game([Card(9, "♥"), Card(9, "♦"), Card(8, "♠")]), True)
+
+    def test_playable_card_deep_in_stock_keeps_game_alive(self):
+        self.check(stuck_stock_game([Card(9, "♥"), Card(9, "♦"), Card(4, "♥"), Card(8, "♠")]), False)
+
+    def test_playable_card_already_passed_counts_only_while_recycles_remain(self):
+        pile = [Card(4, "♥"), Card(9, "♦"), Card(9, "♥")]
+        self.check(stuck_stock_game(pile, cursor=2), False)
+        self.check(stuck_stock_game(pile, cursor=2, max_recycles=0), True)
+
+    def test_draw_three_only_reaches_every_third_card(self):
+        pile = [Card(4, "♥"), Card(9, "♦"), Card(9, "♥"), Card(8, "♠")]
+        game = stuck_stock_game(pile)
+        game.draw_count = 3
+        self.assertEqual(waste_tops(game), {Card(9, "♥").index, Card(8, "♠").index})
+        self.check(game, True)
+
+    def test_other_legal_moves_mean_not_dead(self):
+        game = stuck_stock_game([Card(9, "♥")])
+        game.tableaus[4]["face_up"] = [Card(4, "♥")]
+        game.rehash()
+        self.check(game, False)
+
+
+class TestBlockedCard(unittest.TestCase):
+
+    def test_card_over_both_parents_and_lower_suit_card(self):
+        # 7♠ sits on 8♦, 8♥ and 6♠, so 6♠ can never reach its foundation
+        game = layout([([Card(8, "♦"), Card(6, "♠"), Card(8, "♥"), Card(7, "♠")], [Card(2, "♥")])], [])
+        self.assertIs(blocked_card(game), Card(7, "♠").index)
+        self.assertIs(blocked_card(CompactGame.from_game(game)), Card(7, "♠").index)
+        self.assertEqual(dead_end(game, game.get_all_legal_moves()), BLOCKED)
+
+    def test_one_parent_free_is_not_blocked(self):
+        game = layout([([Card(8, "♦"), Card(6, "♠"), Card(7, "♠")], [Card(2, "♥")])], [])
+        self.assertIsNone(blocked_card(game))
+
+    def test_king_is_never_blocked(self):
+        game = layout([([Card(3, "♥"), Card(13, "♥")], [Card(2, "♣")])], [])
+        self.assertIsNone(blocked_card(game))
+
+    def test_face_up_card_can_leave_with_its_run(self):
+        # 9♠ is over both red 10s and 3♠, but the 10♥ under it can carry it away
+        game = layout([([Card(3, "♠"), Card(10, "♦")], [Card(10, "♥"), Card(9, "♠")])], [])
+        self.assertIsNone(blocked_card(game))
+
+    def test_blocked_deal(self):
+        for engine in (Game, CompactGame):
+            self.assertIs(blocked_card(engine(seed=62)), Card(7, "♠").index)
+        self.assertIsNone(blocked_card(CompactGame(seed=0)))
+
+    def test_solver_and_batch_give_up_on_blocked_deal(self):
+        result = solve(CompactGame(seed=62))
+        self.assertEqual((result.status, result.nodes), (LOST, 0))
+        row, outcome, moves = play_deal(62)
+        self.assertEqual((row[1], outcome, moves), (0, LOST, []))
+
+
+class TestSoftlock(unittest.TestCase):
+
+    def test_position_visited_softlock_visits_times(self):
+        game = Game(seed=3)
+        for _ in range(SOFTLOCK_VISITS - 1):
+            self.assertFalse(is_softlocked(game))
+        self.assertTrue(is_softlocked(game))
+
+    def test_visits_are_counted_across_the_whole_game(self):
+        game = Game(seed=3)
+        for _ in range(SOFTLOCK_VISITS - 1):
+            self.assertFalse(is_softlocked(game))
+            # A full pass through the stock comes back to the same position
+            while game.stock:
+                game.draw_from_stock()
+            game.recycle_stock()
+        self.assertTrue(is_softlocked(game))
+
+    def test_step_stops_dead_stock(self):
+        game = stuck_stock_game([Card(9, "♥"), Card(9, "♦")])
+        self.assertEqual(dead_end(game, game.get_all_legal_moves()), DEAD_STOCK)
+        self.assertEqual(step(game, lambda game, moves: choose_bot_move(moves, random.Random(0))), (DEAD_END, None))
+
+if __name__ == "__main__":
+    unittest.main()
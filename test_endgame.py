@@ -0,0 +1,154 @@
+import random
+import unittest
+from main import Game
+from compact import CompactGame, TABLEAU_CAPACITY
+from play import flatten_moves, apply_move, choose_bot_move
+from solver import Solver, WON, LOST, UNKNOWN
+from endgame import EndgameTable, is_endgame, greedy_line
+from batch import play_random
+
+def endgame_position(seed, stock=True):
+    """The first position of a random-bot game on ``seed`` with nothing face down, or None."""
+    game = CompactGame(seed=seed)
+    rng = random.Random(seed)
+    for _ in range(2000):
+        if is_endgame(game):
+            return game if bool(game.pile) == stock else None
+        flat_moves = flatten_moves(game.get_all_legal_moves())
+        if not flat_moves:
+            return None
+        apply_move(game, choose_bot_move(flat_moves, rng))
+    return None
+
+def endgame_positions(count, stock=True):
+    positions = []
+    seed = 0
+    while len(positions) < count:
+        game = endgame_position(seed, stock)
+        if game is not None:
+            positions.append(game)
+        seed += 1
+    return positions
+
+def spades_left(order, draw_count=3):
+    """Only spades left: A♠ 2♠ 3♠ in the stock in ``order``, the rest filling every column; no recycling."""
+    game = CompactGame(deal=False, draw_count=draw_count, max_recycles=0)
+    game.foundations[:] = bytes([0, 13, 13, 13])
+    game.cells[:4] = bytes([12, 11, 10, 9])  # K♠ Q♠ J♠ 10♠
+    game.heights[0] = 4
+    for i in range(1, 7):  # 4♠ to 9♠
+        game.cells[i * TABLEAU_CAPACITY] = i + 2
+        game.heights[i] = 1
+    game.pile = bytearray(order)
+    return game
+
+def reversed_columns(game):
+    twin = game.copy()
+    for i in range(7):
+        j = 6 - i
+        twin.cells[i * TABLEAU_CAPACITY:(i + 1) * TABLEAU_CAPACITY] = game.cells[j * TABLEAU_CAPACITY:(j + 1) * TABLEAU_CAPACITY]
+        twin.heights[i], twin.down[i] = game.heights[j], game.down[j]
+    return twin
+
+def wins(game, line):
+    game = game.copy()
+    for move in line:
+        apply_move(game, move)
+    return game.is_won()
+
+class TestEndgame(unittest.TestCase):
+
+    def test_is_endgame(self):
+        self.assertFalse(is_endgame(Game(seed=1)))
+        self.assertFalse(is_endgame(CompactGame(seed=1)))
+        game = endgame_positions(1)[0]
+        self.assertTrue(is_endgame(game))
+        self.assertTrue(is_endgame(Game.from_compact(game)))
+
+    def test_empty_stock_is_won_greedily(self):
+        game = endgame_positions(1, stock=False)[0]
+        self.assertTrue(wins(game, greedy_line(game.copy())))
+        table = EndgameTable()
+        status, line = table.solve(game)
+        self.assertEqual(status, WON)
+        self.assertTrue(wins(game, line))
+        self.assertEqual(len(table.entries), 0)
+
+    def test_search_lines_replay(self):
+        table = EndgameTable()
+        for game in endgame_positions(5):
+            snapshot = game.snapshot()
+            status, line = table.solve(game)
+            self.assertEqual(game.snapshot(), snapshot)
+            self.assertEqual(status, WON)
+            self.assertTrue(wins(game, line))
+
+    def test_lost_endgame(self):
+        game = spades_left([0, 1, 2])  # the draw leaves 3♠ on top of the waste
+        table = EndgameTable()
+        self.assertEqual(table.solve(game), (LOST, None))
+        self.assertEqual(table.solve(game), (LOST, None))
+        self.assertEqual((table.hits, table.misses), (1, 1))
+        status, line = table.solve(spades_left([2, 1, 0]))
+        self.assertEqual(status, WON)
+        self.assertTrue(wins(spades_left([2, 1, 0]), line))
+
+    def test_node_budget_gives_unknown(self):
+        game = endgame_positions(1)[0]
+        table = EndgameTable(max_nodes=0)
+        self.assertEqual(table.solve(game), (UNKNOWN, None))
+        self.assertEqual(len(table.entries), 0)
+
+    def test_column_permuted_twin_hits_table(self):
+        table = EndgameTable()
+        game = endgame_positions(1)[0]
+        self.assertEqual(table.solve(game)[0], WON)
+        twin = reversed_columns(game)
+        self.assertNotEqual(twin.snapshot(), game.snapshot())
+        status, line = table.solve(twin)
+        self.assertEqual((table.hits, table.misses), (1, 1))
+        self.assertEqual(status, WON)
+        self.assertTrue(wins(twin, line))
+
+    def test_table_stays_bounded(self):
+        table = EndgameTable(max_entries=3)
+        for game in endgame_positions(5):
+            status, line = table.solve(game)
+            self.assertLessEqual(len(table.entries), 3)
+            self.assertEqual(status, WON)
+            self.assertTrue(wins(game, line))
+        for game in endgame_positions(5):
+            self.assertTrue(wins(game, table.solve(game)[1]))
+
+    def test_rules_are_part_of_the_key(self):
+        table = EndgameTable()
+        self.assertEqual(table.solve(spades_left([0, 1, 2]))[0], LOST)
+        self.assertEqual(table.solve(spades_left([0, 1, 2], draw_count=1))[0], WON)
+
+
+class TestEndgameUse(unittest.TestCase):
+
+    def test_policy_finishes_with_table(self):
+        table = EndgameTable()
+        seed = next(seed for seed in range(100) if endgame_position(seed) is not None)
+        game = CompactGame(seed=seed)
+        moves, outcome = play_random(game, random.Random(seed), 2000, table)
+        self.assertEqual(outcome, WON)
+        self.assertTrue(game.is_won())
+        self.assertEqual(table.misses, 1)
+        # The same deal again is answered from the table
+        game = Game(seed=seed)
+        moves, outcome = play_random(game, random.Random(seed), 2000, table)
+        self.assertEqual(outcome, WON)
+        self.assertEqual((table.hits, table.misses), (1, 1))
+
+    def test_solver_uses_table(self):
+        table = EndgameTable()
+        for seed in range(3):
+            result = Solver(max_nodes=20000, endgame=table).solve(CompactGame(seed=seed))
+            if result.status == WON:
+                self.assertTrue(wins(CompactGame(seed=seed), result.moves))
+        self.assertGreater(table.hits + table.misses, 0)
+
+if __name__ == "__main__":
+    unittest.main()
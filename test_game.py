@@ -1,7 +1,45 @@
 import unittest
 from card import Card
 from deck import Deck
-from main import Game
+from main import Game, MOVE_TYPES, SUITS
+
+def reference_legal_moves(game):
+    """The original nested-loop get_all_legal_moves, kept as a differential oracle."""
+    moves = {
+        "draw": [],
+        "waste_to_tableau": [],
+        "waste_to_foundation": [],
+        "tableau_to_foundation": [],
+        "tableau_to_tableau": [],
+        "foundation_to_tableau": []
+    }
+    if game.stock or game.waste:
+        moves["draw"].append(None)
+    if game.waste:
+        top_waste = game.waste[-1]
+        for i in range(len(game.tableaus)):
+            if game.can_place_on_tableau(top_waste, i):
+                moves["waste_to_tableau"].append(i)
+        if game.can_move_to_foundation(top_waste):
+            moves["waste_to_foundation"].append(top_waste)
+    for i, tableau in enumerate(game.tableaus):
+        if tableau["face_up"]:
+            top_card = tableau["face_up"][-1]
+            if game.can_move_to_foundation(top_card):
+                moves["tableau_to_foundation"].append((i, top_card))
+    for from_idx, tableau in enumerate(game.tableaus):
+        for start in range(len(tableau["face_up"])):
+            moving_card = tableau["face_up"][start]
+            for to_idx in range(len(game.tableaus)):
+                if from_idx != to_idx and game.can_place_on_tableau(moving_card, to_idx):
+                    moves["tableau_to_tableau"].append((from_idx, to_idx, start))
+    for suit, foundation in game.foundations.items():
+        if foundation:
+            top_card = foundation[-1]
+            for idx in range(len(game.tableaus)):
+                if game.can_place_on_tableau(top_card, idx):
+                    moves["foundation_to_tableau"].append((suit, idx))
+    return moves
 
 class TestSolitaire(unittest.TestCase):
 
@@ -23,8 +61,8 @@ class TestSolitaire(unittest.TestCase):
     def test_draw_from_stock_adds_to_waste(self):
         card = Card(1, "♠")
         self.game.stock.append(card)
-        drawn = self.game.draw_from_stock()
-        self.assertEqual(drawn, card)
+        record = self.game.draw_from_stock()
+        self.assertTrue(record)
         self.assertEqual(self.game.waste[-1], card)
         self.assertEqual(len(self.game.stock), 0)
 
@@ -36,14 +74,48 @@ class TestSolitaire(unittest.TestCase):
         card1 = Card(1, "♠")
         card2 = Card(2, "♥")
         self.game.waste = [card1, card2]
-        drawn = self.game.draw_from_stock()
-        self.assertEqual(drawn, card1)
+        self.assertTrue(self.game.draw_from_stock())
         self.assertEqual(len(self.game.stock), 1)
         self.assertEqual(self.game.stock[0], card2)
         self.assertEqual(len(self.game.waste), 1)
         self.assertEqual(self.game.waste[-1], card1)
 
 
+    def test_draw_and_recycle_only_move_the_cursor(self):
+        cards = [Card(1, "♠"), Card(2, "♥"), Card(3, "♦")]
+        self.game.stock = cards
+        pile = self.game.pile
+        for _ in range(3):
+            self.game.draw_from_stock()
+        self.assertEqual(self.game.waste, cards)
+        self.game.draw_from_stock()  # recycles, then draws the Ace again
+        self.assertIs(self.game.pile, pile)
+        self.assertEqual(self.game.waste, [cards[0]])
+        self.assertEqual(self.game.stock, cards[1:])
+
+    def test_draw_three(self):
+        game = Game(draw_count=3)
+        cards = [Card(rank, "♣") for rank in range(1, 6)]
+        game.stock = cards
+        game.waste = []
+        game.draw_from_stock()
+        self.assertEqual(game.waste[-1], cards[2])
+        record = game.draw_from_stock()  # only two cards left
+        self.assertEqual(game.waste, cards)
+        game.undo(record)
+        self.assertEqual(game.waste, cards[:3])
+
+    def test_recycle_limit(self):
+        game = Game(max_recycles=1)
+        game.stock = [Card(1, "♠")]
+        game.waste = []
+        game.draw_from_stock()
+        self.assertEqual(game.get_all_legal_moves()["draw"], [None])
+        self.assertTrue(game.draw_from_stock())  # first recycle is allowed
+        self.assertEqual(game.get_all_legal_moves()["draw"], [])
+        self.assertIsNone(game.draw_from_stock())
+        self.assertFalse(game.recycle_stock())
+
     # ---------------------------------------------
     # Tableau placement tests
     # ---------------------------------------------
@@ -158,5 +230,215 @@ class TestSolitaire(unittest.TestCase):
         self.assertFalse(success)
         self.assertEqual(len(self.game.foundations["♠"]), 1)
 
+    # ---------------------------------------------
+    # Zobrist hashing
+    # ---------------------------------------------
+    def test_state_hash_tracks_moves_incrementally(self):
+        import copy
+        import random
+        from play import flatten_moves, apply_move
+        random.seed(4)
+        rng = random.Random(4)
+        for game in (Game(), Game(max_recycles=2)):
+            for step in range(300):
+                flat_moves = flatten_moves(game.get_all_legal_moves())
+                if not flat_moves:
+                    break
+                record = apply_move(game, rng.choice(flat_moves))
+                if step % 5 == 4 and record:
+                    game.undo(record)  # undo has to leave the column hashes right for later moves too
+                self.assertEqual(copy.deepcopy(game).rehash(), game.state_hash)
+
+    def test_state_hash_repeats_after_full_stock_cycle(self):
+        self.game.stock = [Card(1, "♠"), Card(2, "♥"), Card(3, "♦")]
+        self.game.rehash()
+        self.game.draw_from_stock()
+        after_first_draw = self.game.state_hash
+        for _ in range(3):
+            self.game.draw_from_stock()  # the third draw recycles and redraws the Ace
+        self.assertEqual(self.game.state_hash, after_first_draw)
+        self.assertEqual(self.game.rehash(), after_first_draw)
+
+    def test_state_hash_tells_columns_apart(self):
+        self.game.tableaus[1] = {"face_down": [], "face_up": [Card(9, "♠"), Card(8, "♥")]}
+        self.game.tableaus[2] = {"face_down": [], "face_up": [Card(9, "♣")]}
+        self.game.rehash()
+        start = self.game.state_hash
+        self.assertTrue(self.game.move_from_tableau_to_tableau(1, 2, 1))
+        self.assertNotEqual(self.game.state_hash, start)
+
+    def test_state_hash_ignores_column_order(self):
+        self.game.tableaus[0] = {"face_down": [Card(4, "♣")], "face_up": [Card(9, "♠"), Card(8, "♥")]}
+        self.game.tableaus[3] = {"face_down": [], "face_up": [Card(13, "♦")]}
+        start = self.game.rehash()
+        self.game.tableaus[0], self.game.tableaus[3] = self.game.tableaus[3], self.game.tableaus[0]
+        self.assertEqual(self.game.rehash(), start)
+        self.game.tableaus[3], self.game.tableaus[5] = self.game.tableaus[5], self.game.tableaus[3]
+        self.assertEqual(self.game.rehash(), start)
+
+    def test_state_hash_ignores_move_path(self):
+        self.game.tableaus[0]["face_up"] = [Card(9, "♠")]
+        self.game.tableaus[1]["face_up"] = [Card(8, "♥")]
+        self.game.rehash()
+        start = self.game.state_hash
+        self.assertTrue(self.game.move_from_tableau_to_tableau(1, 0, 0))
+        self.assertNotEqual(self.game.state_hash, start)
+        self.game.tableaus[0]["face_up"].pop()
+        self.game.tableaus[1]["face_up"].append(Card(8, "♥"))
+        self.assertEqual(self.game.rehash(), start)
+
+    # ---------------------------------------------
+    # Undo
+    # ---------------------------------------------
+    def test_undo_restores_every_move_of_a_random_game(self):
+        import random
+        from play import flatten_moves, apply_move
+        random.seed(8)
+        game = Game()
+        rng = random.Random(8)
+        states = []
+        records = []
+        for _ in range(300):
+            flat_moves = flatten_moves(game.get_all_legal_moves())
+            if not flat_moves:
+                break
+            states.append((game.snapshot(), game.moves_since_progress, game.state_hash))
+            records.append(apply_move(game, rng.choice(flat_moves)))
+        while records:
+            game.undo(records.pop())
+            self.assertEqual((game.snapshot(), game.moves_since_progress, game.state_hash), states.pop())
+
+    def test_undo_restores_face_down_flip(self):
+        self.game.tableaus[0]["face_down"].append(Card(5, "♦"))
+        self.game.tableaus[0]["face_up"].append(Card(1, "♠"))
+        self.game.moves_since_progress = 7
+        self.game.rehash()
+        record = self.game.move_from_tableau_to_foundation(0)
+        self.assertEqual(self.game.tableaus[0]["face_up"][0].rank, 5)
+        self.game.undo(record)
+        self.assertEqual(self.game.tableaus[0]["face_down"], [Card(5, "♦")])
+        self.assertEqual(self.game.tableaus[0]["face_up"], [Card(1, "♠")])
+        self.assertEqual(self.game.foundations["♠"], [])
+        self.assertEqual(self.game.moves_since_progress, 7)
+
+    def test_undo_recycle_and_recycling_draw(self):
+        card1 = Card(1, "♠")
+        card2 = Card(2, "♥")
+        self.game.waste = [card1, card2]
+        self.game.rehash()
+        before = self.game.snapshot()
+        self.game.undo(self.game.draw_from_stock())
+        self.assertEqual(self.game.snapshot(), before)
+        self.game.undo(self.game.recycle_stock())
+        self.assertEqual(self.game.waste, [card1, card2])
+        self.assertEqual(self.game.stock, [])
+
+    def test_illegal_move_returns_false(self):
+        self.assertFalse(self.game.move_from_waste_to_foundation())
+        self.assertFalse(self.game.recycle_stock())
+
+    # ---------------------------------------------
+    # Move generation
+    # ---------------------------------------------
+    def test_move_generator_matches_reference_during_random_games(self):
+        import random
+        from play import flatten_moves, apply_move
+        for seed in range(20):
+            game = Game(seed=seed)
+            rng = random.Random(seed)
+            for _ in range(200):
+                moves = game.get_all_legal_moves()
+                self.assertEqual(moves, reference_legal_moves(game))
+                flat_moves = flatten_moves(moves)
+                if not flat_moves:
+                    break
+                apply_move(game, rng.choice(flat_moves))
+
+    def test_move_generator_with_empty_piles_and_foundation_cards(self):
+        self.game.tableaus[0]["face_up"] = [Card(13, "♠"), Card(12, "♥")]
+        self.game.tableaus[2]["face_down"] = [Card(3, "♣")]
+        self.game.tableaus[3]["face_up"] = [Card(12, "♦")]
+        self.game.foundations["♣"] = [Card(1, "♣"), Card(2, "♣"), Card(3, "♣"), Card(4, "♣"), Card(5, "♣"), Card(6, "♣"),
+                                      Card(7, "♣"), Card(8, "♣"), Card(9, "♣"), Card(10, "♣"), Card(11, "♣")]
+        self.game.waste = [Card(13, "♥")]
+        self.assertEqual(self.game.get_all_legal_moves(), reference_legal_moves(self.game))
+        encoded = list(self.game.generate_moves())
+        self.assertIn((MOVE_TYPES.index("tableau_to_tableau"), 0, 1, 0), encoded)
+        self.assertIn((MOVE_TYPES.index("foundation_to_tableau"), SUITS.index("♣"), 0, 0), encoded)
+
+    def test_make_move_plays_encoded_moves(self):
+        self.game.tableaus[0]["face_up"] = [Card(9, "♠")]
+        self.game.tableaus[1]["face_up"] = [Card(8, "♥")]
+        move = next(m for m in self.game.generate_moves() if MOVE_TYPES[m[0]] == "tableau_to_tableau")
+        record = self.game.make_move(move)
+        self.assertEqual(len(self.game.tableaus[0]["face_up"]), 2)
+        self.game.undo(record)
+        self.assertEqual(self.game.tableaus[1]["face_up"], [Card(8, "♥")])
+
+    # ---------------------------------------------
+    # Auto-foundation macro moves
+    # ---------------------------------------------
+    def test_safe_foundation_move(self):
+        self.game.tableaus[0]["face_up"] = [Card(3, "♥")]
+        self.game.foundations["♥"] = [Card(1, "♥"), Card(2, "♥")]
+        self.game.foundations["♠"] = [Card(1, "♠")]
+        self.assertIsNone(self.game.safe_foundation_move())  # 2♠ and 2♣ may still want the 3♥
+        self.game.foundations["♠"].append(Card(2, "♠"))
+        self.game.foundations["♣"] = [Card(1, "♣"), Card(2, "♣")]
+        self.assertIsNone(self.game.safe_foundation_move())  # the 2♦ may still need a 3♠ put back on the 3♥
+        self.game.waste = [Card(1, "♦")]
+        self.assertEqual(self.game.safe_foundation_move(), (MOVE_TYPES.index("waste_to_foundation"), 0, 0, 0))
+        self.game.waste, self.game.foundations["♦"] = [], [Card(1, "♦")]
+        self.assertEqual(self.game.safe_foundation_move(), (MOVE_TYPES.index("tableau_to_foundation"), 0, 0, 0))
+
+    def test_auto_foundation_collapses_safe_moves_into_one_undo(self):
+        from play import apply_move
+        game = Game(auto_foundation=True)
+        for pile in game.tableaus:
+            pile["face_down"], pile["face_up"] = [], []
+        game.tableaus[0]["face_up"] = [Card(1, "♣")]
+        game.tableaus[1]["face_up"] = [Card(3, "♠"), Card(2, "♦")]
+        game.tableaus[2]["face_up"] = [Card(2, "♣"), Card(1, "♦")]
+        game.waste, game.stock = [Card(1, "♠")], [Card(13, "♥")]
+        game.rehash()
+        before = (game.snapshot(), game.state_hash, game.moves_since_progress)
+        record = apply_move(game, ("tableau_to_foundation", 0, Card(1, "♣")))
+        self.assertEqual(record[0], "auto")
+        self.assertEqual(game.foundation_count(), 5)  # A♣, then A♠ A♦ 2♦ 2♣, but not 3♠ while 2♥ is out
+        self.assertEqual(game.tableaus[1]["face_up"], [Card(3, "♠")])
+        game.undo(record)
+        self.assertEqual((game.snapshot(), game.state_hash, game.moves_since_progress), before)
+
+    def test_auto_foundation_keeps_plain_records_when_nothing_is_safe(self):
+        game = Game(auto_foundation=True)
+        for pile in game.tableaus:
+            pile["face_down"], pile["face_up"] = [], []
+        game.waste, game.stock = [], [Card(13, "♥"), Card(5, "♣")]
+        game.rehash()
+        record = game.make_move((MOVE_TYPES.index("draw"), 0, 0, 0))
+        self.assertEqual(record[0], "draw")
+        self.assertEqual(game.waste, [Card(13, "♥")])
+
+    def test_auto_foundation_never_changes_a_solvable_outcome(self):
+        from play import apply_move, encode_move
+        from solver import solve, WON
+        from test_solver import diamond_trap_game
+        # A random deal, and one that is lost if the 3♥ and 4♠ go up too early
+        for deal in (lambda **options: Game(seed=0, **options), diamond_trap_game):
+            result = solve(deal(), max_nodes=20000)
+            self.assertEqual(result.status, WON)
+            # Replaying the line skips the foundation moves auto_foundation already played
+            auto = deal(auto_foundation=True)
+            move = auto.safe_foundation_move()  # as if the deal had been auto-played from the start
+            if move is not None:
+                auto.make_move(move)
+            steps = 0
+            for move in result.moves:
+                if encode_move(move) in auto.generate_moves():
+                    apply_move(auto, move)
+                    steps += 1
+            self.assertTrue(auto.is_won())
+            self.assertLess(steps, len(result.moves))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,106 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from main import Game
+from compact import deal_for_seed
+from play import step, choose_bot_move, apply_move
+from solver import Solver, WON
+from cache import ResultCache, variant_name, unpack_moves
+from batch import cached_policy
+from instrument import Profiler, profile_deals, METHODS
+
+class TestProfiler(unittest.TestCase):
+
+    def test_unattached_games_use_class_methods(self):
+        game = Game(seed=1)
+        self.assertFalse(set(METHODS) & set(vars(game)))
+        profiler = Profiler()
+        profiler.attach(game)
+        self.assertTrue(set(METHODS) <= set(vars(game)))
+        profiler.detach(game)
+        self.assertFalse(set(METHODS) & set(vars(game)))
+
+    def test_counts_moves_and_legal_moves_per_step(self):
+        plain, game = Game(seed=4), Game(seed=4)
+        profiler = Profiler()
+        profiler.attach(game)
+        rng, plain_rng = random.Random(0), random.Random(0)
+        for _ in range(100):
+            step(plain, lambda g, moves: choose_bot_move(moves, plain_rng))
+            step(game, lambda g, moves: choose_bot_move(moves, rng))
+        self.assertEqual(game.snapshot(), plain.snapshot())
+        summary = profiler.summary()
+        self.assertEqual(summary["steps"], summary["methods"]["get_all_legal_moves"]["calls"])
+        self.assertGreater(summary["methods"]["draw_from_stock"]["calls"], 0)
+        self.assertEqual(sum(int(moves) * count for moves, count in summary["legal_moves"]["histogram"].items()),
+                         round(summary["legal_moves"]["mean"] * summary["steps"]))
+
+    def test_undo_is_timed(self):
+        game = Game(seed=2)
+        profiler = Profiler()
+        profiler.attach(game)
+        game.undo(game.draw_from_stock())
+        self.assertEqual(profiler.calls["draw_from_stock"], 1)
+        self.assertEqual(profiler.calls["undo"], 1)
+        self.assertEqual(game.state_hash, Game(seed=2).state_hash)
+
+    def test_sampled_trace(self):
+        game = Game(seed=3)
+        profiler = Profiler(sample_every=2, max_trace=3)
+        profiler.attach(game)
+        for _ in range(10):
+            game.draw_from_stock()
+        self.assertEqual([event["call"] for event in profiler.trace], [2, 4, 6])
+        self.assertEqual(profiler.trace[-1]["method"], "draw_from_stock")
+        self.assertTrue(all(event["ok"] for event in profiler.trace))
+
+    def test_solver_reports_search(self):
+        profiler = Profiler()
+        result = Solver(max_nodes=500, profiler=profiler).solve(Game(seed=0))
+        search = profiler.summary()["search"]
+        self.assertEqual(search["nodes"], result.nodes)
+        self.assertGreater(search["nodes_per_second"], 0)
+        self.assertTrue(0 <= search["transposition_hit_rate"] < 1)
+
+    def test_profile_deals_with_cache_and_dump(self):
+        cache = ResultCache()
+        profile_deals(range(3), max_moves=100, cache=cache)
+        profiler = profile_deals(range(4), max_moves=100, cache=cache)
+        summary = profiler.summary()
+        self.assertEqual(summary["caches"]["results"], {"hits": 3, "misses": 1, "hit_rate": 0.75})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.json")
+            profiler.dump(path)
+            with open(path) as handle:
+                self.assertEqual(json.load(handle)["steps"], summary["steps"])
+
+    def test_cache_keys_carry_the_budgets(self):
+        cache = ResultCache()
+        profile_deals(range(2), max_moves=100, cache=cache)
+        profile_deals(range(2), max_moves=50, cache=cache)
+        profile_deals(range(1), policy="solver", max_nodes=200, cache=cache)
+        profile_deals(range(1), policy="solver", max_nodes=300, cache=cache)
+        self.assertEqual(cache.hits, 0)
+        for seed in range(2):
+            result = cache.get(deal_for_seed(seed), variant_name(), cached_policy("random", 50))
+            self.assertIsNotNone(result.length)
+            self.assertLessEqual(result.length, 50)
+        self.assertIsNotNone(cache.get(deal_for_seed(0), variant_name(), cached_policy("solver", 2000, max_nodes=300)))
+
+    def test_auto_foundation_results_are_cached_apart(self):
+        cache = ResultCache()
+        profile_deals(range(2), policy="solver", cache=cache)
+        profile_deals(range(2), policy="solver", cache=cache, auto_foundation=True)
+        self.assertEqual(cache.hits, 0)
+        for seed in range(2):
+            result = cache.get(deal_for_seed(seed), variant_name(auto_foundation=True), cached_policy("solver", 2000))
+            if result.status == WON:
+                game = Game(seed=seed, auto_foundation=True)
+                for move in unpack_moves(result.moves):
+                    apply_move(game, move)
+                self.assertTrue(game.is_won())
+
+if __name__ == "__main__":
+    unittest.main()
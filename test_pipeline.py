@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from pipeline import run, read_results, read_blocks, encode_block, summarize, analyse_deal, checkpoint_path, MAGIC, OUTCOMES
+from solver import WON, LOST, UNKNOWN
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, "deals.kres")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_blocks_round_trip(self):
+        rows = [(7, 0, 120, 3000, 0.5), (8, 2, 0, 20000, 1.25)]
+        with open(self.out, "wb") as handle:
+            handle.write(MAGIC + encode_block(rows) + encode_block(rows[:1]))
+        self.assertEqual([len(block["seed"]) for block in read_blocks(self.out)], [2, 1])
+        self.assertEqual(list(read_results(self.out))[1], (8, UNKNOWN, 0, 20000, 1.25))
+
+    def test_torn_block_is_ignored(self):
+        with open(self.out, "wb") as handle:
+            handle.write(MAGIC + encode_block([(1, 0, 1, 1, 1.0)]) + encode_block([(2, 0, 1, 1, 1.0)])[:-3])
+        self.assertEqual([row[0] for row in read_results(self.out)], [1])
+
+    def test_run_writes_rows_in_seed_order(self):
+        self.assertEqual(run(self.out, start=60, count=5, workers=1, block_size=2, max_nodes=300), 5)
+        rows = list(read_results(self.out))
+        self.assertEqual([row[0] for row in rows], list(range(60, 65)))
+        self.assertTrue(all(row[1] in (WON, LOST, UNKNOWN) for row in rows))
+        self.assertEqual(rows[2][1:4], (LOST, 0, 0))  # seed 62 is blocked from the start
+        summary = summarize(self.out)
+        self.assertEqual(summary["deals"], 5)
+        self.assertEqual(summary[WON] + summary[LOST] + summary[UNKNOWN], 5)
+        self.assertEqual(summary["nodes"], sum(row[3] for row in rows))
+
+    def test_resume_continues_from_checkpoint(self):
+        options = {"method": "random", "workers": 1, "block_size": 4, "max_moves": 50}
+        self.assertEqual(run(self.out, count=8, **options), 8)
+        with open(self.out, "ab") as handle:
+            handle.write(b"half a block from a killed run")
+        self.assertEqual(run(self.out, count=12, **options), 4)
+        self.assertEqual([row[0] for row in read_results(self.out)], list(range(12)))
+        self.assertEqual(run(self.out, count=12, **options), 0)
+        self.assertTrue(os.path.exists(checkpoint_path(self.out)))
+
+    def test_resume_refuses_different_settings(self):
+        run(self.out, count=2, method="random", workers=1, max_moves=50)
+        with self.assertRaises(ValueError):
+            run(self.out, count=4, method="random", workers=1, max_moves=60)
+        self.assertEqual(run(self.out, count=2, method="random", workers=1, max_moves=60, resume=False), 2)
+
+    def test_policy_reports_lost_only_for_dead_ends(self):
+        seed, outcome, moves, nodes, seconds = analyse_deal(62, method="random", max_moves=50)
+        self.assertEqual((seed, outcome, nodes), (62, OUTCOMES.index(LOST), 0))  # blocked from the start
+        seed, outcome, moves, nodes, seconds = analyse_deal(0, method="random", max_moves=5)
+        self.assertEqual((outcome, moves), (OUTCOMES.index(UNKNOWN), 5))
+
+    def test_moves_column_holds_long_lines(self):
+        with open(self.out, "wb") as handle:
+            handle.write(MAGIC + encode_block([(1, 0, 70000, 1, 1.0)]))
+        self.assertEqual(list(read_results(self.out))[0][2], 70000)
+
+if __name__ == "__main__":
+    unittest.main()
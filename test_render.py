@@ -0,0 +1,103 @@
+import io
+import random
+import unittest
+from unittest import mock
+from main import Game
+from card import Card
+from play import play, step, create_test_game, choose_bot_move, WON, QUIT
+from render import NullRenderer, TextRenderer, AnsiRenderer
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHeadlessPlay(unittest.TestCase):
+
+    def test_headless_steps(self):
+        rng = random.Random(0)
+        game = Game(seed=5)
+        for _ in range(500):
+            outcome, move = step(game, lambda game, moves: choose_bot_move(moves, rng))
+            if outcome is not None:
+                break
+            self.assertIsNotNone(move)
+        self.assertIn(outcome, (None, "won", "no_moves", "dead_end", "softlock"))
+        self.assertEqual(outcome == WON, game.is_won())
+
+    def test_play_reports_outcome_through_renderer(self):
+        game = create_test_game()
+        game.stock, game.waste = [], []
+        for pile in game.tableaus:
+            pile["face_up"] = []
+        for suit in game.foundations:
+            game.foundations[suit] = [Card(rank, suit) for rank in range(1, 14)]
+        game.rehash()
+        stream = CountingStream()
+        self.assertEqual(play(game=game, delay=0, renderer=TextRenderer(stream)), WON)
+        self.assertIn("You won!", stream.getvalue())
+
+    def test_headless_play_never_sleeps(self):
+        random.seed(3)
+        with mock.patch("play.time.sleep") as sleep:
+            play(game=Game(seed=3), renderer=NullRenderer())
+        sleep.assert_not_called()
+
+    def test_step_quits_when_chooser_returns_none(self):
+        game = Game(seed=1)
+        before = game.snapshot()
+        self.assertEqual(step(game, lambda game, moves: None), (QUIT, None))
+        self.assertEqual(game.snapshot(), before)
+
+    def test_step_applies_chosen_move(self):
+        game = Game(seed=1)
+        offered = []
+        def choose(game, moves):
+            offered.extend(moves)
+            return choose_bot_move(moves)
+        outcome, move = step(game, choose)
+        self.assertIsNone(outcome)
+        self.assertIn(move, offered)
+
+
+class TestRenderers(unittest.TestCase):
+
+    def test_text_renderer_writes_each_frame_once(self):
+        stream = CountingStream()
+        renderer = TextRenderer(stream)
+        game = Game(seed=2)
+        renderer.render(game, "hello")
+        self.assertEqual(stream.writes, 1)
+        self.assertIn(game.format_state(), stream.getvalue())
+        self.assertIn("hello", stream.getvalue())
+
+    def test_ansi_renderer_throttles_frames(self):
+        stream = CountingStream()
+        clock = FakeClock()
+        renderer = AnsiRenderer(fps=10, stream=stream, clock=clock)
+        game = Game(seed=2)
+        for _ in range(5):
+            renderer.render(game)
+        self.assertEqual(renderer.frames, 1)
+        clock.now = 0.1
+        renderer.render(game)
+        self.assertEqual(renderer.frames, 2)
+        renderer.finish(game, "done")
+        self.assertEqual(renderer.frames, 3)
+        self.assertTrue(stream.getvalue().startswith(AnsiRenderer.CLEAR))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import random
+import unittest
+from main import Game
+from compact import CompactGame
+from play import create_test_game, flatten_moves, apply_move
+from rollout import RolloutPolicy, playout
+
+class TestRolloutPolicy(unittest.TestCase):
+
+    def test_wins_test_game(self):
+        game = create_test_game()
+        policy = RolloutPolicy(playouts=2, depth=30, rng=random.Random(0))
+        for _ in range(150):
+            if game.is_won():
+                break
+            apply_move(game, policy.choose(game))
+        self.assertTrue(game.is_won())
+
+    def test_choice_is_legal_and_reproducible(self):
+        game = Game(seed=3)
+        legal = flatten_moves(game.get_all_legal_moves())
+        first = RolloutPolicy(playouts=3, depth=40, rng=random.Random(1)).choose(game)
+        second = RolloutPolicy(playouts=3, depth=40, rng=random.Random(1)).choose(game)
+        self.assertIn(first, legal)
+        self.assertEqual(first, second)
+
+    def test_does_not_touch_the_game(self):
+        game = Game(seed=4)
+        before = game.snapshot()
+        RolloutPolicy(playouts=2, depth=40, rng=random.Random(2)).choose(game)
+        self.assertEqual(game.snapshot(), before)
+
+    def test_thread_pool_matches_inline(self):
+        game = Game(seed=5)
+        inline = RolloutPolicy(playouts=4, depth=30, rng=random.Random(3)).choose(game)
+        with RolloutPolicy(playouts=4, depth=30, rng=random.Random(3), executor="thread", workers=2, chunk=1) as policy:
+            self.assertEqual(policy.choose(game), inline)
+
+    def test_time_budget_stops_after_first_round(self):
+        game = Game(seed=6)
+        policy = RolloutPolicy(playouts=1000, depth=50, time_budget=0.0, rng=random.Random(4))
+        self.assertIsNotNone(policy.choose(game))
+
+    def test_playout_is_bounded_by_depth(self):
+        game = CompactGame(seed=7)
+        playout(game, random.Random(0), 5)
+        self.assertLessEqual(game.moves_since_progress, 5)
+
+if __name__ == "__main__":
+    unittest.main()
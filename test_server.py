@@ -0,0 +1,154 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from main import Game, DRAW
+from play import decode_move, apply_move
+from compact import CompactGame
+from solver import WON
+from server import SessionManager, start_server
+from loadtest import Client, load_test
+
+class TestSessionManager(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(1)
+        self.manager = SessionManager(executor=self.executor, max_nodes=20000)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    async def request(self, op, **fields):
+        return await self.manager.handle({"op": op, **fields})
+
+    async def test_new_apply_undo(self):
+        reply = await self.request("new", seed=3, id="a")
+        self.assertTrue(reply["ok"])
+        self.assertEqual(reply["id"], "a")
+        session = reply["session"]
+        game = Game(seed=3)
+        self.assertEqual(reply["moves"], [list(move) for move in game.generate_moves()])
+        move = reply["moves"][-1]
+        reply = await self.request("apply", session=session, move=move)
+        game.make_move(tuple(move))
+        self.assertEqual(reply["moves"], [list(move) for move in game.generate_moves()])
+        state = await self.request("state", session=session)
+        self.assertEqual(state["hash"], game.state_hash)
+        self.assertEqual(state["text"], game.format_state())
+        await self.request("undo", session=session)
+        state = await self.request("state", session=session)
+        self.assertEqual(state["hash"], Game(seed=3).state_hash)
+
+    async def test_errors(self):
+        self.assertFalse((await self.request("nonsense"))["ok"])
+        self.assertIn("no session", (await self.request("moves", session=99))["error"])
+        session = (await self.request("new", seed=1))["session"]
+        self.assertIn("nothing to undo", (await self.request("undo", session=session))["error"])
+        self.assertIn("illegal", (await self.request("apply", session=session, move=[5, 0, 6, 0]))["error"])
+        self.assertFalse((await self.request("apply", session=session))["ok"])
+        self.assertTrue((await self.request("close", session=session))["ok"])
+        self.assertFalse((await self.request("moves", session=session))["ok"])
+
+    async def test_bad_field_types(self):
+        bad = [{"op": "moves", "session": [1]}, {"op": "moves", "session": True}, {"op": ["new"]},
+               {"op": "new", "seed": [1]}, {"op": "new", "max_recycles": "x"}, {"op": "new", "max_recycles": -1},
+               {"op": "new", "max_recycles": 255},
+               {"op": "new", "draw": True}]
+        for request in bad:
+            reply = await self.manager.handle(request)
+            self.assertFalse(reply["ok"], request)
+            self.assertNotIn("internal error", reply["error"])
+        session = (await self.request("new", seed=1))["session"]
+        for move in ["draw", [0, 0, 0], [0, 0, 0, "0"], {"kind": 0}]:
+            self.assertIn("needs a move", (await self.request("apply", session=session, move=move))["error"])
+
+    async def test_unexpected_failure_still_gets_a_reply(self):
+        async def broken(request):
+            raise RuntimeError("boom")
+        self.manager.handlers["moves"] = broken
+        reply = await self.request("moves", id=4)
+        self.assertEqual((reply["id"], reply["ok"]), (4, False))
+        self.assertIn("boom", reply["error"])
+
+    async def test_hint_and_solve(self):
+        session = (await self.request("new", seed=0))["session"]
+        reply = await self.request("solve", session=session)
+        self.assertEqual(reply["status"], WON)
+        game = CompactGame(seed=0)
+        for move in reply["line"]:
+            apply_move(game, decode_move(move))
+        self.assertTrue(game.is_won())
+        hint = await self.request("hint", session=session)
+        self.assertEqual(hint["move"], reply["line"][0])
+        self.assertEqual(hint["nodes"], 0)  # the line of the solve is reused
+        await self.request("apply", session=session, move=hint["move"])
+        hint = await self.request("hint", session=session)
+        self.assertEqual((hint["move"], hint["nodes"]), (reply["line"][1], 0))
+        await self.request("undo", session=session)
+        hint = await self.request("hint", session=session)
+        self.assertEqual(hint["status"], WON)
+        self.assertGreater(hint["nodes"], 0)
+
+    async def test_auto_foundation_lines_replay_through_apply(self):
+        session = (await self.request("new", seed=6, auto_foundation=True))["session"]
+        reply = await self.request("solve", session=session)
+        self.assertEqual(reply["status"], WON)
+        for move in reply["line"][:2]:
+            hint = await self.request("hint", session=session)
+            self.assertEqual((hint["move"], hint["nodes"]), (move, 0))  # the line survives auto-played moves
+            self.assertTrue((await self.request("apply", session=session, move=move))["ok"])
+        for move in reply["line"][2:]:
+            position = await self.request("apply", session=session, move=move)
+            self.assertTrue(position["ok"], position.get("error"))
+        self.assertTrue(position["won"])
+
+    async def test_sessions_are_independent(self):
+        first = (await self.request("new", seed=5))["session"]
+        second = (await self.request("new", seed=5))["session"]
+        await self.request("apply", session=first, move=[DRAW, 0, 0, 0])
+        self.assertNotEqual((await self.request("state", session=first))["hash"],
+                            (await self.request("state", session=second))["hash"])
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "server.sock")
+        self.manager = SessionManager(workers=1, max_nodes=2000)
+        self.server = await start_server(self.manager, self.path)
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.manager.shutdown()
+        self.tmp.cleanup()
+
+    async def test_pipelined_requests_over_socket(self):
+        client = await Client.connect(self.path)
+        try:
+            replies = await asyncio.gather(*(client.request("new", seed=seed) for seed in range(20)))
+            self.assertEqual(len({reply["session"] for reply in replies}), 20)
+            session = replies[0]["session"]
+            hint, moves = await asyncio.gather(client.request("hint", session=session),
+                                               client.request("moves", session=session))
+            self.assertTrue(hint["ok"])
+            self.assertEqual(moves["moves"], replies[0]["moves"])
+            client.writer.write(b"not json\n")
+            self.assertFalse((await client.request("new", draw=2))["ok"])
+            self.assertFalse((await client.request("moves", session=[1]))["ok"])
+            self.assertFalse((await client.request("new", seed=[1]))["ok"])
+        finally:
+            await client.close()
+
+    async def test_load_test_reports_percentiles(self):
+        report = await load_test(sessions=20, steps=15, hint_every=10, connections=3, path=self.path)
+        self.assertEqual(report["sessions"], 20)
+        self.assertEqual(report["ops"]["new"]["count"], 20)
+        self.assertEqual(report["ops"]["close"]["count"], 20)
+        self.assertLessEqual(report["p50_ms"], report["p99_ms"])
+        self.assertEqual(self.manager.sessions, {})
+
+if __name__ == "__main__":
+    unittest.main()
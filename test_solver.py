@@ -0,0 +1,102 @@
+import random
+import unittest
+from card import Card, SUITS
+from main import Game
+from compact import CompactGame
+from play import create_test_game, apply_move
+from solver import Solver, solve, safe_foundation_move, WON, LOST, UNKNOWN
+
+def blocked_game():
+    """Red suits and clubs finished, A♠ buried under 2♠, every column occupied."""
+    game = Game()
+    for pile in game.tableaus:
+        pile["face_down"] = []
+        pile["face_up"] = []
+    for suit in ["♥", "♦", "♣"]:
+        game.foundations[suit] = [Card(rank, suit) for rank in range(1, 14)]
+    game.foundations["♠"] = []
+    game.tableaus[0]["face_down"] = [Card(1, "♠")]
+    game.tableaus[0]["face_up"] = [Card(2, "♠")]
+    for i in range(1, 7):
+        game.tableaus[i]["face_up"] = [Card(i + 2, "♠")]
+    game.stock = [Card(rank, "♠") for rank in range(9, 14)]
+    game.waste = []
+    game.rehash()
+    return game
+
+def diamond_trap_game(**options):
+    """Won only by taking 4♠ back down onto 5♥ to hold the 3♦ over the buried 2♦."""
+    game = Game(**options)
+    for suit in ["♠", "♥", "♣"]:
+        game.foundations[suit] = [Card(rank, suit) for rank in range(1, 5)]
+    game.foundations["♦"] = [Card(1, "♦")]
+    game.tableaus[0] = {"face_down": [Card(5, "♦"), Card(2, "♦")], "face_up": [Card(3, "♦")]}
+    game.tableaus[1] = {"face_down": [], "face_up": [Card(5, "♥")]}
+    tops = [Card(rank, "♦") for rank in (4, 6, 7, 8)]
+    used = set(tops) | {Card(5, "♦"), Card(2, "♦"), Card(3, "♦"), Card(5, "♥")}
+    used |= {card for foundation in game.foundations.values() for card in foundation}
+    rest = [Card(rank, suit) for rank in range(13, 0, -1) for suit in SUITS if Card(rank, suit) not in used]
+    for i, top in enumerate(tops):
+        game.tableaus[2 + i] = {"face_down": rest[i::4], "face_up": [top]}
+    game.tableaus[6] = {"face_down": [], "face_up": []}
+    game.pile, game.cursor = [], 0
+    game.rehash()
+    return game
+
+class TestSolver(unittest.TestCase):
+
+    def test_solves_test_game_and_line_replays(self):
+        game = create_test_game()
+        result = solve(game)
+        self.assertEqual(result.status, WON)
+        for move in result.moves:
+            self.assertIsNot(apply_move(game, move), False)
+        self.assertTrue(game.is_won())
+
+    def test_solution_replays_on_random_deal(self):
+        random.seed(0)
+        game = Game()
+        result = solve(game, max_nodes=20000)
+        self.assertEqual(result.status, WON)
+        for move in result.moves:
+            apply_move(game, move)
+        self.assertTrue(game.is_won())
+
+    def test_proves_blocked_deal_lost(self):
+        result = solve(blocked_game())
+        self.assertEqual(result.status, LOST)
+        self.assertIsNone(result.moves)
+
+    def test_node_budget_gives_unknown(self):
+        random.seed(1)
+        result = Solver(max_nodes=10).solve(Game())
+        self.assertEqual(result.status, UNKNOWN)
+        self.assertLessEqual(result.nodes, 10)
+
+    def test_safe_moves_keep_cards_that_may_come_back_down(self):
+        game = diamond_trap_game()
+        self.assertIsNone(safe_foundation_move(CompactGame.from_game(game)))  # 5♥ may have to hold 4♠
+        result = solve(game)
+        self.assertEqual(result.status, WON)
+        for move in result.moves:
+            apply_move(game, move)
+        self.assertTrue(game.is_won())
+
+    def test_full_table_cannot_prove_lost(self):
+        result = Solver(max_nodes=2000, table_size=1).solve(blocked_game())
+        self.assertNotEqual(result.status, LOST)
+
+    def test_safe_foundation_move(self):
+        game = blocked_game()
+        game.foundations["♠"] = [Card(1, "♠"), Card(2, "♠")]
+        game.tableaus[0]["face_down"] = []
+        game.tableaus[0]["face_up"] = [Card(13, "♥")]
+        game.foundations["♥"] = [Card(1, "♥")]
+        game.foundations["♦"] = [Card(1, "♦"), Card(2, "♦")]
+        # 3♠ on column 1 could still be needed to hold the 2♥
+        self.assertIsNone(safe_foundation_move(CompactGame.from_game(game)))
+        game.foundations["♥"].append(Card(2, "♥"))
+        self.assertEqual(safe_foundation_move(CompactGame.from_game(game)), ("tableau_to_foundation", 1, 2))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from compact import CompactGame
+from play import MOVE_WEIGHTS, flatten_moves
+from tune import (FEATURES, WeightedPolicy, Tuner, default_weights, features, load_policy, play_deal, compare,
+                  main)
+
+class TestWeightedPolicy(unittest.TestCase):
+
+    def test_default_weights_match_bot(self):
+        policy = WeightedPolicy()
+        game = CompactGame(seed=2)
+        for move in flatten_moves(game.get_all_legal_moves()):
+            if not features(game, move):
+                self.assertAlmostEqual(policy.move_weight(game, move), MOVE_WEIGHTS[move[0]])
+
+    def test_features(self):
+        game = CompactGame(deal=False)
+        game.cells[0:2] = bytes([12, 24])             # K♠, Q♥ face up
+        game.heights[0], game.down[0] = 2, 0
+        game.cells[19:21] = bytes([30, 11])           # 5♦ face down, Q♠ face up
+        game.heights[1], game.down[1] = 2, 1
+        game.cells[38] = 25                           # K♥
+        game.heights[2] = 1
+        game.cells[57] = 51                           # K♣
+        game.heights[3] = 1
+        moves = flatten_moves(game.get_all_legal_moves())
+        for move in [("tableau_to_tableau", 0, 3, 1), ("tableau_to_tableau", 1, 2, 0), ("tableau_to_tableau", 0, 4, 0)]:
+            self.assertIn(move, moves)
+        self.assertEqual(features(game, ("tableau_to_tableau", 0, 3, 1)), ("splits",))
+        self.assertEqual(features(game, ("tableau_to_tableau", 1, 2, 0)), ("reveals",))
+        self.assertEqual(features(game, ("tableau_to_tableau", 0, 4, 0)), ("empties",))
+        self.assertEqual(features(game, ("tableau_to_foundation", 0, None)), ("splits",))
+        self.assertEqual(features(game, ("tableau_to_foundation", 1, None)), ("reveals",))
+        self.assertEqual(features(game, ("tableau_to_foundation", 2, None)), ("empties",))
+        self.assertEqual(features(game, ("draw", None)), ())
+
+    def test_choices_are_legal_and_follow_weights(self):
+        game = CompactGame(seed=3)
+        moves = flatten_moves(game.get_all_legal_moves())
+        only_draws = {name: -50.0 for name in FEATURES}
+        only_draws["draw"] = 0.0
+        policy = WeightedPolicy(only_draws, random.Random(0))
+        for _ in range(20):
+            self.assertEqual(policy.choose(game, moves)[0], "draw")
+
+    def test_common_random_numbers(self):
+        self.assertEqual(play_deal(default_weights(), 5, max_moves=300), play_deal(default_weights(), 5, max_moves=300))
+
+
+class TestTuner(unittest.TestCase):
+
+    def test_successive_halving(self):
+        messages = []
+        tuner = Tuner(deals=16, candidates=4, workers=0, chunk=4, max_moves=150, log=messages.append)
+        weights = tuner.run(generations=2)
+        self.assertEqual(set(weights), set(FEATURES))
+        self.assertEqual(len(tuner.history), 2)
+        self.assertIn("4 candidates on 4 deals", messages[0])
+        self.assertIn("1 candidates on 16 deals", messages[2])
+        self.assertLess(tuner.sigma, 0.5)
+
+    def test_parallel_matches_inline(self):
+        candidates = {"default": default_weights(), "draws": dict(default_weights(), draw=5.0)}
+        inline = compare(candidates, deals=6, workers=0, chunk=4, max_moves=150)
+        pooled = compare(candidates, deals=6, workers=2, chunk=4, max_moves=150)
+        self.assertEqual(inline, pooled)
+
+    def test_cli_writes_loadable_policy(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "policy.json")
+            main(["--deals", "8", "--candidates", "2", "--generations", "1", "--workers", "0", "--max-moves", "100",
+                  "--out", out])
+            with open(out) as handle:
+                result = json.load(handle)
+            self.assertEqual(result["deals"], 8)
+            self.assertEqual(load_policy(out).weights, result["weights"])
+
+if __name__ == "__main__":
+    unittest.main()
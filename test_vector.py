@@ -0,0 +1,86 @@
+import unittest
+from main import Game
+from compact import CompactGame
+from play import create_test_game, encode_move, apply_move
+from solver import solve
+
+try:
+    import numpy as np
+    from vector import VectorGame, ACTION_INDEX, N_ACTIONS, choose_random, simulate
+except ImportError:
+    np = None
+
+@unittest.skipUnless(np is not None, "numpy is not installed")
+class TestVectorGame(unittest.TestCase):
+
+    def cross_check(self, games, steps, seed):
+        """Play random moves in lockstep on VectorGame and main.Game, comparing moves and positions."""
+        batch = VectorGame.from_games(games)
+        rng = np.random.default_rng(seed)
+        for _ in range(steps):
+            mask = batch.legal_mask()
+            for b, game in enumerate(games):
+                moves = sorted(batch.move(b, action) for action in np.flatnonzero(mask[b]))
+                self.assertEqual(moves, sorted(game.generate_moves()))
+            actions = choose_random(mask, rng)
+            for b, game in enumerate(games):
+                if actions[b] >= 0:
+                    self.assertTrue(game.make_move(batch.move(b, actions[b])))
+            batch.apply(actions)
+            for b, game in enumerate(games):
+                self.assertEqual(batch.to_compact(b).snapshot(), game.snapshot())
+                self.assertEqual(batch.recycles[b], game.recycles)
+        return batch
+
+    def test_matches_game_draw_one(self):
+        self.cross_check([Game(seed=seed) for seed in range(12)], 250, seed=0)
+
+    def test_matches_game_draw_three_with_recycle_limit(self):
+        self.cross_check([Game(seed=seed, draw_count=3, max_recycles=1) for seed in range(12)], 250, seed=1)
+
+    def test_replays_solver_line_to_a_win(self):
+        game = create_test_game()
+        line = solve(game).moves
+        batch = VectorGame.from_games([game])
+        for move in line:
+            batch.apply([ACTION_INDEX[encode_move(move)[:3]]])
+            apply_move(game, move)
+            self.assertEqual(batch.to_compact(0).snapshot(), game.snapshot())
+        self.assertTrue(batch.is_won()[0])
+        self.assertEqual(batch.foundation_count()[0], 52)
+
+    def test_seeded_deals_match_game(self):
+        batch = VectorGame.from_seeds(range(5), draw_count=3)
+        for b in range(5):
+            self.assertEqual(batch.to_compact(b).snapshot(), Game(seed=b).snapshot())
+            self.assertEqual(batch.to_compact(b).key(), CompactGame(seed=b, draw_count=3).key())
+
+    def test_negative_action_leaves_game_alone(self):
+        batch = VectorGame.from_seeds([7, 8])
+        before = batch.to_compact(0).snapshot()
+        batch.apply([-1, 0])
+        self.assertEqual(batch.to_compact(0).snapshot(), before)
+        self.assertEqual(list(batch.cursor), [0, 1])
+
+    def test_choose_random_picks_legal_actions(self):
+        rng = np.random.default_rng(3)
+        mask = rng.random((200, N_ACTIONS)) < 0.05
+        mask[0] = False
+        actions = choose_random(mask, rng)
+        self.assertEqual(actions[0], -1)
+        for row, action in zip(mask[1:], actions[1:]):
+            self.assertEqual(action >= 0, row.any())
+            if action >= 0:
+                self.assertTrue(row[action])
+
+    def test_simulate_is_reproducible(self):
+        first = simulate(range(20), max_moves=300, rng=np.random.default_rng(4))
+        second = simulate(range(20), max_moves=300, rng=np.random.default_rng(4))
+        for a, b in zip(first, second):
+            self.assertTrue((a == b).all())
+        won, moves, foundation = first
+        self.assertTrue((moves <= 300).all())
+        self.assertTrue((foundation[won] == 52).all())
+
+if __name__ == "__main__":
+    unittest.main()
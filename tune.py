@@ -0,0 +1,265 @@
+"""Tuning the weighted bot: search for move weightings that win more deals.
+
+    python -m tune --deals 2000 --candidates 32 --generations 4 --workers 8 --out policy.json
+    python -m tune --evaluate policy.json --deals 5000 --seed 100000
+
+A WeightedPolicy picks each move with probability proportional to
+exp(weights . features(move)). FEATURES are one indicator per move kind
+plus a few properties of the move (see features). With the kind weights
+set to log(MOVE_WEIGHTS) and the rest 0 it is exactly play's bot.
+
+Candidates are scored by rollout.score averaged over a fixed set of
+seeded deals. Every candidate plays deal ``seed`` with the same
+random.Random(seed), so candidates are compared on common random numbers
+and differences come from the weights rather than the dice. The search
+is successive halving within a generation (all candidates on a few deals,
+the better half on twice as many, ...) and each generation samples new
+candidates around the last winner with a shrinking step size.
+"""
+from compact import CompactGame
+from play import MOVE_WEIGHTS, step
+from rollout import score
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+KINDS = ["draw", "waste_to_tableau", "waste_to_foundation", "tableau_to_foundation", "tableau_to_tableau",
+         "foundation_to_tableau"]
+# Features beyond the move kind, all 0 or 1:
+#   reveals: leaves a face-down card on top of its column, to be turned up
+#   empties: leaves its column empty
+#   splits:  moves only part of a face-up run
+EXTRAS = ["reveals", "empties", "splits"]
+FEATURES = KINDS + EXTRAS
+
+def default_weights():
+    """The weights of play's MOVE_WEIGHTS bot."""
+    weights = dict.fromkeys(FEATURES, 0.0)
+    weights.update({kind: math.log(MOVE_WEIGHTS.get(kind, 50)) for kind in KINDS})
+    return weights
+
+def features(game, move):
+    """The EXTRAS that are set for flattened ``move`` on a CompactGame, as a tuple of names."""
+    kind = move[0]
+    if kind == "tableau_to_tableau":
+        column, whole_run = move[1], move[3] == 0  # start index within the face-up run
+    elif kind == "tableau_to_foundation":
+        column = move[1]
+        whole_run = game.heights[column] - game.down[column] == 1
+    else:
+        return ()
+    if whole_run:
+        return ("reveals" if game.down[column] else "empties",)
+    return ("splits",)
+
+
+class WeightedPolicy:
+    """The weighted-random bot with tunable ``weights`` (a dict over FEATURES); use ``choose`` with play.step."""
+
+    def __init__(self, weights=None, rng=None):
+        self.weights = default_weights()
+        self.weights.update(weights or {})
+        self.rng = rng or random.Random()
+
+    def move_weight(self, game, move):
+        weights = self.weights
+        total = weights[move[0]]
+        for name in features(game, move):
+            total += weights[name]
+        return math.exp(total)
+
+    def choose(self, game, moves):
+        """Pick one of ``moves`` (flattened, legal on the CompactGame ``game``)."""
+        return self.rng.choices(moves, weights=[self.move_weight(game, move) for move in moves], k=1)[0]
+
+
+def load_policy(path, rng=None):
+    """A WeightedPolicy from a file written by ``tune --out``."""
+    with open(path) as handle:
+        return WeightedPolicy(json.load(handle)["weights"], rng)
+
+def play_deal(weights, seed, max_moves=1000, draw_count=1, max_recycles=None):
+    """(score, won) of the weighted bot on one seeded deal, dice seeded by the deal."""
+    game = CompactGame(seed=seed, draw_count=draw_count, max_recycles=max_recycles)
+    policy = WeightedPolicy(weights, random.Random(seed))
+    for _ in range(max_moves):
+        outcome, move = step(game, policy.choose)
+        if outcome is not None:
+            break
+    return score(game), game.is_won()
+
+def evaluate(task):
+    """Total (score, wins) of one weight vector over a list of seeds."""
+    weights, seeds, options = task
+    total = wins = 0
+    for seed in seeds:
+        points, won = play_deal(weights, seed, **options)
+        total += points
+        wins += won
+    return total, wins
+
+
+class Tuner:
+    """Successive-halving search over weight vectors on a common deal set.
+
+    ``deals`` seeds starting at ``seed`` form the deal set. A generation
+    samples ``candidates`` weight vectors around the incumbent (the
+    incumbent itself included), plays them all on ``first_deals`` deals,
+    keeps the best 1/``eta`` and gives the survivors ``eta`` times as many
+    deals, until one candidate has played the whole set. Its scores only
+    ever come from deals every rival it beat also played. ``sigma`` is the
+    sampling step, multiplied by ``decay`` after every generation.
+    ``workers`` processes play the deals; 0 plays them in this process.
+    """
+
+    def __init__(self, deals=1000, seed=0, candidates=16, first_deals=None, eta=2, sigma=0.5, decay=0.7,
+                 workers=None, chunk=50, rng=None, log=None, **options):
+        self.seeds = list(range(seed, seed + deals))
+        self.candidates = candidates
+        self.first_deals = first_deals or max(1, deals // candidates)
+        self.eta = eta
+        self.sigma = sigma
+        self.decay = decay
+        self.workers = workers
+        self.chunk = chunk
+        self.rng = rng or random.Random(0)
+        self.log = log
+        self.options = options  # passed on to play_deal
+        self.incumbent = default_weights()
+        self.history = []
+        self._pool = None
+
+    def _map(self, tasks):
+        if self.workers == 0:
+            return list(map(evaluate, tasks))
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+        return self._pool.map(evaluate, tasks)
+
+    def evaluate(self, candidates, seeds):
+        """[(total score, wins)] of every candidate over ``seeds``, played in parallel."""
+        tasks = [(weights, seeds[i:i + self.chunk], self.options)
+                 for weights in candidates for i in range(0, len(seeds), self.chunk)]
+        per_task = len(tasks) // len(candidates)
+        results = self._map(tasks)
+        totals = []
+        for c in range(len(candidates)):
+            chunk = results[c * per_task:(c + 1) * per_task]
+            totals.append((sum(total for total, wins in chunk), sum(wins for total, wins in chunk)))
+        return totals
+
+    def sample(self):
+        """The incumbent plus ``candidates - 1`` Gaussian perturbations of it."""
+        population = [dict(self.incumbent)]
+        for _ in range(self.candidates - 1):
+            population.append({name: value + self.rng.gauss(0, self.sigma) for name, value in self.incumbent.items()})
+        return population
+
+    def generation(self):
+        """Run one generation; returns the winner as (weights, mean score, win rate)."""
+        population = self.sample()
+        totals = [(0, 0)] * len(population)
+        alive = list(range(len(population)))
+        played = 0
+        budget = self.first_deals
+        while True:
+            seeds = self.seeds[played:budget]
+            for i, result in zip(alive, self.evaluate([population[i] for i in alive], seeds)):
+                totals[i] = (totals[i][0] + result[0], totals[i][1] + result[1])
+            played = budget
+            if self.log:
+                best = max(alive, key=lambda i: totals[i])
+                self.log(f"  {len(alive)} candidates on {played} deals, best {totals[best][0] / played:.2f} "
+                         f"({totals[best][1] / played:.1%} won)")
+            if len(alive) == 1 or played >= len(self.seeds):
+                break
+            alive.sort(key=lambda i: totals[i], reverse=True)
+            alive = alive[:max(1, len(alive) // self.eta)]
+            # The last survivor plays out the rest of the set
+            budget = len(self.seeds) if len(alive) == 1 else min(len(self.seeds), played * self.eta)
+        best = max(alive, key=lambda i: totals[i])
+        return population[best], totals[best][0] / played, totals[best][1] / played
+
+    def run(self, generations=1):
+        """Run ``generations`` generations; returns the best weights found."""
+        try:
+            for g in range(generations):
+                start = time.perf_counter()
+                weights, mean, win_rate = self.generation()
+                self.incumbent = weights
+                self.history.append({"generation": g, "sigma": self.sigma, "score": mean, "win_rate": win_rate,
+                                     "seconds": time.perf_counter() - start})
+                if self.log:
+                    self.log(f"generation {g}: score {mean:.2f}, {win_rate:.1%} won, sigma {self.sigma:.3f}")
+                self.sigma *= self.decay
+        finally:
+            self.close()
+        return self.incumbent
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def compare(candidates, deals=1000, seed=0, workers=None, chunk=50, **options):
+    """{name: (mean score, win rate)} of named weight vectors on one common deal set."""
+    tuner = Tuner(deals=deals, seed=seed, workers=workers, chunk=chunk, **options)
+    try:
+        totals = tuner.evaluate(list(candidates.values()), tuner.seeds)
+    finally:
+        tuner.close()
+    return {name: (total / deals, wins / deals) for name, (total, wins) in zip(candidates, totals)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the weighted bot's move weights on seeded deals.")
+    parser.add_argument("--deals", type=int, default=1000, help="deals in the tuning set")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first deal")
+    parser.add_argument("--candidates", type=int, default=16, help="weight vectors per generation")
+    parser.add_argument("--generations", type=int, default=3)
+    parser.add_argument("--sigma", type=float, default=0.5, help="initial sampling step (log-weight units)")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count; 0 plays inline")
+    parser.add_argument("--max-moves", type=int, default=1000)
+    parser.add_argument("--draw", type=int, choices=[1, 3], default=1, help="cards per draw")
+    parser.add_argument("--max-recycles", type=int, default=None, help="passes through the stock (default unlimited)")
+    parser.add_argument("--validate", type=int, default=0, metavar="N",
+                        help="compare the winner with the default bot on N fresh deals")
+    parser.add_argument("--evaluate", metavar="PATH", help="only score a saved policy against the default bot")
+    parser.add_argument("--out", default=None, help="JSON file for the best policy (default stdout)")
+    args = parser.parse_args(argv)
+    options = {"max_moves": args.max_moves, "draw_count": args.draw, "max_recycles": args.max_recycles}
+    log = lambda message: print(message, file=sys.stderr)
+
+    if args.evaluate:
+        results = compare({"default": default_weights(), args.evaluate: load_policy(args.evaluate).weights},
+                          args.deals, args.seed, args.workers, **options)
+        for name, (mean, win_rate) in results.items():
+            print(f"{name}: score {mean:.2f}, {win_rate:.1%} won")
+        return
+
+    start = time.perf_counter()
+    tuner = Tuner(args.deals, args.seed, args.candidates, sigma=args.sigma, workers=args.workers, log=log, **options)
+    weights = tuner.run(args.generations)
+    result = {"weights": weights, "deals": args.deals, "seed": args.seed, "rules": options,
+              "history": tuner.history, "seconds": time.perf_counter() - start}
+    if args.validate:
+        # Fresh deals, so the winner's luck on the tuning set doesn't count
+        fresh = args.seed + args.deals
+        result["validation"] = compare({"default": default_weights(), "tuned": weights}, args.validate, fresh,
+                                       args.workers, **options)
+        for name, (mean, win_rate) in result["validation"].items():
+            log(f"validation {name}: score {mean:.2f}, {win_rate:.1%} won")
+    if args.out:
+        with open(args.out, "w") as handle:
+            json.dump(result, handle, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""Vectorised Klondike: advance a whole batch of games in lockstep with NumPy.
+
+    python -m vector --deals 100000 --batch 4096 --seed 42
+
+VectorGame holds B games as arrays (the same layout as CompactGame, with a
+batch axis in front). legal_mask() returns a (B, N_ACTIONS) boolean mask
+of the moves each game may play and apply() plays one action per game, so
+a random-policy step costs a few dozen NumPy calls however large B is.
+The rules are exactly main.Game's (test_vector cross-checks every move).
+
+An action is a column of the mask; ACTIONS[action] is its (kind, a, b)
+with kind from main.MOVE_TYPES. Tableau to tableau actions are one per
+(from, to) pair: in a valid face-up run at most one card fits a given
+pile, so the start index is implied and move() recovers it.
+"""
+from main import (MOVE_TYPES, DRAW, WASTE_TO_TABLEAU, WASTE_TO_FOUNDATION, TABLEAU_TO_FOUNDATION,
+                  TABLEAU_TO_TABLEAU, FOUNDATION_TO_TABLEAU)
+from compact import CompactGame, RANK, SUIT, COLOR, SLOT, NEEDS, TABLEAU_CAPACITY, deal_for_seed
+from play import MOVE_WEIGHTS
+import argparse
+import sys
+import time
+import numpy as np
+
+# Card 52 stands for "no card": rank 0 and slots that match nothing
+NONE = 52
+_RANK = np.array(RANK + (0,), np.int8)
+_SUIT = np.array(SUIT + (0,), np.int8)
+# Parity of rank + color, times 16 (see VectorGame._runs)
+_PARITY = np.array(tuple((RANK[c] + COLOR[c]) % 2 * 16 for c in range(52)) + (0,), np.int8)
+RUN_NONE = 64  # run range of a pile without face-up cards: above every key
+_SLOT = np.array(SLOT + (-1,), np.int8)
+_NEEDS = np.array(NEEDS + (-2,), np.int8)
+
+ACTIONS = ([(DRAW, 0, 0)]
+           + [(WASTE_TO_TABLEAU, i, 0) for i in range(7)]
+           + [(WASTE_TO_FOUNDATION, 0, 0)]
+           + [(TABLEAU_TO_FOUNDATION, i, 0) for i in range(7)]
+           + [(TABLEAU_TO_TABLEAU, f, t) for f in range(7) for t in range(7)]
+           + [(FOUNDATION_TO_TABLEAU, s, t) for s in range(4) for t in range(7)])
+N_ACTIONS = len(ACTIONS)
+# (kind, a, b) of an encoded move (see play.encode_move) -> its action
+ACTION_INDEX = {action: i for i, action in enumerate(ACTIONS)}
+DRAW_ACTION = 0
+WASTE_TO_TABLEAU_ACTIONS = slice(1, 8)
+WASTE_TO_FOUNDATION_ACTION = 8
+TABLEAU_TO_FOUNDATION_ACTIONS = slice(9, 16)
+TABLEAU_TO_TABLEAU_ACTIONS = slice(16, 65)
+FOUNDATION_TO_TABLEAU_ACTIONS = slice(65, 93)
+ACTION_KIND = np.array([kind for kind, a, b in ACTIONS])
+ACTION_A = np.array([a for kind, a, b in ACTIONS])
+ACTION_B = np.array([b for kind, a, b in ACTIONS])
+# int16 is enough: all N_ACTIONS moves at the top weight still sum below 2**15
+ACTION_WEIGHTS = np.array([MOVE_WEIGHTS[MOVE_TYPES[kind]] for kind, a, b in ACTIONS], np.int16)
+
+def _deal_positions():
+    """(column, row, deck index) of every tableau card, dealt from the end of the deck like CompactGame."""
+    positions = []
+    index = 51
+    for i in range(7):
+        for j in range(i + 1):
+            positions.append((i, j, index))
+            index -= 1
+    return positions
+
+
+class VectorGame:
+    """B Klondike games stored column-wise, all under the same rule variant.
+
+    ``cells[b, i]`` is tableau ``i`` of game ``b`` bottom to top with
+    ``heights[b, i]`` cards, the first ``down[b, i]`` face down.
+    ``pile[b]`` holds ``pile_len[b]`` stock and waste cards split by
+    ``cursor[b]`` exactly as in CompactGame; unused cells hold NONE.
+    """
+
+    def __init__(self, deals, draw_count=1, max_recycles=None):
+        deals = np.frombuffer(b"".join(bytes(deal) for deal in deals), np.uint8).reshape(-1, 52).astype(np.int8)
+        size = len(deals)
+        self.draw_count = draw_count
+        self.max_recycles = max_recycles
+        self.cells = np.full((size, 7, TABLEAU_CAPACITY), NONE, np.int8)
+        for i, j, index in _deal_positions():
+            self.cells[:, i, j] = deals[:, index]
+        self.heights = np.tile(np.arange(1, 8, dtype=np.int8), (size, 1))
+        self.down = np.tile(np.arange(7, dtype=np.int8), (size, 1))
+        self.foundations = np.zeros((size, 4), np.int8)
+        self.pile = deals[:, :24].copy()
+        self.pile_len = np.full(size, 24, np.int8)
+        self.cursor = np.zeros(size, np.int8)
+        self.recycles = np.zeros(size, np.int8)
+        self.rows = np.arange(size)
+
+    @classmethod
+    def from_seeds(cls, seeds, draw_count=1, max_recycles=None):
+        """One game per seed, dealt exactly like Game(seed=seed)."""
+        return cls([deal_for_seed(seed) for seed in seeds], draw_count, max_recycles)
+
+    @classmethod
+    def from_games(cls, games):
+        """A batch holding the current positions of Game or CompactGame objects (same rules for all)."""
+        compacts = [game if isinstance(game, CompactGame) else CompactGame.from_game(game) for game in games]
+        batch = cls([bytes(52)] * len(compacts), compacts[0].draw_count, compacts[0].max_recycles)
+        width = max(24, max(len(compact.pile) for compact in compacts))
+        batch.pile = np.full((len(compacts), width), NONE, np.int8)
+        for b, compact in enumerate(compacts):
+            for i in range(7):
+                base = i * TABLEAU_CAPACITY
+                batch.cells[b, i] = NONE
+                batch.cells[b, i, :compact.heights[i]] = list(compact.cells[base:base + compact.heights[i]])
+            batch.heights[b] = list(compact.heights)
+            batch.down[b] = list(compact.down)
+            batch.foundations[b] = list(compact.foundations)
+            batch.pile[b, :len(compact.pile)] = list(compact.pile)
+            batch.pile_len[b] = len(compact.pile)
+            batch.cursor[b] = compact.cursor
+            batch.recycles[b] = compact.recycles
+        return batch
+
+    def __len__(self):
+        return len(self.rows)
+
+    def to_compact(self, b):
+        """Game ``b`` as a CompactGame."""
+        compact = CompactGame(deal=False, draw_count=self.draw_count, max_recycles=self.max_recycles)
+        for i in range(7):
+            height = int(self.heights[b, i])
+            compact.cells[i * TABLEAU_CAPACITY:i * TABLEAU_CAPACITY + height] = bytes(self.cells[b, i, :height].tolist())
+        compact.heights[:] = bytes(self.heights[b].tolist())
+        compact.down[:] = bytes(self.down[b].tolist())
+        compact.foundations[:] = bytes(self.foundations[b].tolist())
+        compact.pile = bytearray(self.pile[b, :self.pile_len[b]].tolist())
+        compact.cursor = int(self.cursor[b])
+        compact.recycles = int(self.recycles[b])
+        return compact
+
+    def is_won(self):
+        return (self.foundations == 13).all(axis=1)
+
+    def foundation_count(self):
+        return self.foundations.sum(axis=1)
+
+    def can_recycle(self):
+        if self.max_recycles is None:
+            return np.ones(len(self), bool)
+        return self.recycles < self.max_recycles
+
+    def _tops(self):
+        """Top card of every tableau (NONE when empty), the slot each accepts and which are empty."""
+        empty = self.heights == 0
+        top = np.take_along_axis(self.cells, np.maximum(self.heights - 1, 0)[..., None], 2)[..., 0]
+        top = np.where(empty, NONE, top)
+        accept = np.where(empty, -2, _NEEDS[top])
+        return top, accept, empty
+
+    def _waste_top(self):
+        return np.where(self.cursor > 0, self.pile[self.rows, np.maximum(self.cursor - 1, 0)], NONE)
+
+    def _fits(self, cards, accept, empty):
+        """Whether each card can go on each tableau: cards (..., n) against piles (..., 7) -> (..., n, 7)."""
+        return ((accept[..., None, :] == _SLOT[cards][..., None])
+                | (empty[..., None, :] & (_RANK[cards] == 13)[..., None]))
+
+    def _runs(self, top):
+        """Rank range and parity of every pile's face-up run.
+
+        Face-up cards always form a run down in rank with alternating colors,
+        so ``(rank + color) & 1`` is the same all along a run and the run is
+        fixed by its top card and its lowest face-up card. Returns (low,
+        high, lowest face-up card) with ranks offset by 16 for odd parity:
+        a pile whose top card has rank r and parity p takes a card from the
+        run exactly when ``low < r + 16 * p <= high``.
+        """
+        has_run = self.heights > self.down
+        base = np.take_along_axis(self.cells, np.minimum(self.down, TABLEAU_CAPACITY - 1)[..., None], 2)[..., 0]
+        base = np.where(has_run, base, NONE)
+        parity = _PARITY[base]
+        low = np.where(has_run, _RANK[top] + parity, RUN_NONE)
+        return low, _RANK[base] + 1 + parity, base
+
+    def _run_fits(self, top, empty):
+        """(B, 7, 7): whether part of pile f's face-up run can move onto pile t."""
+        low, high, base = self._runs(top)
+        key = np.where(empty, 0, _RANK[top] + _PARITY[top])[:, None, :]
+        fits = (low[:, :, None] < key) & (key <= high[:, :, None])
+        return fits | (empty[:, None, :] & (_RANK[base] == 13)[:, :, None])
+
+    def legal_mask(self):
+        """(B, N_ACTIONS) boolean mask of every game's legal moves."""
+        top, accept, empty = self._tops()
+        waste = self._waste_top()
+        mask = np.zeros((len(self), N_ACTIONS), bool)
+
+        mask[:, DRAW_ACTION] = (self.cursor < self.pile_len) | ((self.cursor > 0) & self.can_recycle())
+        mask[:, WASTE_TO_TABLEAU_ACTIONS] = self._fits(waste[:, None], accept, empty)[:, 0]
+        mask[:, WASTE_TO_FOUNDATION_ACTION] = self.foundations[self.rows, _SUIT[waste]] == _RANK[waste] - 1
+        mask[:, TABLEAU_TO_FOUNDATION_ACTIONS] = np.take_along_axis(self.foundations, _SUIT[top], 1) == _RANK[top] - 1
+        fits = self._run_fits(top, empty)
+        fits[:, np.arange(7), np.arange(7)] = False
+        mask[:, TABLEAU_TO_TABLEAU_ACTIONS] = fits.reshape(-1, 49)
+        foundation_tops = np.where(self.foundations > 0, np.arange(4) * 13 + self.foundations - 1, NONE)
+        mask[:, FOUNDATION_TO_TABLEAU_ACTIONS] = self._fits(foundation_tops, accept, empty).reshape(-1, 28)
+        return mask
+
+    def move(self, b, action):
+        """Action ``action`` of game ``b`` as a main.Game.generate_moves tuple."""
+        kind, a, c = ACTIONS[action]
+        if kind == TABLEAU_TO_TABLEAU:
+            if self.heights[b, c]:
+                # The run card one rank below the target's top, counted from the lowest face-up card
+                base = self.cells[b, a, self.down[b, a]]
+                return (kind, a, c, int(_RANK[base] - _RANK[self.cells[b, c, self.heights[b, c] - 1]] + 1))
+            return (kind, a, c, 0)
+        if kind == FOUNDATION_TO_TABLEAU:
+            return (kind, a, c, 0)
+        return (kind, a, 0, 0)
+
+    def apply(self, actions):
+        """Play ``actions[b]`` in every game ``b``; a negative action leaves the game untouched.
+
+        Actions must be legal (see legal_mask).
+        """
+        actions = np.asarray(actions)
+        kinds = np.where(actions >= 0, ACTION_KIND[actions], -1)
+        a = ACTION_A[actions]
+        b = ACTION_B[actions]
+        for kind in np.unique(kinds):
+            rows = np.flatnonzero(kinds == kind)
+            if kind == DRAW:
+                self._draw(rows)
+            elif kind == WASTE_TO_TABLEAU:
+                self._push(rows, a[rows], self._pop_waste(rows))
+            elif kind == WASTE_TO_FOUNDATION:
+                self._push_foundation(rows, self._pop_waste(rows))
+            elif kind == TABLEAU_TO_FOUNDATION:
+                self._tableau_to_foundation(rows, a[rows])
+            elif kind == TABLEAU_TO_TABLEAU:
+                self._tableau_to_tableau(rows, a[rows], b[rows])
+            elif kind == FOUNDATION_TO_TABLEAU:
+                self._foundation_to_tableau(rows, a[rows], b[rows])
+
+    def _draw(self, rows):
+        recycle = self.cursor[rows] == self.pile_len[rows]
+        self.recycles[rows[recycle]] += 1
+        self.cursor[rows[recycle]] = 0
+        self.cursor[rows] += np.minimum(self.draw_count, self.pile_len[rows] - self.cursor[rows])
+
+    def _pop_waste(self, rows):
+        cursor = self.cursor[rows] - 1
+        cards = self.pile[rows, cursor]
+        width = self.pile.shape[1]
+        depth = np.arange(width)
+        shifted = np.minimum(depth + (depth >= cursor[:, None]), width - 1)
+        self.pile[rows] = np.take_along_axis(self.pile[rows], shifted, 1)
+        self.pile_len[rows] -= 1
+        self.pile[rows, self.pile_len[rows]] = NONE
+        self.cursor[rows] = cursor
+        return cards
+
+    def _push(self, rows, piles, cards):
+        self.cells[rows, piles, self.heights[rows, piles]] = cards
+        self.heights[rows, piles] += 1
+
+    def _push_foundation(self, rows, cards):
+        self.foundations[rows, _SUIT[cards]] += 1
+
+    def _flip(self, rows, piles):
+        """Turn over the top face-down card of piles left with no face-up cards."""
+        down = self.down[rows, piles]
+        exposed = (self.heights[rows, piles] == down) & (down > 0)
+        self.down[rows[exposed], piles[exposed]] -= 1
+
+    def _tableau_to_foundation(self, rows, piles):
+        self.heights[rows, piles] -= 1
+        height = self.heights[rows, piles]
+        self._push_foundation(rows, self.cells[rows, piles, height])
+        self.cells[rows, piles, height] = NONE
+        self._flip(rows, piles)
+
+    def _tableau_to_tableau(self, rows, sources, targets):
+        # The run starts at the face-up card one rank below the target's top card
+        down = self.down[rows, sources]
+        target_height = self.heights[rows, targets]
+        target_top = self.cells[rows, targets, np.maximum(target_height - 1, 0)]
+        starts = down + np.where(target_height > 0, _RANK[self.cells[rows, sources, down]] - _RANK[target_top] + 1, 0)
+        count = self.heights[rows, sources] - starts
+        offsets = np.arange(13)
+        moving = offsets < count[:, None]
+        row_index = np.broadcast_to(rows[:, None], moving.shape)[moving]
+        source_index = np.broadcast_to(sources[:, None], moving.shape)[moving]
+        target_index = np.broadcast_to(targets[:, None], moving.shape)[moving]
+        from_depth = (starts[:, None] + offsets)[moving]
+        to_depth = (self.heights[rows, targets][:, None] + offsets)[moving]
+        self.cells[row_index, target_index, to_depth] = self.cells[row_index, source_index, from_depth]
+        self.cells[row_index, source_index, from_depth] = NONE
+        self.heights[rows, sources] = starts
+        self.heights[rows, targets] += count
+        self._flip(rows, sources)
+
+    def _foundation_to_tableau(self, rows, suits, piles):
+        self.foundations[rows, suits] -= 1
+        self._push(rows, piles, suits * 13 + self.foundations[rows, suits])
+
+
+def choose_random(mask, rng):
+    """One MOVE_WEIGHTS-weighted random action per row of ``mask`` (-1 where none is legal)."""
+    weights = np.cumsum(mask * ACTION_WEIGHTS, axis=1, dtype=np.int16)
+    total = weights[:, -1]
+    threshold = (rng.random(len(mask)) * total).astype(np.int16)
+    choice = (weights > threshold[:, None]).argmax(axis=1)
+    return np.where(total > 0, choice, -1)
+
+def simulate(seeds, max_moves=2000, draw_count=1, max_recycles=None, rng=None):
+    """Play the MOVE_WEIGHTS bot on every seed at once.
+
+    Games stop when won, out of legal moves, or after ``max_moves`` moves.
+    Returns (won, moves played, cards on the foundations) as arrays.
+    """
+    rng = rng or np.random.default_rng()
+    games = VectorGame.from_seeds(seeds, draw_count, max_recycles)
+    moves = np.zeros(len(games), np.int64)
+    for _ in range(max_moves):
+        actions = choose_random(games.legal_mask(), rng)
+        actions[games.is_won()] = -1
+        playing = actions >= 0
+        if not playing.any():
+            break
+        games.apply(actions)
+        moves += playing
+    return games.is_won(), moves, games.foundation_count()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play seeded Klondike deals in lockstep with NumPy.")
+    parser.add_argument("--deals", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=4096, help="games advanced together")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first deal")
+    parser.add_argument("--max-moves", type=int, default=2000)
+    parser.add_argument("--draw", type=int, choices=[1, 3], default=1, help="cards per draw")
+    parser.add_argument("--max-recycles", type=int, default=None, help="passes through the stock (default unlimited)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rng = np.random.default_rng(args.seed)
+    won = played = moves = 0
+    for first in range(args.seed, args.seed + args.deals, args.batch):
+        seeds = range(first, min(first + args.batch, args.seed + args.deals))
+        batch_won, batch_moves, _ = simulate(seeds, args.max_moves, args.draw, args.max_recycles, rng)
+        won += int(batch_won.sum())
+        moves += int(batch_moves.sum())
+        played += len(seeds)
+    elapsed = time.perf_counter() - start
+    print(f"{played} deals, {won} won ({won / max(played, 1):.2%}), {moves} moves, "
+          f"{elapsed:.1f}s ({moves / elapsed:.0f} moves/s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()